@@ -1,14 +1,25 @@
 import streamlit as st
 import pandas as pd
-import json
 import os
-import io
-import requests
-import shutil
-import re
-import hashlib
-from datetime import datetime, timedelta
-from base64 import b64decode
+from datetime import timedelta
+
+import metrics
+from batch_edit import BatchError, EditBatch, read_import
+from durable_io import append_jsonl, atomic_write_json, list_generations, read_json, restore_generation
+from edit_engine import insert_keys, insert_position, range_columns
+from github_sync import GithubSync
+from merge_engine import SaveConflict, merge_remote
+from push_queue import PushQueue, load_pending
+from report_export import CSV_MIME, XLSX_MIME, deferred_report
+from row_patch import change_log_entry, editor_patch, patch_counts, patch_is_empty, patch_message
+from save_engine import format_save_report
+from session_store import ALREADY_ACTIVE, NO_SLOTS, SessionStore
+from status_engine import (
+    VIEW_CURRENT, VIEW_CUSTOM, VIEW_OPTIONS, cached_status_table, fleet_status_report, precompute_service_names,
+    status_table_key,
+)
+from storage import STORAGE_EXCEL, STORAGE_SQLITE, StaleSheet, open_backend
+from sync_service import SyncService
 
 # محاولة استيراد PyGithub (لرفع التعديلات)
 try:
@@ -22,8 +33,9 @@ except Exception:
 # ===============================
 USERS_FILE = "users.json"
 STATE_FILE = "state.json"
+SESSION_DB = "sessions.db"  # سجل الجلسات النشطة (SQLite WAL) بدل state.json
 SESSION_DURATION = timedelta(minutes=10)  # مدة الجلسة 10 دقائق
-MAX_ACTIVE_USERS = 2  # أقصى عدد مستخدمين مسموح
+MAX_ACTIVE_USERS = int(os.environ.get("CMMS_MAX_ACTIVE_USERS", "30"))  # أقصى عدد مستخدمين مسموح
 
 # إعدادات GitHub (مسارات الملف والريبو)
 REPO_NAME = "mahmedabdallh123/cmms"  # عدل إذا لزم
@@ -31,6 +43,26 @@ BRANCH = "main"
 FILE_PATH = "Machine_Service_Lookup.xlsx"
 LOCAL_FILE = "Machine_Service_Lookup.xlsx"
 GITHUB_EXCEL_URL = "https://github.com/mahmedabdallh123/cmms/raw/refs/heads/main/Machine_Service_Lookup.xlsx"
+PUSH_QUEUE_FILE = "push_queue.json"  # طلبات الرفع المنتظرة (تستمر بعد إعادة التشغيل)
+SYNC_META_FILE = "sync_meta.json"  # آخر ETag لرابط RAW
+CHANGE_LOG_FILE = os.environ.get("CMMS_CHANGE_LOG", "change_log.jsonl")  # سجل تعديلات المحرر (للإضافة فقط)
+SYNC_INTERVAL_SECONDS = int(os.environ.get("CMMS_SYNC_INTERVAL", "300"))  # الجلب الدوري من GitHub؛ 0 لتعطيله
+
+# كاش عمودي (Feather) بجانب ملف الإكسل لتسريع التحميل بعد إعادة التشغيل
+SHEET_CACHE_DIR = os.environ.get("CMMS_SHEET_CACHE_DIR", ".sheet_cache")
+USE_SHEET_CACHE = os.environ.get("CMMS_SHEET_CACHE", "1") != "0"  # ضع 0 لتعطيله
+# الشيتات تُحمَّل عند أول طلب؛ أقصى عدد شيتات في الذاكرة لكل بصمة (LRU) ما لم يُطلب تحميل الكل
+MAX_LOADED_SHEETS = int(os.environ.get("CMMS_MAX_LOADED_SHEETS", "32"))
+# جداول حالة الماكينات المحفوظة لكل بصمة (LRU): إعادة التشغيل بنفس الاستعلام لا تعيد الحساب
+STATUS_CACHE_SIZE = int(os.environ.get("CMMS_STATUS_CACHE_SIZE", "64"))
+
+# طبقة التخزين: excel (الملف هو قاعدة البيانات) أو sqlite (الملف يصبح صيغة تصدير)
+STORAGE_MODE = os.environ.get("CMMS_STORAGE", STORAGE_EXCEL)
+STORAGE_DB = os.environ.get("CMMS_STORAGE_DB", "cmms.db")
+
+# عدد النسخ السابقة المحفوظة في .generations للرجوع الفوري
+WORKBOOK_GENERATIONS = 5
+JSON_GENERATIONS = 3
 
 # -------------------------------
 # 🔁 دالة آمنة لإعادة التشغيل (تتعامل مع اختلاف إصدارات Streamlit)
@@ -63,32 +95,41 @@ def safe_rerun():
 # -------------------------------
 # 🆕 نظام البصمة الفريدة للتحديثات
 # -------------------------------
-def get_file_fingerprint():
-    """إنشاء بصمة فريدة للملف بناءً على وقت التعديل والمحتوى"""
-    if not os.path.exists(LOCAL_FILE):
-        return "initial"
-    
-    try:
-        # استخدام وقت التعديل وحجم الملف لإنشاء بصمة
-        stat = os.stat(LOCAL_FILE)
-        file_info = f"{stat.st_mtime}_{stat.st_size}"
-        
-        # إضافة هاش للمحتوى لزيادة الدقة (اختياري لأداء أفضل)
-        with open(LOCAL_FILE, "rb") as f:
-            file_hash = hashlib.md5(f.read()).hexdigest()[:8]
-        
-        return f"{file_info}_{file_hash}"
-    except Exception:
-        return str(datetime.now().timestamp())
+@st.cache_resource(show_spinner=False)
+def get_storage():
+    """طبقة التخزين المختارة (واحدة لكل العملية)"""
+    cache_dir = SHEET_CACHE_DIR if USE_SHEET_CACHE else None
+    return open_backend(STORAGE_MODE, LOCAL_FILE, db_path=STORAGE_DB, cache_dir=cache_dir,
+                        generations=WORKBOOK_GENERATIONS, max_loaded=MAX_LOADED_SHEETS)
+
+@st.cache_resource(show_spinner=False)
+def get_sync_service():
+    """
+    خدمة واحدة لكل العملية: تحتفظ بالبصمة الحالية (من طبقة التخزين: هاش الملف أو رقم مراجعة القاعدة)
+    وتجلب من GitHub دورياً في الخلفية إذا لم تكن هناك تعديلات محلية غير مرفوعة
+    """
+    sync = get_github_sync()
+    storage = get_storage()
+
+    def poll():
+        if storage.has_pending_changes():
+            return {"changed": False, "status": "local-changes"}
+        run = metrics.begin_run(kind="github-sync")
+        try:
+            return sync.fetch_raw(only_if_clean=True)
+        finally:
+            metrics.end_run(run)
+
+    return SyncService(LOCAL_FILE, poll=poll, interval=SYNC_INTERVAL_SECONDS, fingerprint=storage.fingerprint)
 
 def update_fingerprint():
     """تحديث البصمة في حالة الجلسة"""
-    st.session_state["file_fingerprint"] = get_file_fingerprint()
+    st.session_state["file_fingerprint"] = get_sync_service().current_fingerprint()
 
+@metrics.timed("fingerprint")
 def get_current_fingerprint():
-    """الحصول على البصمة الحالية أو إنشاء واحدة جديدة"""
-    if "file_fingerprint" not in st.session_state:
-        st.session_state["file_fingerprint"] = get_file_fingerprint()
+    """البصمة الحالية المشتركة بين كل الجلسات — أي حفظ أو مزامنة يظهر في التشغيل التالي لكل جلسة"""
+    update_fingerprint()
     return st.session_state["file_fingerprint"]
 
 # -------------------------------
@@ -98,78 +139,32 @@ def load_users():
     if not os.path.exists(USERS_FILE):
         # انشئ ملف افتراضي اذا مش موجود (يوجد admin بكلمة مرور افتراضية "admin" — غيرها فورًا)
         default = {"admin": {"password": "admin"}}
-        with open(USERS_FILE, "w", encoding="utf-8") as f:
-            json.dump(default, f, indent=4, ensure_ascii=False)
+        atomic_write_json(USERS_FILE, default)
         return default
     try:
-        with open(USERS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+        users, generation = read_json(USERS_FILE)
     except Exception as e:
         st.error(f"❌ خطأ في ملف users.json: {e}")
         st.stop()
+    if generation:
+        st.warning(f"⚠ ملف users.json تالف — تم استخدام النسخة السابقة رقم {generation}.")
+    return users
 
 def save_users(users):
-    with open(USERS_FILE, "w", encoding="utf-8") as f:
-        json.dump(users, f, indent=4, ensure_ascii=False)
-
-def load_state():
-    if not os.path.exists(STATE_FILE):
-        with open(STATE_FILE, "w", encoding="utf-8") as f:
-            json.dump({}, f, indent=4, ensure_ascii=False)
-        return {}
-    try:
-        with open(STATE_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
+    atomic_write_json(USERS_FILE, users, generations=JSON_GENERATIONS)
 
-def save_state(state):
-    with open(STATE_FILE, "w", encoding="utf-8") as f:
-        json.dump(state, f, indent=4, ensure_ascii=False)
-
-def cleanup_sessions(state):
-    now = datetime.now()
-    changed = False
-    for user, info in list(state.items()):
-        if info.get("active") and "login_time" in info:
-            try:
-                login_time = datetime.fromisoformat(info["login_time"])
-                if now - login_time > SESSION_DURATION:
-                    info["active"] = False
-                    info.pop("login_time", None)
-                    changed = True
-            except Exception:
-                info["active"] = False
-                changed = True
-    if changed:
-        save_state(state)
-    return state
-
-def remaining_time(state, username):
-    if not username or username not in state:
-        return None
-    info = state.get(username)
-    if not info or not info.get("active"):
-        return None
-    try:
-        lt = datetime.fromisoformat(info["login_time"])
-        remaining = SESSION_DURATION - (datetime.now() - lt)
-        if remaining.total_seconds() <= 0:
-            return None
-        return remaining
-    except Exception:
-        return None
+@st.cache_resource(show_spinner=False)
+def get_session_store():
+    """سجل جلسات واحد لكل العملية (الجلسات النشطة من state.json تُنقل مرة واحدة)"""
+    return SessionStore(SESSION_DB, SESSION_DURATION, migrate_from=STATE_FILE)
 
 # -------------------------------
 # 🔐 تسجيل الخروج (مصحح وآمن)
 # -------------------------------
 def logout_action():
-    state = load_state()
     username = st.session_state.get("username")
-    if username and username in state:
-        state[username]["active"] = False
-        state[username].pop("login_time", None)
-        save_state(state)
+    if username:
+        get_session_store().release(username)
     # احذف متغيرات الجلسة بطريقة آمنة (ننسخ المفاتيح أولاً)
     try:
         keys = list(st.session_state.keys())
@@ -189,7 +184,7 @@ def logout_action():
 # -------------------------------
 def login_ui():
     users = load_users()
-    state = cleanup_sessions(load_state())
+    sessions = get_session_store()
     if "logged_in" not in st.session_state:
         st.session_state.logged_in = False
         st.session_state.username = None
@@ -200,23 +195,20 @@ def login_ui():
     username_input = st.selectbox("👤 اختر المستخدم", list(users.keys()))
     password = st.text_input("🔑 كلمة المرور", type="password")
 
-    active_users = [u for u, v in state.items() if v.get("active")]
-    active_count = len(active_users)
+    active_count = len(sessions.active_users())
     st.caption(f"🔒 المستخدمون النشطون الآن: {active_count} / {MAX_ACTIVE_USERS}")
 
     if not st.session_state.logged_in:
         if st.button("تسجيل الدخول"):
             if username_input in users and users[username_input]["password"] == password:
-                if username_input == "admin":
-                    pass
-                elif username_input in active_users:
+                # فحص وحجز المقعد في معاملة واحدة
+                result = sessions.acquire(username_input, MAX_ACTIVE_USERS, bypass_limit=(username_input == "admin"))
+                if result == ALREADY_ACTIVE:
                     st.warning("⚠ هذا المستخدم مسجل دخول بالفعل.")
                     return False
-                elif active_count >= MAX_ACTIVE_USERS:
+                elif result == NO_SLOTS:
                     st.error("🚫 الحد الأقصى للمستخدمين المتصلين حالياً.")
                     return False
-                state[username_input] = {"active": True, "login_time": datetime.now().isoformat()}
-                save_state(state)
                 st.session_state.logged_in = True
                 st.session_state.username = username_input
                 st.success(f"✅ تم تسجيل الدخول: {username_input}")
@@ -228,7 +220,7 @@ def login_ui():
     else:
         username = st.session_state.username
         st.success(f"✅ مسجل الدخول كـ: {username}")
-        rem = remaining_time(state, username)
+        rem = sessions.remaining(username)
         if rem:
             mins, secs = divmod(int(rem.total_seconds()), 60)
             st.info(f"⏳ الوقت المتبقي: {mins:02d}:{secs:02d}")
@@ -244,13 +236,50 @@ def login_ui():
 # -------------------------------
 # 🔄 طرق جلب الملف من GitHub
 # -------------------------------
-def fetch_from_github_requests():
-    """تحميل بإستخدام رابط RAW (requests)"""
+@st.cache_resource(show_spinner=False)
+def get_github_sync():
+    """عميل مزامنة واحد لكل العملية (جلسة HTTP واحدة + عميل Github محفوظ)"""
+    return GithubSync(LOCAL_FILE, GITHUB_EXCEL_URL, meta_file=SYNC_META_FILE, generations=WORKBOOK_GENERATIONS)
+
+def pending_pushes():
+    """عدد طلبات الرفع المنتظرة (من الطابور الحي، أو من ملفه إذا لم يكن هناك توكين)"""
+    token = st.secrets.get("github", {}).get("token", None)
+    if token and GITHUB_AVAILABLE:
+        return get_push_queue(token).status()["depth"]
+    return len(load_pending(PUSH_QUEUE_FILE))
+
+LOCAL_CHANGES_WARNING = "✋ توجد تعديلات محلية لم تُرفع إلى GitHub — فعّل خيار الاستبدال لتأكيد الكتابة فوقها."
+
+def fetch_blocked(overwrite=False):
+    """
+    سبب منع التحديث اليدوي من GitHub، أو None — نفس شروط الجلب الدوري:
+    طلبات الرفع المنتظرة وتعديلات قاعدة sqlite غير المصدّرة تمنعه دائماً (الطابور سيرفع الملف
+    المجلوب أو يدمج على أساس استُبدل، والقاعدة لا تستورد فوق تعديلاتها)، والملف المعدّل منذ آخر
+    مزامنة لا يُكتب فوقه إلا بتأكيد صريح
+    """
+    depth = pending_pushes()
+    if depth:
+        return f"⏳ توجد {depth} طلبات رفع إلى GitHub لم تكتمل — انتظر انتهاء الرفع ثم حدّث الملف."
+    if get_storage().has_pending_changes():
+        return "⏳ توجد تعديلات في قاعدة البيانات لم تُصدَّر بعد — احفظها وارفعها إلى GitHub أولاً."
+    if not overwrite and not get_github_sync().is_clean():
+        return LOCAL_CHANGES_WARNING
+    return None
+
+def fetch_from_github_requests(overwrite=False):
+    """تحميل بإستخدام رابط RAW (requests) — مشروط بـ ETag"""
+    blocked = fetch_blocked(overwrite)
+    if blocked:
+        st.warning(blocked)
+        return
     try:
-        response = requests.get(GITHUB_EXCEL_URL, stream=True, timeout=20)
-        response.raise_for_status()
-        with open(LOCAL_FILE, "wb") as f:
-            shutil.copyfileobj(response.raw, f)
+        result = get_github_sync().fetch_raw(only_if_clean=not overwrite)
+        if result["status"] == "local-changes":
+            st.warning(LOCAL_CHANGES_WARNING)
+            return
+        if not result["changed"]:
+            st.info("ℹ الملف المحلي مطابق لنسخة GitHub — لا حاجة للتحديث.")
+            return
         # تحديث البصمة بدلاً من مسح الكاش
         update_fingerprint()
         st.success("✅ تم تحديث البيانات من GitHub بنجاح وتم تحديث البصمة.")
@@ -258,24 +287,30 @@ def fetch_from_github_requests():
     except Exception as e:
         st.error(f"⚠ فشل التحديث من GitHub (requests): {e}")
 
-def fetch_from_github_api():
-    """تحميل عبر GitHub API (باستخدام PyGithub token في secrets)"""
+def fetch_from_github_api(overwrite=False):
+    """تحميل عبر GitHub API (باستخدام PyGithub token في secrets) — مشروط بـ sha"""
     if not GITHUB_AVAILABLE:
         st.warning("PyGithub غير متوفر، سيتم المحاولة عبر رابط RAW.")
-        fetch_from_github_requests()
+        fetch_from_github_requests(overwrite)
+        return
+    blocked = fetch_blocked(overwrite)
+    if blocked:
+        st.warning(blocked)
         return
     try:
         token = st.secrets.get("github", {}).get("token", None)
         if not token:
             st.warning("توكين GitHub غير موجود في secrets، سيتم التحميل عبر رابط RAW.")
-            fetch_from_github_requests()
+            fetch_from_github_requests(overwrite)
+            return
+        result = get_github_sync().fetch_api(lambda: Github(token), REPO_NAME, FILE_PATH, branch=BRANCH, key=token,
+                                             only_if_clean=not overwrite)
+        if result.get("status") == "local-changes":
+            st.warning(LOCAL_CHANGES_WARNING)
+            return
+        if not result["changed"]:
+            st.info("ℹ الملف المحلي مطابق لنسخة GitHub — لا حاجة للتحديث.")
             return
-        g = Github(token)
-        repo = g.get_repo(REPO_NAME)
-        file_content = repo.get_contents(FILE_PATH, ref=BRANCH)
-        content = b64decode(file_content.content)
-        with open(LOCAL_FILE, "wb") as f:
-            f.write(content)
         # تحديث البصمة بدلاً من مسح الكاش
         update_fingerprint()
         st.success("✅ تم تحميل الملف من GitHub API بنجاح.")
@@ -286,50 +321,121 @@ def fetch_from_github_api():
 # -------------------------------
 # 📂 تحميل الشيتات (مخبأ مع البصمة)
 # -------------------------------
-@st.cache_data(show_spinner=False)
-def load_all_sheets(_fingerprint):
+@st.cache_resource(show_spinner=False, max_entries=2)
+@metrics.timed("sheets.load_store")  # داخل الكاش: يُقاس عند خطأ الكاش فقط
+def load_sheet_store(fingerprint):
     """
-    تحميل جميع الشيتات مع استخدام البصمة كمفتاح كاش
-    البصمة تضمن أن أي تحديث جديد سيؤدي لتحميل جديد
+    مخزن واحد لكل بصمة مشترك بين كل الجلسات
+    البصمة هي مفتاح الكاش: أي تحديث جديد للملف يؤدي لمخزن جديد
+    (كل شيت يُقرأ عند أول طلب فقط، والمحمّل منها محدود بـ MAX_LOADED_SHEETS)
     """
-    if not os.path.exists(LOCAL_FILE):
+    store = get_storage().load_store(fingerprint)
+    if store is None:
         return None
-    sheets = pd.read_excel(LOCAL_FILE, sheet_name=None)
-    for name, df in sheets.items():
-        df.columns = df.columns.str.strip()
-    return sheets
+    # تطبيع أسماء الخدمات مرة واحدة عند التحميل
+    precompute_service_names(store.typed, {name: df.columns for name, df in store.loaded_sheets().items()})
+    return store
+
+def load_all_sheets(fingerprint):
+    """الشيتات بأنواع مستنتجة (لفحص الماكينات) من نفس المخزن"""
+    store = load_sheet_store(fingerprint)
+    if store is None:
+        return None
+    return store.typed_sheets()
 
 # نسخة مع dtype=object لواجهة التحرير
-@st.cache_data(show_spinner=False)
-def load_sheets_for_edit(_fingerprint):
+def load_sheets_for_edit(fingerprint):
     """
-    تحميل الشيتات للتحرير مع استخدام البصمة كمفتاح كاش
+    الشيتات للتحرير (dtype=object) من نفس المخزن: قائمة الأسماء متاحة فوراً
+    وكل تبويب يحمّل الشيت المختار فقط
     """
-    if not os.path.exists(LOCAL_FILE):
+    store = load_sheet_store(fingerprint)
+    if store is None:
         return None
-    sheets = pd.read_excel(LOCAL_FILE, sheet_name=None, dtype=object)
-    for name, df in sheets.items():
-        df.columns = df.columns.str.strip()
-    return sheets
+    return store.edit_sheets()
+
+def get_edit_store(fingerprint):
+    """
+    المخزن الذي تُبنى عليه تعديلات الجلسة: يبقى ثابتاً (مرجع في الجلسة حتى لو خرج من الكاش)
+    حتى تحفظ الجلسة أو تطلب أحدث نسخة، فأرقام الصفوف وحالة المحرر تشير دائماً لما يراه المستخدم،
+    والحفظ يحمل بصمته (base) فيُدمج مع ما حفظته الجلسات الأخرى بعده بدل الكتابة فوقه
+    """
+    store = st.session_state.get("edit_store")
+    if store is None or store.fingerprint is None:
+        store = load_sheet_store(fingerprint)
+        if store is not None:
+            st.session_state["edit_store"] = store
+    return store
+
+def read_edit_store(read):
+    """
+    قراءة من مخزن الجلسة. في وضع sqlite قد يكون الشيت خرج من الذاكرة وعدّلته جلسة أخرى بعد
+    تحميل المخزن (StaleSheet): نبدأ التحرير من أحدث نسخة بدل عرض صفوف من مراجعتين
+    """
+    try:
+        return read()
+    except StaleSheet as e:
+        st.session_state.pop("edit_store", None)
+        st.session_state["stale_edit_notice"] = str(e)
+        safe_rerun()
+        st.stop()
+
+def load_insert_keys(store, sheet_name, card_col, min_col, max_col):
+    """مفاتيح (card, Min, Max) الرقمية للشيت — تُبنى مرة واحدة لكل بصمة"""
+    return store.derived(
+        ("insert_keys", sheet_name, card_col, min_col, max_col),
+        lambda: insert_keys(store.raw[sheet_name], card_col, min_col, max_col),
+    )
+
+def load_sheet_view(fingerprint, sheet_name):
+    """
+    النسخة النصية للشيت (للعرض والمحرر) محفوظة مع المخزن لكل بصمة:
+    لا تُنسخ الشيتات في كل تشغيل، والتبويبات التي تعدّل تعمل على الإطار الأساسي
+    """
+    return load_sheet_store(fingerprint).string_view(sheet_name)
+
+def get_edit_batch():
+    """دفعة التعديلات المنتظرة للجلسة الحالية (تُحفظ كلها مرة واحدة من تبويب الدفعة)"""
+    if "edit_batch" not in st.session_state:
+        st.session_state["edit_batch"] = EditBatch()
+    return st.session_state["edit_batch"]
 
 # -------------------------------
 # 🔁 حفظ محلي + رفع على GitHub + تحديث البصمة + إعادة تحميل
 # -------------------------------
-def save_local_excel_and_push(sheets_dict, commit_message="Update from Streamlit"):
+def save_local_excel(sheets_dict, dirty_sheets=None, change_log=None):
+    """
+    حفظ محلي عبر طبقة التخزين: يعيد كتابة الشيتات المعدّلة فقط (dirty_sheets) إن أمكن
+    يحفظ تقرير الحفظ (البايتات والزمن) في الجلسة ويحدّث البصمة
+    change_log: سجل التعديل (row_patch.change_log_entry) يُضاف لسجل التغييرات بعد نجاح الحفظ فقط
+    """
+    # base: بصمة النسخة التي عُدّلت؛ إذا حفظت جلسة أخرى بعدها تُدمج التعديلات أو يُرفع SaveConflict
+    with metrics.span("storage.save"):
+        report = get_storage().save(sheets_dict, dirty=dirty_sheets, base=getattr(sheets_dict, "base_fingerprint", None))
+    st.session_state["last_save_report"] = report
+    # التحرير التالي يبدأ من النسخة المحفوظة
+    st.session_state.pop("edit_store", None)
+    # تحديث البصمة بدلاً من مسح الكاش
+    update_fingerprint()
+    if change_log is not None:
+        try:
+            append_jsonl(CHANGE_LOG_FILE, dict(change_log, fingerprint=get_current_fingerprint()))
+        except Exception as e:
+            st.warning(f"⚠ تعذر تسجيل التعديل في سجل التغييرات: {e}")
+    return report
+
+def save_local_excel_and_push(sheets_dict, commit_message="Update from Streamlit", dirty_sheets=None, change_log=None):
     # احفظ محلياً
+    # None = لم يُحفظ شيء
     try:
-        with pd.ExcelWriter(LOCAL_FILE, engine="openpyxl") as writer:
-            for name, sh in sheets_dict.items():
-                try:
-                    sh.to_excel(writer, sheet_name=name, index=False)
-                except Exception:
-                    sh.astype(object).to_excel(writer, sheet_name=name, index=False)
+        save_local_excel(sheets_dict, dirty_sheets, change_log)
+    except SaveConflict as e:
+        st.error(f"⚠ لم يتم الحفظ: الشيتات {', '.join(e.sheets)} عدّلتها جلسة أخرى في نفس الصفوف بعد تحميلها. "
+                 f"حمّل أحدث نسخة وأعد التعديل. ({e})")
+        return None
     except Exception as e:
         st.error(f"⚠ خطأ أثناء الحفظ المحلي: {e}")
-        return load_sheets_for_edit(get_current_fingerprint())
-
-    # تحديث البصمة بدلاً من مسح الكاش
-    update_fingerprint()
+        return None
 
     # حاول الرفع عبر PyGithub token في secrets
     token = st.secrets.get("github", {}).get("token", None)
@@ -341,47 +447,64 @@ def save_local_excel_and_push(sheets_dict, commit_message="Update from Streamlit
         st.error("PyGithub غير مثبت على بيئتك. تثبيته مطلوب للرفع التلقائي.")
         return load_sheets_for_edit(get_current_fingerprint())
 
-    try:
-        g = Github(token)
-        repo = g.get_repo(REPO_NAME)
-        with open(LOCAL_FILE, "rb") as f:
-            content = f.read()
-
-        try:
-            contents = repo.get_contents(FILE_PATH, ref=BRANCH)
-            repo.update_file(path=FILE_PATH, message=commit_message, content=content, sha=contents.sha, branch=BRANCH)
-        except Exception:
-            # حاول رفع كملف جديد أو إنشاء
-            try:
-                repo.create_file(path=FILE_PATH, message=commit_message, content=content, branch=BRANCH)
-            except Exception as e2:
-                st.error(f"⚠ فشل رفع الملف إلى GitHub: {e2}")
-                return load_sheets_for_edit(get_current_fingerprint())
-
-        st.success("✅ تم الحفظ والرفع على GitHub بنجاح.")
-        # إعادة تحميل النسخة المعدّلة للواجهة باستخدام البصمة الجديدة
-        safe_rerun()
-        return load_sheets_for_edit(get_current_fingerprint())
-    except Exception as e:
-        st.error(f"⚠ فشل الاتصال بـ GitHub: {e}")
-        return load_sheets_for_edit(get_current_fingerprint())
+    # الرفع يتم في الخلفية: نضيف الطلب للطابور ونرجع فوراً
+    depth = get_push_queue(token).enqueue(commit_message, fingerprint=get_current_fingerprint())
+    st.success(f"✅ تم الحفظ محلياً، والرفع إلى GitHub يتم في الخلفية (في الطابور: {depth}).")
+    # إعادة تحميل النسخة المعدّلة للواجهة باستخدام البصمة الجديدة
+    safe_rerun()
+    return load_sheets_for_edit(get_current_fingerprint())
 
 # -------------------------------
-# 🧰 دوال مساعدة للمعالجة والنصوص
+# 📤 طابور الرفع إلى GitHub (خيط واحد لكل العملية)
 # -------------------------------
-def normalize_name(s):
-    if s is None: return ""
-    s = str(s).replace("\n", "+")
-    s = re.sub(r"[^0-9a-zA-Z\u0600-\u06FF\+\s_/.-]", " ", s)
-    s = re.sub(r"\s+", " ", s).strip().lower()
-    return s
+@st.cache_resource(show_spinner=False)
+def get_push_queue(token):
+    """طابور واحد مشترك بين كل الجلسات، بعميل Github واحد يعاد استخدامه"""
+    return PushQueue(
+        lambda: Github(token), REPO_NAME, FILE_PATH, LOCAL_FILE,
+        branch=BRANCH, queue_file=PUSH_QUEUE_FILE,
+        prepare=get_storage().export_xlsx,  # وضع sqlite: تصدير XLSX مرة واحدة لكل دفعة
+        on_pushed=get_github_sync().mark_synced,  # بعد الرفع: المحلي = الريبو، فيستأنف الجلب الدوري
+        # الرفع فوق آخر نسخة متزامنة؛ إذا رفع غيرنا بعدها تُدمج نسخته محلياً ثم نرفع فوقها
+        base_sha=get_github_sync().synced_sha,
+        merge=lambda base, theirs: merge_remote(get_storage(), base, theirs),
+    )
 
-def split_needed_services(needed_service_str):
-    if not isinstance(needed_service_str, str) or needed_service_str.strip() == "":
-        return []
-    parts = re.split(r"\+|,|\n|;", needed_service_str)
-    return [p.strip() for p in parts if p.strip() != ""]
+def show_push_status():
+    """عدد الطلبات المنتظرة ونتيجة آخر رفع (في الشريط الجانبي)"""
+    token = st.secrets.get("github", {}).get("token", None)
+    if not token or not GITHUB_AVAILABLE:
+        return
+    status = get_push_queue(token).status()
+    state = "⏫ جاري الرفع" if status["pushing"] else "📤 طابور الرفع"
+    st.caption(f"{state}: {status['depth']} في الانتظار")
+    last = status["last_result"]
+    if last:
+        if last["ok"]:
+            merged = " بعد دمج نسخة أحدث من GitHub" if last.get("merged") else ""
+            st.caption(f"✅ آخر رفع {last['time']} ({last['edits']} تعديل){merged}")
+        else:
+            st.caption(f"⚠ فشل آخر رفع {last['time']} (محاولة {last['attempts']}): {last['error']}")
+
+def show_sync_status():
+    """آخر جلب دوري من GitHub (في الشريط الجانبي)"""
+    status = get_sync_service().status()
+    if not status["running"]:
+        return
+    last = status["last_poll"]
+    if last is None:
+        st.caption(f"⏲ مزامنة تلقائية كل {status['interval']} ثانية")
+    elif not last["ok"]:
+        st.caption(f"⚠ فشلت المزامنة التلقائية {last['time']}: {last['error']}")
+    elif last.get("status") == "local-changes":
+        st.caption(f"⏲ {last['time']}: توجد تعديلات محلية لم تُرفع — تم تخطي الجلب")
+    else:
+        state = "تم تحديث الملف" if last["changed"] else "لا تغيير"
+        st.caption(f"⏲ آخر مزامنة {last['time']}: {state} (مراجعة {status['revision']})")
 
+# -------------------------------
+# 🎨 تنسيق جدول النتائج
+# -------------------------------
 def highlight_cell(val, col_name):
     color_map = {
         "Service Needed": "background-color: #fff3cd; color:#856404; font-weight:bold;",
@@ -403,140 +526,150 @@ def style_table(row):
 # -------------------------------
 # 🖥 دالة فحص الماكينة - معدلة لعرض الأعمدة المطلوبة
 # -------------------------------
+@metrics.timed("check_machine_status")
 def check_machine_status(card_num, current_tons, all_sheets):
     if not all_sheets or "ServicePlan" not in all_sheets:
         st.error("❌ الملف لا يحتوي على شيت ServicePlan.")
         return
-    service_plan_df = all_sheets["ServicePlan"]
     card_sheet_name = f"Card{card_num}"
     if card_sheet_name not in all_sheets:
         st.warning(f"⚠ لا يوجد شيت باسم {card_sheet_name}")
         return
-    card_df = all_sheets[card_sheet_name]
 
     # نطاق العرض
     if "view_option" not in st.session_state:
-        st.session_state.view_option = "الشريحة الحالية فقط"
+        st.session_state.view_option = VIEW_CURRENT
 
     st.subheader("⚙ نطاق العرض")
     view_option = st.radio(
         "اختر نطاق العرض:",
-        ("الشريحة الحالية فقط", "كل الشرائح الأقل", "كل الشرائح الأعلى", "نطاق مخصص", "كل الشرائح"),
+        VIEW_OPTIONS,
         horizontal=True,
         key="view_option"
     )
 
     min_range = st.session_state.get("min_range", max(0, current_tons - 500))
     max_range = st.session_state.get("max_range", current_tons + 500)
-    if view_option == "نطاق مخصص":
+    if view_option == VIEW_CUSTOM:
         col1, col2 = st.columns(2)
         with col1:
             min_range = st.number_input("من (طن):", min_value=0, step=100, value=min_range, key="min_range")
         with col2:
             max_range = st.number_input("إلى (طن):", min_value=min_range, step=100, value=max_range, key="max_range")
 
-    # اختيار الشرائح
-    if view_option == "الشريحة الحالية فقط":
-        selected_slices = service_plan_df[(service_plan_df["Min_Tones"] <= current_tons) & (service_plan_df["Max_Tones"] >= current_tons)]
-    elif view_option == "كل الشرائح الأقل":
-        selected_slices = service_plan_df[service_plan_df["Max_Tones"] <= current_tons]
-    elif view_option == "كل الشرائح الأعلى":
-        selected_slices = service_plan_df[service_plan_df["Min_Tones"] >= current_tons]
-    elif view_option == "نطاق مخصص":
-        selected_slices = service_plan_df[(service_plan_df["Min_Tones"] >= min_range) & (service_plan_df["Max_Tones"] <= max_range)]
-    else:
-        selected_slices = service_plan_df.copy()
+    # اختيار الشرائح وحساب الحالة (محرك status_engine مع فهارس الفترات المحفوظة)،
+    # والنتيجة محفوظة مع مخزن البصمة: تشغيل بسبب أي ودجت آخر يرجع نفس الجدول
+    with metrics.span("status.machine_table"):
+        result_df = cached_status_table(card_num, current_tons, all_sheets, view_option, min_range, max_range,
+                                        max_entries=STATUS_CACHE_SIZE)
 
-    if selected_slices.empty:
+    if result_df is None:
         st.warning("⚠ لا توجد شرائح مطابقة حسب النطاق المحدد.")
         return
 
-    all_results = []
-    for _, current_slice in selected_slices.iterrows():
-        slice_min = current_slice["Min_Tones"]
-        slice_max = current_slice["Max_Tones"]
-        needed_service_raw = current_slice.get("Service", "")
-        needed_parts = split_needed_services(needed_service_raw)
-        needed_norm = [normalize_name(p) for p in needed_parts]
-
-        mask = (card_df.get("Min_Tones", 0).fillna(0) <= slice_max) & (card_df.get("Max_Tones", 0).fillna(0) >= slice_min)
-        matching_rows = card_df[mask]
-
-        done_services_set = set()
-        last_date = "-"
-        last_tons = "-"
-        last_other = "-"
-        last_servised_by = "-"
-        last_event = "-"
-        last_correction = "-"
-
-        if not matching_rows.empty:
-            ignore_cols = {"card", "Tones", "Min_Tones", "Max_Tones", "Date", "Other", "Servised by", "Event", "Correction"}
-            for _, r in matching_rows.iterrows():
-                for col in matching_rows.columns:
-                    if col not in ignore_cols:
-                        val = str(r.get(col, "")).strip()
-                        if val and val.lower() not in ["nan", "none", ""]:
-                            done_services_set.add(col)
-            # قراءة آخر تاريخ
-            if "Date" in matching_rows.columns:
-                try:
-                    cleaned_dates = matching_rows["Date"].astype(str).str.replace("\\", "/", regex=False)
-                    dates = pd.to_datetime(cleaned_dates, errors="coerce", dayfirst=True)
-                    if dates.notna().any():
-                        idx = dates.idxmax()
-                        last_date = dates.loc[idx].strftime("%d/%m/%Y")
-                except Exception:
-                    last_date = "-"
-            # آخر طن
-            if "Tones" in matching_rows.columns:
-                tons_vals = pd.to_numeric(matching_rows["Tones"], errors="coerce")
-                if tons_vals.notna().any():
-                    last_tons = int(tons_vals.max())
-            # Other
-            if "Other" in matching_rows.columns:
-                last_other = str(matching_rows["Other"].dropna().iloc[-1]) if matching_rows["Other"].notna().any() else "-"
-            # Servised by
-            if "Servised by" in matching_rows.columns:
-                last_servised_by = str(matching_rows["Servised by"].dropna().iloc[-1]) if matching_rows["Servised by"].notna().any() else "-"
-            # Event
-            if "Event" in matching_rows.columns:
-                last_event = str(matching_rows["Event"].dropna().iloc[-1]) if matching_rows["Event"].notna().any() else "-"
-            # Correction
-            if "Correction" in matching_rows.columns:
-                last_correction = str(matching_rows["Correction"].dropna().iloc[-1]) if matching_rows["Correction"].notna().any() else "-"
-
-        done_services = sorted(list(done_services_set))
-        done_norm = [normalize_name(c) for c in done_services]
-        not_done = [orig for orig, n in zip(needed_parts, needed_norm) if n not in done_norm]
-
-        all_results.append({
-            "Card Number": card_num,
-            "Min_Tons": slice_min,
-            "Max_Tons": slice_max,
-            "Service Needed": " + ".join(needed_parts) if needed_parts else "-",
-            "Service Done": ", ".join(done_services) if done_services else "-",
-            "Service Didn't Done": ", ".join(not_done) if not_done else "-",
-            "Event": last_event,
-            "Correction": last_correction,
-            "Servised by": last_servised_by,
-            "Date": last_date
-        })
-
-    result_df = pd.DataFrame(all_results).dropna(how="all").reset_index(drop=True)
-
     st.markdown("### 📋 نتائج الفحص")
     st.dataframe(result_df.style.apply(style_table, axis=1), use_container_width=True)
 
-    # تنزيل النتائج
-    buffer = io.BytesIO()
-    result_df.to_excel(buffer, index=False, engine="openpyxl")
-    st.download_button(
-        label="💾 حفظ النتائج كـ Excel",
-        data=buffer.getvalue(),
-        file_name=f"Service_Report_Card{card_num}.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
+    # تنزيل النتائج: الملف يُكتب عند الضغط فقط، ومحفوظ مع جدول الحالة بنفس مفتاح الاستعلام
+    key = status_table_key(card_num, current_tons, view_option, min_range, max_range)
+    memo = getattr(all_sheets, "memo", None)
+    col_xlsx, col_csv = st.columns(2)
+    with col_xlsx:
+        st.download_button(
+            label="💾 حفظ النتائج كـ Excel",
+            data=deferred_report(result_df, "xlsx", memo, key, STATUS_CACHE_SIZE),
+            file_name=f"Service_Report_Card{card_num}.xlsx",
+            mime=XLSX_MIME,
+        )
+    with col_csv:
+        st.download_button(
+            label="💾 حفظ النتائج كـ CSV",
+            data=deferred_report(result_df, "csv", memo, key, STATUS_CACHE_SIZE),
+            file_name=f"Service_Report_Card{card_num}.csv",
+            mime=CSV_MIME,
+        )
+
+# -------------------------------
+# ⏱ لوحة القياسات (admin فقط)
+# -------------------------------
+def show_metrics_panel():
+    """تفصيل آخر تشغيل للصفحة + شرائح الأزمنة والعدّادات على مستوى العملية"""
+    with st.expander("⏱ القياسات"):
+        st.toggle(
+            "تفعيل القياس (لكل العملية)", value=metrics.enabled(), key="metrics_enabled",
+            on_change=lambda: metrics.set_enabled(st.session_state["metrics_enabled"]),
+        )
+        if not metrics.enabled():
+            st.caption("القياس متوقف (CMMS_METRICS=1 لتفعيله عند التشغيل).")
+            return
+        last = st.session_state.get("metrics_last_run")
+        if last is not None:
+            cut = " (لم يكتمل)" if last.interrupted else ""
+            st.caption(f"آخر تشغيل: {last.seconds * 1000:.0f} ms{cut}")
+            st.dataframe(pd.DataFrame(
+                [{"المرحلة": name, "العدد": n, "ms": round(total * 1000, 1)} for name, n, total in last.breakdown()]
+            ), hide_index=True)
+            if last.counters:
+                st.caption(" | ".join(f"{k}: {v}" for k, v in sorted(last.counters.items())))
+        summary = metrics.registry.summary()
+        if summary:
+            st.caption("كل التشغيلات (آخر العينات):")
+            st.dataframe(pd.DataFrame([
+                {"المرحلة": name, "n": row["n"], "p50 ms": round(row["p50"] * 1000, 1),
+                 "p95 ms": round(row["p95"] * 1000, 1), "p99 ms": round(row["p99"] * 1000, 1)}
+                for name, row in sorted(summary.items())
+            ]), hide_index=True)
+        counters = metrics.registry.counters()
+        if counters:
+            st.caption(" | ".join(f"{k}: {v}" for k, v in sorted(counters.items())))
+        if metrics.registry.sink_file:
+            st.caption(f"المخرج: {metrics.registry.sink_file}")
+        if st.button("🧹 تصفير الإحصاءات", key="metrics_reset"):
+            metrics.registry.reset()
+
+# -------------------------------
+# 🏭 تقرير كل الماكينات (الخدمات المتأخرة)
+# -------------------------------
+@st.cache_data(show_spinner=False, max_entries=4)
+@metrics.timed("fleet_report")  # عند خطأ الكاش فقط
+def load_fleet_report(fingerprint):
+    """فحص كل الماكينات مرة واحدة لكل بصمة"""
+    # التقرير يحتاج كل الشيتات: تحميلها دفعة واحدة بدل شيت شيت
+    load_sheet_store(fingerprint).load_all()
+    return fleet_status_report(load_all_sheets(fingerprint))
+
+def show_fleet_report(fingerprint, all_sheets):
+    if not all_sheets or "ServicePlan" not in all_sheets or "Machine" not in all_sheets:
+        st.error("❌ الملف يجب أن يحتوي على شيتي ServicePlan و Machine.")
+        return
+    with st.spinner("⏳ جاري فحص كل الماكينات..."):
+        report_df, missing = load_fleet_report(fingerprint)
+
+    if missing:
+        st.info(f"ℹ لا يوجد شيت للكروت التالية: {missing}")
+    if report_df.empty:
+        st.success("✅ لا توجد خدمات متأخرة.")
+        return
+
+    st.markdown(f"### 📋 الخدمات المتأخرة ({report_df['Card Number'].nunique()} ماكينة)")
+    st.dataframe(report_df, use_container_width=True)
+    # التقرير كبير: CSV هو الافتراضي، و Excel بالكتابة المتتالية — كلاهما يُبنى عند الضغط فقط
+    store = load_sheet_store(fingerprint)
+    col_csv, col_xlsx = st.columns(2)
+    with col_csv:
+        st.download_button(
+            label="💾 حفظ التقرير كـ CSV",
+            data=deferred_report(report_df, "csv", store.memo, ("fleet_report",)),
+            file_name="Fleet_Overdue_Report.csv",
+            mime=CSV_MIME,
+        )
+    with col_xlsx:
+        st.download_button(
+            label="💾 حفظ التقرير كـ Excel",
+            data=deferred_report(report_df, "xlsx", store.memo, ("fleet_report",)),
+            file_name="Fleet_Overdue_Report.xlsx",
+            mime=XLSX_MIME,
+        )
 
 # -------------------------------
 # 🖥 الواجهة الرئيسية المدمجة
@@ -544,6 +677,12 @@ def check_machine_status(card_num, current_tons, all_sheets):
 # إعداد الصفحة
 st.set_page_config(page_title="CMMS - Bail Yarn", layout="wide")
 
+# ⏱ تشغيل الصفحة: التشغيل السابق الذي لم يصل لآخر السكربت (st.stop / إعادة تشغيل) يُغلق عند آخر مرحلة مقاسة
+_unfinished_run = st.session_state.pop("metrics_run", None)
+if _unfinished_run is not None:
+    st.session_state["metrics_last_run"] = metrics.end_run(_unfinished_run, interrupted=True)
+st.session_state["metrics_run"] = metrics.begin_run(st.session_state.get("username"))
+
 # شريط تسجيل الدخول / معلومات الجلسة في الشريط الجانبي
 with st.sidebar:
     st.header("👤 الجلسة")
@@ -551,9 +690,8 @@ with st.sidebar:
         if not login_ui():
             st.stop()
     else:
-        state = cleanup_sessions(load_state())
         username = st.session_state.username
-        rem = remaining_time(state, username)
+        rem = get_session_store().remaining(username)
         if rem:
             mins, secs = divmod(int(rem.total_seconds()), 60)
             st.success(f"👋 {username} | ⏳ {mins:02d}:{secs:02d}")
@@ -562,16 +700,58 @@ with st.sidebar:
 
     st.markdown("---")
     st.write("🔧 أدوات:")
+    # الاستبدال فوق تعديلات محلية غير مرفوعة يحتاج تأكيداً (الجلب الدوري لا يفعله أبداً)
+    overwrite = False
+    if fetch_blocked() == LOCAL_CHANGES_WARNING:
+        overwrite = st.checkbox("⚠ استبدال التعديلات المحلية غير المرفوعة بنسخة GitHub", key="overwrite_local")
     if st.button("🔄 تحديث الملف من GitHub (RAW)"):
-        fetch_from_github_requests()
+        fetch_from_github_requests(overwrite)
     if st.button("🔄 تحديث الملف من GitHub (API)"):
-        fetch_from_github_api()
+        fetch_from_github_api(overwrite)
     
     # 🆕 عرض معلومات البصمة الحالية
     current_fingerprint = get_current_fingerprint()
     st.markdown(f"🆔 بصمة الملف الحالية:")
     st.caption(f"{current_fingerprint[:20]}...")
+    show_push_status()
+    show_sync_status()
+
+    # وضع sqlite: ملف XLSX يُنتج عند الطلب
+    if STORAGE_MODE == STORAGE_SQLITE and st.session_state.get("logged_in"):
+        if st.button("📤 تصدير XLSX من قاعدة البيانات"):
+            try:
+                with open(get_storage().export_xlsx(), "rb") as f:
+                    st.session_state["exported_xlsx"] = f.read()
+            except Exception as e:
+                st.error(f"⚠ فشل التصدير: {e}")
+        if st.session_state.get("exported_xlsx"):
+            st.download_button(
+                "⬇ تحميل الملف",
+                data=st.session_state["exported_xlsx"],
+                file_name=LOCAL_FILE,
+                mime=XLSX_MIME,
+            )
     
+    # ⏪ الرجوع لنسخة سابقة من الملف (بدون إعادة التحميل من GitHub)
+    if st.session_state.get("username") == "admin":
+        generations = list_generations(LOCAL_FILE)
+        if generations:
+            with st.expander("⏪ النسخ السابقة من الملف"):
+                labels = {
+                    g["n"]: f"#{g['n']} — {g['modified'].strftime('%Y-%m-%d %H:%M:%S')} ({g['size'] / 1024:.0f} KB)"
+                    for g in generations
+                }
+                chosen = st.selectbox("اختر النسخة:", list(labels), format_func=labels.get, key="restore_generation")
+                if st.button("⏪ استرجاع هذه النسخة"):
+                    try:
+                        restore_generation(LOCAL_FILE, chosen, generations=WORKBOOK_GENERATIONS)
+                        update_fingerprint()
+                        st.success("✅ تم استرجاع النسخة (النسخة الحالية محفوظة كنسخة سابقة).")
+                        safe_rerun()
+                    except Exception as e:
+                        st.error(f"⚠ فشل الاسترجاع: {e}")
+        show_metrics_panel()
+
     st.markdown("---")
     # زر لإعادة تسجيل الخروج
     if st.button("🚪 تسجيل الخروج"):
@@ -580,7 +760,9 @@ with st.sidebar:
 # 🆕 تحميل الشيتات باستخدام البصمة الحالية
 current_fingerprint = get_current_fingerprint()
 all_sheets = load_all_sheets(current_fingerprint)
-sheets_edit = load_sheets_for_edit(current_fingerprint)
+# التحرير على نسخة الجلسة الثابتة (قد تكون أقدم من current_fingerprint إذا حفظت جلسة أخرى)
+edit_store = get_edit_store(current_fingerprint) if all_sheets is not None else None
+sheets_edit = edit_store.edit_sheets() if edit_store is not None else None
 
 # واجهة التبويبات الرئيسية
 st.title("🏭 CMMS - Bail Yarn")
@@ -607,6 +789,15 @@ with tabs[0]:
         if st.session_state.get("show_results", False):
             check_machine_status(st.session_state.card_num_main, st.session_state.current_tons_main, all_sheets)
 
+        st.markdown("---")
+        st.subheader("🏭 تقرير كل الماكينات")
+        st.caption("الأطنان الحالية من شيت Machine — الخدمات المتأخرة هي ما لم يتم في الشريحة الحالية وكل الشرائح الأقل.")
+        if st.button("📋 عرض تقرير كل الماكينات"):
+            st.session_state["show_fleet_report"] = True
+
+        if st.session_state.get("show_fleet_report", False):
+            show_fleet_report(current_fingerprint, all_sheets)
+
 # -------------------------------
 # Tab: تعديل وإدارة البيانات
 # -------------------------------
@@ -621,169 +812,150 @@ with tabs[1]:
     if sheets_edit is None:
         st.warning("❗ الملف المحلي غير موجود. اضغط تحديث من cloud في الشريط الجانبي أولًا.")
     else:
-        tab1, tab2, tab3, tab4 = st.tabs([
+        if st.session_state.get("last_save_report"):
+            st.caption("آخر حفظ: " + format_save_report(st.session_state["last_save_report"]))
+        if st.session_state.get("stale_edit_notice"):
+            st.info("🔄 الشيت تغيّر في قاعدة البيانات بعد بدء التحرير، فتم تحميل أحدث نسخة. "
+                    f"({st.session_state.pop('stale_edit_notice')})")
+        edit_fingerprint = edit_store.fingerprint
+        if edit_fingerprint != current_fingerprint:
+            st.info("📝 الملف تغيّر منذ بدء التحرير (حفظ من جلسة أخرى). تعديلاتك تُدمج معه عند الحفظ؛ "
+                    "الصفوف التي عدّلها الطرفان فقط تمنع الحفظ.")
+            if st.button("🔄 تحميل أحدث نسخة", key="edit_refresh"):
+                st.session_state.pop("edit_store", None)
+                safe_rerun()
+
+        # وضع الدفعة: الإضافة والحذف تُجمَّع ولا تُحفظ إلا من تبويب الدفعة (حفظ واحد و commit واحد)
+        edit_batch = get_edit_batch()
+        batch_mode = st.toggle(
+            f"📦 وضع الدفعة: تجميع التعديلات وحفظها مرة واحدة (في الدفعة: {len(edit_batch)})",
+            key="batch_mode",
+        )
+
+        tab1, tab2, tab3, tab4, tab5 = st.tabs([
             "عرض وتعديل شيت",
             "إضافة صف جديد (أحداث متتالية)",
             "إضافة عمود جديد",
-            "🗑 حذف صف"
+            "🗑 حذف صف",
+            f"📦 الدفعة والاستيراد ({len(edit_batch)})",
         ])
 
         # Tab1: تعديل بيانات وعرض
         with tab1:
             st.subheader("✏ تعديل البيانات")
             sheet_name = st.selectbox("اختر الشيت:", list(sheets_edit.keys()), key="edit_sheet")
-            df = sheets_edit[sheet_name].astype(str)
-            edited_df = st.data_editor(df, num_rows="dynamic")
+            df = read_edit_store(lambda: edit_store.string_view(sheet_name))
+            # المفتاح يتغير مع البصمة: بعد الحفظ يبدأ المحرر بدون تعديلات قديمة على الشيت الجديد
+            editor_key = f"editor_{sheet_name}_{edit_fingerprint}"
+            st.data_editor(df, num_rows="dynamic", key=editor_key)
             if st.button("💾 حفظ التعديلات", key=f"save_edit_{sheet_name}"):
-                if not can_push:
-                    st.warning("🚫 لا تملك صلاحية الرفع إلى GitHub من هذه الجلسة.")
-                sheets_edit[sheet_name] = edited_df.astype(object)
-                new_sheets = save_local_excel_and_push(
-                    sheets_edit,
-                    commit_message=f"Edit sheet {sheet_name} by {st.session_state.get('username')}"
-                )
-                if isinstance(new_sheets, dict):
-                    sheets_edit = new_sheets
-                st.dataframe(sheets_edit[sheet_name])
+                # الفرق فقط (خلايا معدّلة/صفوف مضافة/محذوفة) بدل استبدال الشيت بنسخته النصية
+                patch = editor_patch(st.session_state.get(editor_key), df)
+                if patch_is_empty(patch):
+                    st.info("لا توجد تعديلات للحفظ.")
+                else:
+                    if not can_push:
+                        st.warning("🚫 لا تملك صلاحية الرفع إلى GitHub من هذه الجلسة.")
+                    base_df = read_edit_store(lambda: sheets_edit[sheet_name])
+                    username = st.session_state.get("username")
+                    message = patch_message(sheet_name, patch, base_df, username)
+                    log_entry = change_log_entry(sheet_name, patch, base_df, username, edit_fingerprint)
+                    sheets_edit.apply_patch(sheet_name, patch)
+                    cells, rows, added, deleted = patch_counts(patch)
+                    st.caption(f"التعديلات: {cells} خلية في {rows} صف، +{added} صف، -{deleted} صف")
+                    new_sheets = save_local_excel_and_push(
+                        sheets_edit,
+                        commit_message=message,
+                        dirty_sheets=[sheet_name],
+                        change_log=log_entry,
+                    )
+                    if new_sheets is not None:
+                        sheets_edit = new_sheets
+                    st.dataframe(load_sheet_view(get_current_fingerprint(), sheet_name))
 
         # Tab2: إضافة صف جديد
         with tab2:
             st.subheader("➕ إضافة صف جديد (سجل حدث جديد داخل نفس الرينج)")
             sheet_name_add = st.selectbox("اختر الشيت لإضافة صف:", list(sheets_edit.keys()), key="add_sheet")
-            df_add = sheets_edit[sheet_name_add].astype(str).reset_index(drop=True)
+            # الإطار الأساسي كما هو (بدون نسخة نصية)
+            df_add = read_edit_store(lambda: sheets_edit[sheet_name_add])
             st.markdown("أدخل بيانات الحدث (يمكنك إدخال أي نص/أرقام/تواريخ)")
             new_data = {}
             for col in df_add.columns:
                 new_data[col] = st.text_input(f"{col}", key=f"add_{sheet_name_add}_{col}")
             if st.button("💾 إضافة الصف الجديد", key=f"add_row_{sheet_name_add}"):
-                new_row_df = pd.DataFrame([new_data]).astype(str)
                 # البحث عن أعمدة الرينج
-                min_col, max_col, card_col = None, None, None
-                for c in df_add.columns:
-                    c_low = c.strip().lower()
-                    if c_low in ("min_tones", "min_tone", "min tones", "min"):
-                        min_col = c
-                    if c_low in ("max_tones", "max_tone", "max tones", "max"):
-                        max_col = c
-                    if c_low in ("card", "machine", "machine_no", "machine id"):
-                        card_col = c
-                if not min_col or not max_col:
+                card_col, min_col, max_col = range_columns(df_add.columns)
+                if batch_mode:
+                    # الموضع يُحسب عند تطبيق الدفعة (بعد الصفوف السابقة في نفس الشيت)
+                    edit_batch.add_row(sheet_name_add, new_data)
+                    st.success(f"📦 أضيف الصف للدفعة ({len(edit_batch)} عملية في الانتظار).")
+                elif not min_col or not max_col:
                     st.error("⚠ لم يتم العثور على أعمدة Min_Tones و/أو Max_Tones في الشيت.")
                 else:
-                    def to_num_or_none(x):
-                        try:
-                            return float(x)
-                        except Exception:
-                            return None
                     new_min_raw = str(new_data.get(min_col, "")).strip()
                     new_max_raw = str(new_data.get(max_col, "")).strip()
-                    new_min_num = to_num_or_none(new_min_raw)
-                    new_max_num = to_num_or_none(new_max_raw)
-                    # العثور على موضع الإدراج
-                    insert_pos = len(df_add)
-                    mask = pd.Series([False] * len(df_add))
-                    if card_col:
-                        new_card = str(new_data.get(card_col, "")).strip()
-                        if new_card != "":
-                            if new_min_num is not None and new_max_num is not None:
-                                mask = (
-                                    (df_add[card_col].astype(str).str.strip() == new_card) &
-                                    (pd.to_numeric(df_add[min_col], errors='coerce') == new_min_num) &
-                                    (pd.to_numeric(df_add[max_col], errors='coerce') == new_max_num)
-                                )
-                            else:
-                                mask = (
-                                    (df_add[card_col].astype(str).str.strip() == new_card) &
-                                    (df_add[min_col].astype(str).str.strip() == new_min_raw) &
-                                    (df_add[max_col].astype(str).str.strip() == new_max_raw)
-                                )
-                    else:
-                        if new_min_num is not None and new_max_num is not None:
-                            mask = (
-                                (pd.to_numeric(df_add[min_col], errors='coerce') == new_min_num) &
-                                (pd.to_numeric(df_add[max_col], errors='coerce') == new_max_num)
-                            )
-                        else:
-                            mask = (
-                                (df_add[min_col].astype(str).str.strip() == new_min_raw) &
-                                (df_add[max_col].astype(str).str.strip() == new_max_raw)
-                            )
-                    if mask.any():
-                        insert_pos = mask[mask].index[-1] + 1
-                    else:
-                        try:
-                            df_add["_min_num"] = pd.to_numeric(df_add[min_col], errors='coerce').fillna(-1)
-                            if new_min_num is not None:
-                                insert_pos = int((df_add["_min_num"] < new_min_num).sum())
-                            else:
-                                insert_pos = len(df_add)
-                            df_add = df_add.drop(columns=["_min_num"])
-                        except Exception:
-                            insert_pos = len(df_add)
-                    df_top = df_add.iloc[:insert_pos].reset_index(drop=True)
-                    df_bottom = df_add.iloc[insert_pos:].reset_index(drop=True)
-                    df_new = pd.concat([df_top, new_row_df.reset_index(drop=True), df_bottom], ignore_index=True)
-                    sheets_edit[sheet_name_add] = df_new.astype(object)
+                    new_card = str(new_data.get(card_col, "")).strip() if card_col else ""
+                    # العثور على موضع الإدراج بالبحث الثنائي في مفاتيح الشيت المحفوظة مع البصمة
+                    keys = read_edit_store(
+                        lambda: load_insert_keys(edit_store, sheet_name_add, card_col, min_col, max_col))
+                    insert_pos = insert_position(df_add, keys, card_col, min_col, max_col,
+                                                 new_card, new_min_raw, new_max_raw)
+                    # الإدراج يُسجَّل فقط؛ طبقة التخزين تبني الشيت (أو تدرج الصف وحده) عند الحفظ
+                    sheets_edit.insert_row(sheet_name_add, insert_pos, new_data)
                     if not can_push:
                         st.warning("🚫 لا تملك صلاحية الرفع (التغييرات ستبقى محلياً).")
                         # حفظ محلياً
                         try:
-                            with pd.ExcelWriter(LOCAL_FILE, engine="openpyxl") as writer:
-                                for name, sh in sheets_edit.items():
-                                    try:
-                                        sh.to_excel(writer, sheet_name=name, index=False)
-                                    except Exception:
-                                        sh.astype(object).to_excel(writer, sheet_name=name, index=False)
-                            # تحديث البصمة بعد الحفظ المحلي
-                            update_fingerprint()
+                            report = save_local_excel(sheets_edit, dirty_sheets=[sheet_name_add])
                             st.success("✅ تم إدراج الصف محليًا (لم يتم رفعه إلى GitHub).")
-                            st.dataframe(sheets_edit[sheet_name_add])
+                            st.caption(format_save_report(report))
+                            st.dataframe(load_sheet_view(get_current_fingerprint(), sheet_name_add))
                         except Exception as e:
                             st.error(f"⚠ خطأ أثناء الحفظ المحلي: {e}")
                     else:
                         new_sheets = save_local_excel_and_push(
                             sheets_edit,
-                            commit_message=f"Add new row under range {new_min_raw}-{new_max_raw} in {sheet_name_add} by {st.session_state.get('username')}"
+                            commit_message=f"Add new row under range {new_min_raw}-{new_max_raw} in {sheet_name_add} by {st.session_state.get('username')}",
+                            dirty_sheets=[sheet_name_add],
                         )
-                        if isinstance(new_sheets, dict):
+                        if new_sheets is not None:
                             sheets_edit = new_sheets
                         st.success("✅ تم الإضافة — تم إدراج الصف في الموقع المناسب.")
-                        st.dataframe(sheets_edit[sheet_name_add])
+                        st.dataframe(load_sheet_view(get_current_fingerprint(), sheet_name_add))
 
         # Tab3: إضافة عمود جديد
         with tab3:
             st.subheader("🆕 إضافة عمود جديد")
             sheet_name_col = st.selectbox("اختر الشيت لإضافة عمود:", list(sheets_edit.keys()), key="add_col_sheet")
-            df_col = sheets_edit[sheet_name_col].astype(str)
+            df_col = read_edit_store(lambda: sheets_edit[sheet_name_col])
             new_col_name = st.text_input("اسم العمود الجديد:")
             default_value = st.text_input("القيمة الافتراضية لكل الصفوف (اختياري):", "")
             if st.button("💾 إضافة العمود الجديد", key=f"add_col_{sheet_name_col}"):
-                if new_col_name:
-                    df_col[new_col_name] = default_value
-                    sheets_edit[sheet_name_col] = df_col.astype(object)
+                if new_col_name and batch_mode:
+                    edit_batch.add_column(sheet_name_col, new_col_name, default_value)
+                    st.success(f"📦 أضيف العمود للدفعة ({len(edit_batch)} عملية في الانتظار).")
+                elif new_col_name:
+                    # إطار جديد بالعمود الإضافي (الإطار الأساسي مشترك ولا يُعدَّل في مكانه)
+                    sheets_edit[sheet_name_col] = df_col.assign(**{new_col_name: default_value})
                     if not can_push:
                         try:
-                            with pd.ExcelWriter(LOCAL_FILE, engine="openpyxl") as writer:
-                                for name, sh in sheets_edit.items():
-                                    try:
-                                        sh.to_excel(writer, sheet_name=name, index=False)
-                                    except Exception:
-                                        sh.astype(object).to_excel(writer, sheet_name=name, index=False)
-                            # تحديث البصمة بعد الحفظ المحلي
-                            update_fingerprint()
+                            report = save_local_excel(sheets_edit, dirty_sheets=[sheet_name_col])
                             st.success("✅ تم إضافة العمود محليًا (لم يتم رفعه إلى GitHub).")
-                            st.dataframe(sheets_edit[sheet_name_col])
+                            st.caption(format_save_report(report))
+                            st.dataframe(load_sheet_view(get_current_fingerprint(), sheet_name_col))
                         except Exception as e:
                             st.error(f"⚠ خطأ أثناء الحفظ المحلي: {e}")
                     else:
                         new_sheets = save_local_excel_and_push(
                             sheets_edit,
-                            commit_message=f"Add new column '{new_col_name}' to {sheet_name_col} by {st.session_state.get('username')}"
+                            commit_message=f"Add new column '{new_col_name}' to {sheet_name_col} by {st.session_state.get('username')}",
+                            dirty_sheets=[sheet_name_col],
                         )
-                        if isinstance(new_sheets, dict):
+                        if new_sheets is not None:
                             sheets_edit = new_sheets
                         st.success("✅ تم إضافة العمود الجديد بنجاح!")
-                        st.dataframe(sheets_edit[sheet_name_col])
+                        st.dataframe(load_sheet_view(get_current_fingerprint(), sheet_name_col))
                 else:
                     st.warning("⚠ الرجاء إدخال اسم العمود الجديد.")
 
@@ -791,7 +963,7 @@ with tabs[1]:
         with tab4:
             st.subheader("🗑 حذف صف من الشيت")
             sheet_name_del = st.selectbox("اختر الشيت:", list(sheets_edit.keys()), key="delete_sheet")
-            df_del = sheets_edit[sheet_name_del].astype(str).reset_index(drop=True)
+            df_del = read_edit_store(lambda: edit_store.string_view(sheet_name_del))
 
             st.markdown("### 📋 بيانات الشيت الحالية")
             st.dataframe(df_del)
@@ -813,32 +985,105 @@ with tabs[1]:
                         rows_list = [r for r in rows_list if 0 <= r < len(df_del)]
                         if not rows_list:
                             st.warning("⚠ لم يتم العثور على صفوف صحيحة.")
+                        elif batch_mode:
+                            # الأرقام تشير للشيت المحفوظ المعروض أعلاه
+                            edit_batch.delete_rows(sheet_name_del, rows_list)
+                            st.success(f"📦 أضيف حذف الصفوف {rows_list} للدفعة ({len(edit_batch)} عملية في الانتظار).")
                         else:
-                            df_new = df_del.drop(rows_list).reset_index(drop=True)
-                            sheets_edit[sheet_name_del] = df_new.astype(object)
+                            # حذف كفرق صفوف: يُدمج مع تعديلات الجلسات الأخرى ويحذف الصفوف فقط في وضع sqlite
+                            sheets_edit.apply_patch(sheet_name_del, {
+                                "edited_rows": {}, "added_rows": [], "deleted_rows": sorted(set(rows_list)),
+                            })
                             if not can_push:
                                 try:
-                                    with pd.ExcelWriter(LOCAL_FILE, engine="openpyxl") as writer:
-                                        for name, sh in sheets_edit.items():
-                                            try:
-                                                sh.to_excel(writer, sheet_name=name, index=False)
-                                            except Exception:
-                                                sh.astype(object).to_excel(writer, sheet_name=name, index=False)
-                                    # تحديث البصمة بعد الحفظ المحلي
-                                    update_fingerprint()
+                                    report = save_local_excel(sheets_edit, dirty_sheets=[sheet_name_del])
                                     st.success(f"✅ تم حذف الصفوف التالية محليًا: {rows_list}")
-                                    st.dataframe(sheets_edit[sheet_name_del])
+                                    st.caption(format_save_report(report))
+                                    st.dataframe(load_sheet_view(get_current_fingerprint(), sheet_name_del))
                                 except Exception as e:
                                     st.error(f"⚠ خطأ أثناء الحفظ المحلي: {e}")
                             else:
-                                new_sheets = save_local_excel_and_push(sheets_edit, commit_message=f"Delete rows {rows_list} from {sheet_name_del} by {st.session_state.get('username')}")
-                                if isinstance(new_sheets, dict):
+                                new_sheets = save_local_excel_and_push(sheets_edit, commit_message=f"Delete rows {rows_list} from {sheet_name_del} by {st.session_state.get('username')}", dirty_sheets=[sheet_name_del])
+                                if new_sheets is not None:
                                     sheets_edit = new_sheets
                                 st.success(f"✅ تم حذف الصفوف التالية بنجاح: {rows_list}")
-                                st.dataframe(sheets_edit[sheet_name_del])
+                                st.dataframe(load_sheet_view(get_current_fingerprint(), sheet_name_del))
                     except Exception as e:
                         st.error(f"حدث خطأ أثناء الحذف: {e}")
 
+        # Tab5: الدفعة والاستيراد
+        with tab5:
+            st.subheader("📦 الدفعة: حفظ كل التعديلات المجمعة مرة واحدة")
+            st.caption("فعّل وضع الدفعة أعلاه لتجميع الإضافة والحذف من التبويبات الأخرى، أو استورد ملف أحداث.")
+
+            st.markdown("### 📥 استيراد أحداث من CSV / XLSX")
+            st.caption("كل سطر = صف جديد يُدرج تحت الرينج المناسب. عمود sheet (اختياري) يحدد شيت كل سطر، "
+                       "وأوراق XLSX بنفس اسم شيت موجود تذهب إليه، والباقي للشيت المختار.")
+            uploaded = st.file_uploader("ملف الأحداث:", type=["csv", "xlsx"], key="batch_import_file")
+            import_sheet = st.selectbox("الشيت الافتراضي:", list(sheets_edit.keys()), key="batch_import_sheet")
+            if uploaded is not None and st.button("➕ إضافة صفوف الملف للدفعة", key="batch_import"):
+                try:
+                    imported = read_import(uploaded.getvalue(), uploaded.name, import_sheet, list(sheets_edit.keys()))
+                    for name, rows in imported.items():
+                        edit_batch.add_rows(name, rows)
+                    total = sum(len(rows) for rows in imported.values())
+                    st.success(f"📦 أضيف {total} صف من {len(imported)} شيت للدفعة.")
+                except Exception as e:
+                    st.error(f"⚠ تعذر قراءة الملف: {e}")
+
+            st.markdown("### 📋 محتوى الدفعة")
+            if not len(edit_batch):
+                st.info("الدفعة فارغة.")
+            else:
+                st.dataframe(pd.DataFrame(
+                    edit_batch.summary(), columns=["الشيت", "صفوف مضافة", "أعمدة مضافة", "صفوف محذوفة"]))
+                errors = edit_batch.validate(sheets_edit)
+                for err in errors[:20]:
+                    st.error(f"⚠ {err}")
+                if len(errors) > 20:
+                    st.error(f"⚠ و{len(errors) - 20} أخطاء أخرى")
+
+                col_apply, col_clear = st.columns(2)
+                with col_apply:
+                    apply_clicked = st.button("💾 تطبيق الدفعة (حفظ واحد)", key="batch_apply", disabled=bool(errors))
+                with col_clear:
+                    if st.button("🧹 تفريغ الدفعة", key="batch_clear"):
+                        edit_batch.clear()
+                        safe_rerun()
+
+                if apply_clicked:
+                    try:
+                        dirty = read_edit_store(lambda: edit_batch.apply(
+                            sheets_edit,
+                            keys_for=lambda name, c, lo, hi: load_insert_keys(edit_store, name, c, lo, hi),
+                        ))
+                    except BatchError as e:
+                        dirty = None
+                        for err in e.errors[:20]:
+                            st.error(f"⚠ {err}")
+                    if dirty is not None:
+                        message = edit_batch.commit_message(st.session_state.get("username"))
+                        if not can_push:
+                            st.warning("🚫 لا تملك صلاحية الرفع (التغييرات ستبقى محلياً).")
+                            try:
+                                report = save_local_excel(sheets_edit, dirty_sheets=dirty)
+                                edit_batch.clear()
+                                st.success(f"✅ تم تطبيق الدفعة محليًا على {len(dirty)} شيت (لم يتم رفعها إلى GitHub).")
+                                st.caption(format_save_report(report))
+                            except Exception as e:
+                                st.error(f"⚠ خطأ أثناء الحفظ المحلي: {e}")
+                        else:
+                            # الدفعة تُفرَّغ قبل الحفظ لأن الحفظ الناجح يعيد تشغيل الصفحة
+                            staged = list(edit_batch.ops)
+                            edit_batch.clear()
+                            new_sheets = save_local_excel_and_push(sheets_edit, commit_message=message, dirty_sheets=dirty)
+                            if new_sheets is None:
+                                # الحفظ المحلي فشل (أو تعارض): الدفعة تبقى كما هي لإعادة المحاولة
+                                edit_batch.ops = staged
+                            else:
+                                sheets_edit = new_sheets
+                                st.success(f"✅ تم تطبيق الدفعة على {len(dirty)} شيت في حفظ واحد.")
+
 # Tab: إدارة المستخدمين
 with tabs[2]:
     st.header("⚙ إدارة المستخدمين")
@@ -876,3 +1121,8 @@ with tabs[2]:
                 save_users(users)
                 st.success("✅ تم الحذف.")
                 safe_rerun()
+
+# ⏱ نهاية تشغيل الصفحة: يُكتب للمخرج ويظهر تفصيله في لوحة القياسات في التشغيل التالي
+_finished_run = metrics.end_run(st.session_state.pop("metrics_run", None))
+if _finished_run is not None:
+    st.session_state["metrics_last_run"] = _finished_run
@@ -0,0 +1,248 @@
+"""
+📦 التعديلات المجمعة (دفعة)
+تجميع عمليات كثيرة (إضافة صفوف، إضافة أعمدة، حذف صفوف) على شيتات كثيرة ثم التحقق منها معاً
+وتطبيقها في حفظ واحد و commit واحد بدل حفظ ورفع لكل عملية.
+نفس قواعد تبويبات التحرير: الصف يُدرج تحت الرينج المناسب (edit_engine)، والعمود بقيمة افتراضية،
+والحذف بأرقام الصفوف كما تظهر في الشيت المحفوظ.
+
+ترتيب التطبيق لكل شيت: الحذف أولاً (الأرقام تشير للشيت المحفوظ)، ثم الأعمدة، ثم الصفوف بترتيب
+إضافتها — كل صف يُدرج في الشيت بعد الصفوف السابقة، فالنتيجة مثل إضافتها واحداً تلو الآخر.
+
+استيراد CSV/XLSX (read_import) يمر بنفس الدفعة: كل سطر في الملف = إضافة صف.
+
+    batch = EditBatch()
+    batch.add_row("Card1", {"card": "1", "Min_Tones": "151", "Max_Tones": "300", "Event": "..."})
+    batch.delete_rows("Card2", [0, 3])
+    dirty = batch.apply(sheets)        # BatchError إذا فشل التحقق، ولا يتغير شيء
+    storage.save(sheets, dirty=dirty)
+"""
+import io
+
+import numpy as np
+import pandas as pd
+
+from edit_engine import advance_keys, insert_keys, insert_position, range_columns, with_text_keys
+
+OP_ADD_ROW = "add_row"
+OP_ADD_COLUMN = "add_column"
+OP_DELETE_ROWS = "delete_rows"
+
+# عمود اختياري في ملف الاستيراد يحدد شيت كل سطر
+IMPORT_SHEET_COLS = ("sheet", "شيت")
+
+
+class BatchError(ValueError):
+    """الدفعة لم تجتز التحقق (errors: كل الرسائل)"""
+
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = list(errors)
+
+
+def _is_empty(value):
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return value.strip() == ""
+    try:
+        return bool(pd.isna(value))
+    except (TypeError, ValueError):
+        return False
+
+
+class EditBatch:
+    def __init__(self):
+        self.ops = []
+
+    def __len__(self):
+        return len(self.ops)
+
+    def clear(self):
+        self.ops = []
+
+    # -------------------------------
+    # ➕ تجميع العمليات
+    # -------------------------------
+    def add_row(self, sheet, row):
+        """صف جديد (dict: العمود -> القيمة) يُدرج تحت الرينج المناسب عند التطبيق"""
+        self.ops.append({"op": OP_ADD_ROW, "sheet": sheet, "row": dict(row)})
+
+    def add_rows(self, sheet, rows):
+        for row in rows:
+            self.add_row(sheet, row)
+
+    def add_column(self, sheet, name, default=""):
+        self.ops.append({"op": OP_ADD_COLUMN, "sheet": sheet, "name": name, "default": default})
+
+    def delete_rows(self, sheet, rows):
+        """أرقام صفوف (من 0) في الشيت المحفوظ"""
+        self.ops.append({"op": OP_DELETE_ROWS, "sheet": sheet, "rows": sorted(set(int(r) for r in rows))})
+
+    def summary(self):
+        """[(الشيت، صفوف مضافة، أعمدة مضافة، صفوف محذوفة)] بترتيب أول ظهور للشيت"""
+        counts = {}
+        for op in self.ops:
+            c = counts.setdefault(op["sheet"], [0, 0, 0])
+            if op["op"] == OP_ADD_ROW:
+                c[0] += 1
+            elif op["op"] == OP_ADD_COLUMN:
+                c[1] += 1
+            else:
+                c[2] += len(op["rows"])
+        return [(sheet, *c) for sheet, c in counts.items()]
+
+    def commit_message(self, username=None):
+        """رسالة commit واحدة للدفعة: سطر ملخص ثم سطر لكل شيت"""
+        summary = self.summary()
+        rows = sum(s[1] for s in summary)
+        cols = sum(s[2] for s in summary)
+        deleted = sum(s[3] for s in summary)
+        head = f"Batch edit: {rows} rows added, {cols} columns added, {deleted} rows deleted in {len(summary)} sheets"
+        if username:
+            head += f" by {username}"
+        lines = [head, ""]
+        for sheet, r, c, d in summary:
+            parts = [f"+{r} rows"] if r else []
+            if c:
+                cols_added = [op["name"] for op in self.ops if op["op"] == OP_ADD_COLUMN and op["sheet"] == sheet]
+                parts.append("+columns " + ", ".join(f"'{n}'" for n in cols_added))
+            if d:
+                parts.append(f"-{d} rows")
+            lines.append(f"- {sheet}: " + ", ".join(parts))
+        return "\n".join(lines)
+
+    # -------------------------------
+    # ✅ التحقق والتطبيق
+    # -------------------------------
+    def _plan(self):
+        """الشيت -> {"delete": set, "columns": [(الاسم، القيمة)], "rows": [الصف]}"""
+        plan = {}
+        for op in self.ops:
+            p = plan.setdefault(op["sheet"], {"delete": set(), "columns": [], "rows": []})
+            if op["op"] == OP_ADD_ROW:
+                p["rows"].append(op["row"])
+            elif op["op"] == OP_ADD_COLUMN:
+                p["columns"].append((op["name"], op["default"]))
+            else:
+                p["delete"].update(op["rows"])
+        return plan
+
+    def validate(self, sheets):
+        """كل الأخطاء معاً (قائمة فارغة = الدفعة صالحة) بدون تعديل أي شيت"""
+        errors = []
+        for sheet, p in self._plan().items():
+            if sheet not in sheets:
+                errors.append(f"الشيت '{sheet}' غير موجود")
+                continue
+            df = sheets[sheet]
+            bad = sorted(r for r in p["delete"] if not 0 <= r < len(df))
+            if bad:
+                errors.append(f"{sheet}: أرقام صفوف غير موجودة {bad}")
+            columns = set(df.columns)
+            for name, _ in p["columns"]:
+                if not str(name).strip():
+                    errors.append(f"{sheet}: اسم العمود الجديد فارغ")
+                elif name in columns:
+                    errors.append(f"{sheet}: العمود '{name}' موجود بالفعل")
+                columns.add(name)
+            if p["rows"]:
+                _, min_col, max_col = range_columns(df.columns)
+                if not min_col or not max_col:
+                    errors.append(f"{sheet}: لم يتم العثور على أعمدة Min_Tones و/أو Max_Tones")
+                unknown = sorted({str(c) for row in p["rows"] for c in row if c not in columns})
+                if unknown:
+                    errors.append(f"{sheet}: أعمدة غير موجودة في الشيت {unknown}")
+        return errors
+
+    def apply(self, sheets, keys_for=None):
+        """
+        تطبيق الدفعة على sheets (EditSheets أو dict) ويرجع أسماء الشيتات المعدّلة (dirty)
+        keys_for(sheet, card_col, min_col, max_col): مفاتيح الإدراج المحفوظة للشيت المحفوظ
+        (مثل load_insert_keys)؛ تُستخدم فقط إذا لم يتغير الشيت قبل الإدراج
+        """
+        errors = self.validate(sheets)
+        if errors:
+            raise BatchError(errors)
+        plan = self._plan()
+        for sheet, p in plan.items():
+            replaced = bool(p["delete"] or p["columns"])
+            if replaced:
+                df = sheets[sheet]
+                if p["delete"]:
+                    df = df.reset_index(drop=True).drop(sorted(p["delete"])).reset_index(drop=True)
+                for name, default in p["columns"]:
+                    df = df.assign(**{name: default})
+                sheets[sheet] = df
+            if p["rows"]:
+                insert_rows_by_range(sheets, sheet, p["rows"], None if replaced else keys_for)
+        return list(plan)
+
+
+def insert_rows_by_range(sheets, sheet, rows, keys_for=None):
+    """مواضع كل الصفوف بنفس قاعدة تبويب الإضافة ثم إدراجها مرة واحدة"""
+    df = sheets[sheet]
+    card_col, min_col, max_col = range_columns(df.columns)
+    if keys_for is not None:
+        keys = keys_for(sheet, card_col, min_col, max_col)
+    else:
+        keys = insert_keys(df, card_col, min_col, max_col)
+    inserts = []
+    for row in rows:
+        new_min_raw = str(row.get(min_col, "")).strip()
+        new_max_raw = str(row.get(max_col, "")).strip()
+        new_card = str(row.get(card_col, "")).strip() if card_col else ""
+        if "min_text" not in keys:
+            try:
+                float(new_min_raw), float(new_max_raw)
+            except ValueError:
+                # مدخل غير رقمي: المقارنة النصية تحتاج نص Min/Max لكل الصفوف
+                keys = with_text_keys(df, keys, min_col, max_col)
+        pos = insert_position(df, keys, card_col, min_col, max_col, new_card, new_min_raw, new_max_raw)
+        inserts.append((pos, row))
+        keys = advance_keys(keys, pos, row, card_col, min_col, max_col)
+    if hasattr(sheets, "insert_rows"):
+        sheets.insert_rows(sheet, inserts)
+    else:
+        _insert_plain(sheets, sheet, inserts)
+
+
+def _insert_plain(sheets, sheet, inserts):
+    """نفس الإدراج لقاموس شيتات عادي"""
+    df = sheets[sheet]
+    order = np.arange(len(df))
+    for i, (pos, _) in enumerate(inserts):
+        order = np.insert(order, pos, len(df) + i)
+    rows = pd.DataFrame([[row.get(c, np.nan) for c in df.columns] for _, row in inserts],
+                        columns=df.columns, dtype=object)
+    sheets[sheet] = pd.concat([df, rows], ignore_index=True).take(order).reset_index(drop=True)
+
+
+# -------------------------------
+# 📥 استيراد CSV / XLSX
+# -------------------------------
+def read_import(data, filename, default_sheet, sheet_names):
+    """
+    ملف CSV/XLSX -> {الشيت: [صفوف]} لإضافتها للدفعة (add_rows)
+    الشيت لكل سطر: عمود sheet إن وُجد، وإلا اسم ورقة XLSX إذا طابق شيتاً، وإلا default_sheet.
+    الخلايا الفارغة تبقى فارغة، والأسطر الفارغة تماماً تُتجاهل
+    """
+    if filename.lower().endswith(".csv"):
+        tables = {None: pd.read_csv(io.BytesIO(data), dtype=object, keep_default_na=False, encoding="utf-8-sig")}
+    else:
+        tables = pd.read_excel(io.BytesIO(data), sheet_name=None, dtype=object)
+    known = set(sheet_names)
+    out = {}
+    for table_name, df in tables.items():
+        df.columns = [str(c).strip() for c in df.columns]
+        sheet_col = next((c for c in df.columns if c.lower() in IMPORT_SHEET_COLS), None)
+        target = table_name if table_name in known else default_sheet
+        for record in df.to_dict("records"):
+            sheet = target
+            if sheet_col is not None:
+                value = record.pop(sheet_col)
+                if not _is_empty(value):
+                    sheet = str(value).strip()
+            row = {c: v for c, v in record.items() if not _is_empty(v)}
+            if row:
+                out.setdefault(sheet, []).append(row)
+    return out
@@ -0,0 +1,176 @@
+"""
+⏱ يوم صيانة كامل: كل عملية بحفظ مستقل (القديم: حفظ + إعادة تحميل + commit لكل عملية)
+مقابل دفعة واحدة (EditBatch: تحقق واحد، حفظ واحد، commit واحد) للوضعين excel و sqlite،
+مع التحقق أن الملف الناتج متطابق. ثم استيراد CSV كبير (backfill) عبر نفس الدفعة
+مع التحقق أن المواضع مطابقة لإضافة الصفوف واحداً تلو الآخر.
+
+    python benchmarks/bench_batch_edit.py --cards 300 --ops 40 --import-rows 2000
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from batch_edit import EditBatch, read_import  # noqa: E402
+from edit_engine import insert_keys, insert_position, range_columns  # noqa: E402
+from storage import ExcelBackend, SQLiteBackend  # noqa: E402
+from benchmarks.synthetic_workbook import make_fleet_workbook, service_plan_rows  # noqa: E402
+
+
+def event_row(rnd, card, i):
+    """صف حدث كما يُدخل من تبويب الإضافة (نصوص)"""
+    lo, hi, _ = rnd.choice(service_plan_rows())
+    if i % 5 == 2:
+        lo += rnd.randint(1, 100)
+    return {"card": str(card), "Min_Tones": str(lo), "Max_Tones": str(hi), "Tones": str(rnd.randint(lo, hi)),
+            "Date": f"{rnd.randint(1, 28)}\\{rnd.randint(1, 12)}\\2025", "Event": f"service {i}"}
+
+
+def day_of_edits(n_cards, n_ops, seed=0):
+    """[(العملية، الشيت، المعطيات)]: أغلبها إضافة صفوف، وبعض الحذف والأعمدة على شيتات أخرى"""
+    rnd = random.Random(seed)
+    cards = rnd.sample(range(1, n_cards + 1), min(n_cards, n_ops))
+    ops = []
+    for i in range(n_ops):
+        card = cards[i % len(cards)]
+        if i % 10 == 8:
+            ops.append(("delete_rows", f"Card{card}", [rnd.randint(0, 10)]))
+        elif i % 10 == 9:
+            ops.append(("add_column", f"Card{card}", (f"Note{i}", "")))
+        else:
+            ops.append(("add_row", f"Card{card}", event_row(rnd, card, i)))
+    return ops
+
+
+def stage(batch, op, sheet, arg):
+    if op == "add_row":
+        batch.add_row(sheet, arg)
+    elif op == "add_column":
+        batch.add_column(sheet, *arg)
+    else:
+        batch.delete_rows(sheet, arg)
+
+
+def one_save_per_edit(backend, ops):
+    """القديم: كل عملية تحمّل أحدث نسخة وتحفظ وحدها (ومعها commit)"""
+    saves = 0
+    for op, sheet, arg in ops:
+        sheets = backend.load_store(backend.fingerprint()).edit_sheets()
+        batch = EditBatch()
+        stage(batch, op, sheet, arg)
+        backend.save(sheets, dirty=batch.apply(sheets))
+        saves += 1
+    return saves
+
+
+def one_batch(backend, ops):
+    sheets = backend.load_store(backend.fingerprint()).edit_sheets()
+    batch = EditBatch()
+    for op, sheet, arg in ops:
+        stage(batch, op, sheet, arg)
+    assert not batch.validate(sheets)
+    backend.save(sheets, dirty=batch.apply(sheets))
+    return 1, batch.commit_message("bench")
+
+
+def sequential_inserts(df, rows):
+    """مرجع: كل صف بمفاتيح جديدة من الشيت بعد الإدراج السابق (مثل حفظه ثم إعادة تحميله)"""
+    for row in rows:
+        card_col, min_col, max_col = range_columns(df.columns)
+        keys = insert_keys(df, card_col, min_col, max_col)
+        pos = insert_position(df, keys, card_col, min_col, max_col, str(row.get(card_col, "")).strip(),
+                              str(row.get(min_col, "")).strip(), str(row.get(max_col, "")).strip())
+        new = pd.DataFrame([[row.get(c, np.nan) for c in df.columns]], columns=df.columns, dtype=object)
+        df = pd.concat([df.iloc[:pos], new, df.iloc[pos:]], ignore_index=True)
+    return df
+
+
+def timed(fn):
+    start = time.perf_counter()
+    value = fn()
+    return value, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, default=300)
+    parser.add_argument("--ops", type=int, default=40)
+    parser.add_argument("--import-rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    ops = day_of_edits(args.cards, args.ops)
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "fleet.xlsx")
+        make_fleet_workbook(src, n_cards=args.cards)
+        print(f"workbook: {args.cards} cards, {len(ops)} edits on {len({s for _, s, _ in ops})} sheets")
+
+        results = {}
+        for kind in ("excel", "sqlite"):
+            for mode in ("per-edit", "batch"):
+                path = os.path.join(tmp, f"{kind}-{mode}.xlsx")
+                shutil.copy(src, path)
+                if kind == "excel":
+                    backend = ExcelBackend(path)
+                else:
+                    backend = SQLiteBackend(os.path.join(tmp, f"{kind}-{mode}.db"), path)
+                    backend.fingerprint()  # الاستيراد الأول خارج القياس
+                fn = one_save_per_edit if mode == "per-edit" else one_batch
+                out, seconds = timed(lambda: fn(backend, ops))
+                if kind == "sqlite":
+                    backend.export_xlsx()
+                results[kind, mode] = (out if mode == "per-edit" else out[0], seconds)
+                if mode == "batch":
+                    message = out[1]
+
+            a = pd.read_excel(os.path.join(tmp, f"{kind}-per-edit.xlsx"), sheet_name=None, dtype=object)
+            b = pd.read_excel(os.path.join(tmp, f"{kind}-batch.xlsx"), sheet_name=None, dtype=object)
+            assert list(a) == list(b)
+            for sheet in a:
+                pd.testing.assert_frame_equal(a[sheet], b[sheet])
+
+        # استيراد CSV: أحداث كثيرة موزعة على كروت قليلة مع عمود sheet
+        rnd = random.Random(1)
+        cards = rnd.sample(range(1, args.cards + 1), 20)
+        rows = [dict(event_row(rnd, card, i), sheet=f"Card{card}")
+                for i, card in enumerate(rnd.choice(cards) for _ in range(args.import_rows))]
+        data = pd.DataFrame(rows).to_csv(index=False).encode("utf-8-sig")
+        path = os.path.join(tmp, "import.xlsx")
+        shutil.copy(src, path)
+        backend = ExcelBackend(path)
+
+        def run_import():
+            sheets = backend.load_store(backend.fingerprint()).edit_sheets()
+            batch = EditBatch()
+            for sheet, sheet_rows in read_import(data, "events.csv", None, list(sheets)).items():
+                batch.add_rows(sheet, sheet_rows)
+            report = backend.save(sheets, dirty=batch.apply(sheets))
+            return sheets, report
+        (imported, import_report), import_s = timed(run_import)
+        original = pd.read_excel(src, sheet_name=None, dtype=object)
+        for card in cards[:5]:
+            sheet = f"Card{card}"
+            expected = sequential_inserts(original[sheet], [
+                {k: v for k, v in r.items() if k != "sheet"} for r in rows if r["sheet"] == sheet])
+            pd.testing.assert_frame_equal(imported[sheet].astype(str), expected.astype(str))
+
+    print("equivalence: OK (batch == one save per edit, import == one insert at a time)")
+    for kind in ("excel", "sqlite"):
+        saves, per_edit_s = results[kind, "per-edit"]
+        _, batch_s = results[kind, "batch"]
+        print(f"{kind:6}: per-edit {saves:3} saves/commits {per_edit_s:7.2f} s   "
+              f"batch 1 save/commit {batch_s:6.2f} s  ({per_edit_s / batch_s:.0f}x)")
+    print(f"import {args.import_rows} CSV rows into 20 sheets: {import_s:.2f} s "
+          f"(1 save, {import_report['mode']})")
+    print("commit message:\n  " + "\n  ".join(message.splitlines()[:4]) + "\n  ...")
+
+
+if __name__ == "__main__":
+    main()
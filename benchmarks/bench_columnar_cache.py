@@ -0,0 +1,92 @@
+"""
+⏱ قياس زمن تحميل الشيتات من XLSX مقابل الكاش العمودي (Feather)، مع فحص أن كل خلية تعود
+بنفس نوعها وقيمتها (وقت، مدة، تاريخ، bool من numpy، أعمدة مختلطة) وأن القيمة غير المعروفة
+تلغي الكاش بدل حفظها نصاً
+
+    python benchmarks/bench_columnar_cache.py --cards 500
+"""
+import argparse
+import datetime as dt
+import os
+import sys
+import tempfile
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from sheet_store import ARROW_AVAILABLE, SheetStore, read_columnar_cache, write_columnar_cache  # noqa: E402
+from benchmarks.synthetic_workbook import make_fleet_workbook  # noqa: E402
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+PYTHON_TYPES = {np.bool_: bool, pd.Timestamp: dt.datetime, pd.Timedelta: dt.timedelta}
+
+
+def check_round_trip(cache_dir):
+    """كل خلية تعود بنفس النوع والقيمة بعد الكاش"""
+    columns = {
+        "time": [dt.time(7, 30), dt.time(23, 59, 59, 5), np.nan],
+        "duration": [dt.timedelta(hours=36), pd.Timedelta(minutes=-5), np.nan],
+        "date": [dt.date(2024, 2, 29), dt.date(2025, 1, 1), np.nan],
+        "datetime": [dt.datetime(2024, 2, 29, 8), pd.Timestamp("2025-01-01 12:00"), np.nan],
+        "np_bool": [np.bool_(True), np.bool_(False), np.nan],
+        "mixed": [dt.time(8, 0), dt.timedelta(days=2), "نص"],
+        "mixed_dates": [dt.date(2024, 1, 2), dt.datetime(2024, 1, 2, 3, 4), 1.5],
+    }
+    sheets = {"Types": pd.DataFrame(columns, dtype=object)}
+    assert write_columnar_cache(cache_dir, "types", sheets)
+    back = read_columnar_cache(cache_dir, "types")["Types"]
+    for name, values in columns.items():
+        for before, after in zip(values, back[name]):
+            if pd.isna(before):
+                assert pd.isna(after), (name, after)
+                continue
+            # أنواع pandas/numpy تعود بالنوع المقابل في بايثون (كما في XLSX)
+            expected = PYTHON_TYPES.get(type(before), type(before))
+            assert type(after) is expected and after == before, (name, before, after)
+
+    # قيمة بلا وسم: لا كاش (القراءة من XLSX) بدلاً من حفظها نصاً
+    bad = {"Bad": pd.DataFrame({"x": [Decimal("1.5"), 2]}, dtype=object)}
+    assert not write_columnar_cache(cache_dir, "bad", bad) and read_columnar_cache(cache_dir, "bad") is None
+    print("round trip: time/timedelta/date/np.bool_/mixed cells keep type and value, "
+          "unknown type -> no cache: OK")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    if not ARROW_AVAILABLE:
+        sys.exit("pyarrow is not installed; the columnar cache is disabled")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "fleet.xlsx")
+        cache_dir = os.path.join(tmp, "cache")
+        check_round_trip(os.path.join(tmp, "types"))
+        make_fleet_workbook(path, n_cards=args.cards)
+        print(f"workbook: {args.cards} cards, {os.path.getsize(path) / 1024:.0f} KiB")
+
+        xlsx_s = min(timed(SheetStore.from_file, path) for _ in range(args.repeats))
+        build_s = timed(SheetStore.from_file, path, fingerprint="bench", cache_dir=cache_dir)
+        cached_s = min(
+            timed(SheetStore.from_file, path, fingerprint="bench", cache_dir=cache_dir)
+            for _ in range(args.repeats)
+        )
+
+    print(f"xlsx (openpyxl)         : {xlsx_s:8.3f} s")
+    print(f"xlsx + cache build      : {build_s:8.3f} s")
+    print(f"columnar cache (feather): {cached_s:8.3f} s  ({xlsx_s / cached_s:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
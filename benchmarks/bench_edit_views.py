@@ -0,0 +1,90 @@
+"""
+⏱ تشغيل واحد لتبويبات التحرير الأربعة على شيت كبير:
+القديم (astype(str) [+ reset_index] في كل تبويب وكل تشغيل) مقابل طبقة العرض
+(نسخة نصية واحدة محفوظة لكل بصمة + الإطار الأساسي للتبويبات التي تعدّل)
+ذروة الذاكرة والزمن لتشغيل متكرر، مع التحقق من تطابق النسخة النصية.
+النصوص في pandas 3 مخزنة في ذاكرة pyarrow التي لا يراها tracemalloc، فنجمع الاثنين.
+المتغيرات df/df_add/df_col/df_del في app.py تبقى حية حتى التشغيل التالي، فنحتفظ بنتائج التبويبات الأربعة
+
+    python benchmarks/bench_edit_views.py --rows 50000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+try:
+    from pyarrow import total_allocated_bytes as arrow_bytes
+except Exception:
+    def arrow_bytes():
+        return 0
+
+from sheet_store import SheetStore  # noqa: E402
+from benchmarks.synthetic_workbook import card_history_frame, service_plan_rows  # noqa: E402
+
+
+def legacy_rerun(sheets, name):
+    """ما كانت تفعله التبويبات الأربعة في كل تشغيل"""
+    tab1 = sheets[name].astype(str)
+    tab2 = sheets[name].astype(str).reset_index(drop=True)
+    tab3 = sheets[name].astype(str)
+    tab4 = sheets[name].astype(str).reset_index(drop=True)
+    return tab1, tab2, tab3, tab4
+
+
+def view_rerun(store, sheets, name):
+    """نفس التشغيل عبر طبقة العرض"""
+    tab1 = store.string_view(name)
+    tab2 = sheets[name].reset_index(drop=True)
+    tab3 = sheets[name]
+    tab4 = store.string_view(name)
+    return tab1, tab2, tab3, tab4
+
+
+def measure(fn, repeats):
+    fn()  # التشغيل الأول يبني الكاش
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    seconds = (time.perf_counter() - start) / repeats
+    arrow_before = arrow_bytes()
+    tracemalloc.start()
+    result = fn()
+    peak = tracemalloc.get_traced_memory()[1] + arrow_bytes() - arrow_before
+    tracemalloc.stop()
+    del result
+    return seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    card = card_history_frame(1, args.rows).astype(object)
+    plan = pd.DataFrame(service_plan_rows(), columns=["Min_Tones", "Max_Tones", "Service"], dtype=object)
+    store = SheetStore({"ServicePlan": plan, "Card1": card})
+    sheets = store.edit_sheets()
+
+    legacy = legacy_rerun(sheets, "Card1")
+    view = view_rerun(store, sheets, "Card1")
+    pd.testing.assert_frame_equal(legacy[0], view[0])
+    pd.testing.assert_frame_equal(legacy[3], view[3])
+    assert store.string_view("Card1") is view[0]
+
+    legacy_s, legacy_peak = measure(lambda: legacy_rerun(sheets, "Card1"), args.repeats)
+    view_s, view_peak = measure(lambda: view_rerun(store, sheets, "Card1"), args.repeats)
+    print(f"sheet: {args.rows} rows x {card.shape[1]} columns")
+    print("equivalence: OK (string view == astype(str))")
+    print(f"legacy rerun : {legacy_s * 1000:8.1f} ms  peak {legacy_peak / 2**20:8.1f} MiB")
+    print(f"view rerun   : {view_s * 1000:8.3f} ms  peak {view_peak / 2**20:8.3f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+⏱ قياس تقرير كل الماكينات (fleet_status_report) على ملف مولد:
+أول تشغيل (يبني ملخص كل كارت) ثم التشغيل التالي بنفس البصمة (الملخصات محفوظة)
+
+    python benchmarks/bench_fleet_report.py --cards 300 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sheet_store import SheetStore  # noqa: E402
+from status_engine import fleet_status_report  # noqa: E402
+from benchmarks.synthetic_workbook import make_fleet_workbook  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, nargs="+", default=[300, 500])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_cards in args.cards:
+            path = os.path.join(tmp, f"fleet{n_cards}.xlsx")
+            make_fleet_workbook(path, n_cards=n_cards)
+            sheets = SheetStore.from_file(path).typed_sheets()
+            for label in ("first", "repeat"):
+                start = time.perf_counter()
+                report, missing = fleet_status_report(sheets)
+                elapsed = time.perf_counter() - start
+                print(f"{n_cards:>5} cards ({label:>6}): {elapsed:6.2f} s, "
+                      f"{len(report)} overdue slices, {len(missing)} cards without sheet")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+⏱ قياس زمن الحفظ: إعادة كتابة كل الشيتات (pd.ExcelWriter) مقابل ترقيع الشيت المعدّل فقط
+مع التحقق أن الملفين يُقرآن بنفس البيانات
+
+    python benchmarks/bench_incremental_save.py --cards 500
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from save_engine import save_workbook  # noqa: E402
+from benchmarks.synthetic_workbook import make_fleet_workbook  # noqa: E402
+
+
+def edit_one_sheet(sheets, name):
+    """نفس مسار واجهة التحرير: astype(str) ثم إضافة صف"""
+    df = sheets[name].astype(str)
+    row = pd.DataFrame([{c: "" for c in df.columns}]).astype(str)
+    row.iloc[0, 0] = "bench"
+    sheets[name] = pd.concat([df, row], ignore_index=True).astype(object)
+
+
+def check_equivalent(path_a, path_b):
+    a = pd.read_excel(path_a, sheet_name=None, dtype=object)
+    b = pd.read_excel(path_b, sheet_name=None, dtype=object)
+    assert list(a) == list(b)
+    for name in a:
+        pd.testing.assert_frame_equal(a[name], b[name])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "fleet.xlsx")
+        make_fleet_workbook(src, n_cards=args.cards)
+        print(f"workbook: {args.cards} cards, {os.path.getsize(src) / 1024:.0f} KiB")
+        sheets = pd.read_excel(src, sheet_name=None, dtype=object)
+        name = "Card1"
+        edit_one_sheet(sheets, name)
+
+        full_path = os.path.join(tmp, "full.xlsx")
+        patch_path = os.path.join(tmp, "patch.xlsx")
+        full, patch = [], []
+        for _ in range(args.repeats):
+            shutil.copy(src, full_path)
+            shutil.copy(src, patch_path)
+            full.append(save_workbook(full_path, sheets))
+            patch.append(save_workbook(patch_path, sheets, dirty=[name]))
+        assert all(r["mode"] == "patch" for r in patch), patch
+        check_equivalent(full_path, patch_path)
+
+    full_s = min(r["seconds"] for r in full)
+    patch_s = min(r["seconds"] for r in patch)
+    print("equivalence: OK (same sheets after re-read)")
+    print(f"full rewrite : {full_s:8.3f} s  {full[-1]['bytes'] / 1024:8.0f} KiB file")
+    print(f"dirty patch  : {patch_s:8.3f} s  {patch[-1]['bytes'] / 1024:8.0f} KiB file, "
+          f"{patch[-1]['sheet_bytes'] / 1024:.1f} KiB sheet XML  ({full_s / patch_s:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+⏱ قياس البحث في فهرس الفترات مقابل المسح الكامل بالأقنعة مع نمو حجم
+ServicePlan وسجل الكارت (مع التحقق من تطابق النتائج)
+
+    python benchmarks/bench_interval_index.py
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from status_engine import (  # noqa: E402
+    build_interval_index, index_max_at_most, index_min_at_least, index_overlapping, index_within,
+)
+
+
+def contiguous_bounds(n, step=150):
+    lo = np.arange(n) * step + 1
+    lo[0] = 0
+    return lo.astype(float), (np.arange(n) + 1) * step * 1.0
+
+
+def random_bounds(rng, n, top):
+    lo = rng.integers(0, top, n).astype(float)
+    hi = lo + rng.integers(0, 600, n)
+    lo[rng.random(n) < 0.02] = np.nan
+    return lo, hi
+
+
+def check(index, lo, hi, rng, top):
+    with np.errstate(invalid="ignore"):
+        for _ in range(200):
+            a, b = sorted(rng.integers(-100, top + 100, 2))
+            assert np.array_equal(index_overlapping(index, a, b), np.flatnonzero((lo <= b) & (hi >= a)))
+            assert np.array_equal(index_max_at_most(index, a), np.flatnonzero(hi <= a))
+            assert np.array_equal(index_min_at_least(index, a), np.flatnonzero(lo >= a))
+            assert np.array_equal(index_within(index, a, b), np.flatnonzero((lo >= a) & (hi <= b)))
+
+
+def per_query(fn, queries):
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000])
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    for n in args.sizes:
+        top = n * 150
+        for label, (lo, hi) in (("contiguous", contiguous_bounds(n)), ("overlapping", random_bounds(rng, n, top))):
+            index = build_interval_index(lo, hi)
+            check(index, lo, hi, rng, top)
+            queries = rng.integers(0, top, 500)
+            df = pd.DataFrame({"Min_Tones": lo, "Max_Tones": hi})
+            # المسح القديم: قناع pandas على الشيت كله لكل شريحة
+            pandas_scan = per_query(lambda t: df[(df["Min_Tones"] <= t + 150) & (df["Max_Tones"] >= t)], queries)
+            numpy_scan = per_query(lambda t: np.flatnonzero((lo <= t + 150) & (hi >= t)), queries)
+            indexed = per_query(lambda t: index_overlapping(index, t, t + 150), queries)
+            print(f"{n:>7} intervals ({label:>11}): pandas scan {pandas_scan * 1e6:8.1f} us | "
+                  f"numpy scan {numpy_scan * 1e6:7.1f} us | index {indexed * 1e6:6.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+⏱ فتح تبويب التحرير: تحميل كل الشيتات (القديم) مقابل المخزن الكسول (شيت واحد عند الطلب)،
+من XLSX ومن الكاش العمودي بعد أول تحميل كامل
+الزمن وذروة الذاكرة (tracemalloc) مع التحقق أن الشيت المقروء وحده مطابق لـ read_excel
+
+    python benchmarks/bench_lazy_sheets.py --cards 1000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from sheet_store import ARROW_AVAILABLE, SheetStore  # noqa: E402
+from storage import ExcelBackend  # noqa: E402
+from benchmarks.synthetic_workbook import make_fleet_workbook  # noqa: E402
+
+
+def _edit_tab_run(load, name):
+    """نفس ما يحدث في تشغيل واحد: قائمة الشيتات + الشيت المختار كنص"""
+    sheets = load().edit_sheets()
+    return list(sheets.keys()), sheets[name].astype(str)
+
+
+def open_edit_tab(load, name):
+    """الزمن من تشغيل عادي، وذروة الذاكرة من تشغيل ثانٍ تحت tracemalloc (يبطئ التنفيذ)"""
+    start = time.perf_counter()
+    names, df = _edit_tab_run(load, name)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    _edit_tab_run(load, name)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, len(names), df
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, default=1000)
+    parser.add_argument("--sheet", default="Card7")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "fleet.xlsx")
+        make_fleet_workbook(path, n_cards=args.cards)
+        print(f"workbook: {args.cards} cards, {os.path.getsize(path) / 1024:.0f} KiB")
+
+        eager_s, eager_peak, n_eager, eager_df = open_edit_tab(lambda: SheetStore.from_file(path), args.sheet)
+        backend = ExcelBackend(path, max_loaded=8)
+        lazy_s, lazy_peak, n_lazy, lazy_df = open_edit_tab(lambda: backend.load_store(backend.fingerprint()), args.sheet)
+        assert n_eager == n_lazy
+        pd.testing.assert_frame_equal(eager_df, lazy_df)
+
+        # كل شيت يُقرأ وحده بنفس نتيجة read_excel، والـ LRU لا يتجاوز الحد
+        store = backend.load_store(backend.fingerprint())
+        reference = pd.read_excel(path, sheet_name=None, dtype=object)
+        for name in list(reference)[:20] + list(reference)[-5:]:
+            expected = reference[name]
+            expected.columns = expected.columns.str.strip()
+            pd.testing.assert_frame_equal(store.raw[name], expected)
+        assert len(store.loaded_sheets()) == 8
+        # العرض بالأنواع (فحص الماكينات) محدود بنفس الحد
+        typed = store.typed_sheets()
+        for name in list(reference)[:20]:
+            typed[name]
+        assert len(typed._cache) == 8, len(typed._cache)
+        start = time.perf_counter()
+        store.load_all()
+        load_all_s = time.perf_counter() - start
+        assert len(store.loaded_sheets()) == len(reference)
+
+        # بعد أول تحميل كامل (يكتب الكاش العمودي): الجلسات التالية تبقى كسولة بنفس الحد
+        cached_s = cached_peak = None
+        if ARROW_AVAILABLE:
+            cache_dir = os.path.join(tmp, "cache")
+            cached = ExcelBackend(path, cache_dir=cache_dir, max_loaded=8)
+            cached.load_store(cached.fingerprint()).load_all()
+            cached_s, cached_peak, n_cached, cached_df = open_edit_tab(
+                lambda: cached.load_store(cached.fingerprint()), args.sheet)
+            assert n_cached == n_eager
+            pd.testing.assert_frame_equal(eager_df, cached_df)
+            store = cached.load_store(cached.fingerprint())
+            store.raw[args.sheet]
+            assert len(store.loaded_sheets()) == 1, "columnar cache read every sheet"
+            for name in list(reference)[:20]:
+                pd.testing.assert_frame_equal(store.raw[name], reference[name])
+            assert len(store.loaded_sheets()) == 8
+            # كاش حُذف بعد فتح المخزن (تنظيف النسخ القديمة): الشيت يُقرأ من الملف بنفس البصمة
+            shutil.rmtree(cache_dir)
+            pd.testing.assert_frame_equal(store.raw[list(reference)[-1]], reference[list(reference)[-1]])
+
+    print("equivalence: OK (lazy sheets == read_excel, raw and typed LRU bounded, "
+          "columnar cache read one sheet at a time)")
+    print(f"all sheets  : {eager_s:8.3f} s  peak {eager_peak / 2**20:7.1f} MiB  ({n_eager} sheets parsed)")
+    print(f"lazy (one)  : {lazy_s:8.3f} s  peak {lazy_peak / 2**20:7.1f} MiB  "
+          f"({eager_s / lazy_s:.0f}x faster, {eager_peak / lazy_peak:.0f}x less memory)")
+    if cached_s is not None:
+        print(f"lazy (cache): {cached_s:8.3f} s  peak {cached_peak / 2**20:7.1f} MiB  (one Feather file)")
+    print(f"load_all()  : {load_all_s:8.3f} s  (fleet report / full save path)")
+
+
+if __name__ == "__main__":
+    main()
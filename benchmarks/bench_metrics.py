@@ -0,0 +1,117 @@
+"""
+⏱ كلفة طبقة القياس (metrics): زمن الاستدعاء لدالة بدون ديكوريتر، ومع timed/span والقياس متوقف
+(الافتراضي) ثم مفعّل، ثم تشغيل كامل للصفحة (begin_run ... end_run) على مخرج JSONL و Prometheus
+مع التحقق من السجل المكتوب ومن صيغة ملف .prom
+
+    python benchmarks/bench_metrics.py --calls 200000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics  # noqa: E402
+
+
+def work(x):
+    return x + 1
+
+
+@metrics.timed("bench.work")
+def timed_work(x):
+    return x + 1
+
+
+def per_call(fn, calls):
+    start = time.perf_counter()
+    for i in range(calls):
+        fn(i)
+    return (time.perf_counter() - start) / calls
+
+
+def span_work(x):
+    with metrics.span("bench.span"):
+        return x + 1
+
+
+def page_run(registry, user="admin"):
+    """تشغيل صفحة مصغّر: مراحل متداخلة وعدّاد، كما في app.py"""
+    metrics.registry = registry
+    run = metrics.begin_run(user)
+    with metrics.span("sheets.load_store"):
+        time.sleep(0.002)
+    for _ in range(3):
+        timed_work(1)
+    metrics.count("sheets.load_all")
+    return metrics.end_run(run)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+
+    original = metrics.registry
+    metrics.registry = metrics.Registry(sink_file=None)
+    metrics.set_enabled(False)
+    base = per_call(work, args.calls)
+    off = per_call(timed_work, args.calls)
+    off_span = per_call(span_work, args.calls)
+    assert metrics.registry.summary() == {}, "disabled metrics recorded samples"
+    metrics.set_enabled(True)
+    on = per_call(timed_work, args.calls)
+    on_span = per_call(span_work, args.calls)
+    assert metrics.registry.summary()["bench.work"]["n"] == args.calls
+    print(f"plain call          : {base * 1e9:7.0f} ns")
+    print(f"timed  (off / on)   : {off * 1e9:7.0f} ns / {on * 1e9:7.0f} ns")
+    print(f"span   (off / on)   : {off_span * 1e9:7.0f} ns / {on_span * 1e9:7.0f} ns")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # JSONL: سطر لكل تشغيل بمراحله وعدّاداته
+        jsonl = os.path.join(tmp, "metrics.jsonl")
+        for _ in range(2):
+            page_run(metrics.Registry(sink_file=jsonl))
+        with open(jsonl, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        assert len(records) == 2, records
+        rec = records[-1]
+        assert rec["kind"] == "page" and rec["user"] == "admin" and not rec["interrupted"]
+        assert rec["spans"]["bench.work"]["n"] == 3 and rec["counters"] == {"sheets.load_all": 1}
+        assert rec["spans"]["sheets.load_store"]["s"] <= rec["seconds"]
+
+        # Prometheus textfile: summary لكل مرحلة و counter لكل عدّاد، يُكتب ذرياً
+        prom = os.path.join(tmp, "cmms.prom")
+        registry = metrics.Registry(sink_file=prom, flush_seconds=0)
+        for _ in range(5):
+            page_run(registry)
+        with open(prom, encoding="utf-8") as f:
+            text = f.read()
+        assert '# TYPE cmms_span_seconds summary' in text
+        assert 'cmms_span_seconds_count{span="bench.work"} 15' in text
+        assert 'cmms_span_seconds_count{span="run.page"} 5' in text
+        assert 'cmms_span_seconds{span="sheets.load_store",quantile="0.95"}' in text
+        assert 'cmms_events_total{event="sheets.load_all"} 5' in text
+        row = registry.summary()["sheets.load_store"]
+        assert row["p50"] <= row["p95"] <= row["p99"]
+
+        # تشغيل لم يكتمل (st.stop): ينتهي عند آخر مرحلة مقاسة، لا عند إغلاقه في التشغيل التالي
+        metrics.registry = metrics.Registry(sink_file=None)
+        run = metrics.begin_run("admin")
+        with metrics.span("storage.save"):
+            pass
+        time.sleep(0.05)
+        done = metrics.end_run(run, interrupted=True)
+        assert done.interrupted and done.seconds < 0.05, done.seconds
+        assert metrics.end_run(run) is None, "run emitted twice"
+        print(f"page run record     : JSONL {len(json.dumps(rec))} bytes/run, .prom {len(text)} bytes: OK")
+
+    metrics.registry = original
+    metrics.set_enabled(metrics.ENABLED)
+
+
+if __name__ == "__main__":
+    main()
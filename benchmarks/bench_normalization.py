@@ -0,0 +1,76 @@
+"""
+⏱ قياس محرك الحالة مع طبقة تطبيع الأسماء (أنماط مترجمة + LRU + خدمات ServicePlan
+محسوبة مسبقاً) وبدونها (re.sub بأنماط غير مترجمة في كل استدعاء)
+
+    python benchmarks/bench_normalization.py --cards 200
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+import status_engine  # noqa: E402
+from status_engine import build_status_table, plan_services, prepare_card  # noqa: E402
+from benchmarks.synthetic_workbook import card_history_frame, service_plan_rows  # noqa: E402
+
+
+def legacy_normalize_name(s):
+    if s is None: return ""
+    s = str(s).replace("\n", "+")
+    s = re.sub(r"[^0-9a-zA-Z\u0600-\u06FF\+\s_/.-]", " ", s)
+    s = re.sub(r"\s+", " ", s).strip().lower()
+    return s
+
+
+def legacy_split_needed_services(needed_service_str):
+    if not isinstance(needed_service_str, str) or needed_service_str.strip() == "":
+        return []
+    parts = re.split(r"\+|,|\n|;", needed_service_str)
+    return [p.strip() for p in parts if p.strip() != ""]
+
+
+def run(cards, plan, needed):
+    # كل الشرائح لكل كارت: أسوأ حالة لعدد أسماء الخدمات
+    start = time.perf_counter()
+    tables = [build_status_table(i, plan, card, needed) for i, card in enumerate(cards)]
+    return time.perf_counter() - start, tables
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=50)
+    parser.add_argument("--slices", type=int, default=60)
+    args = parser.parse_args()
+
+    plan = pd.DataFrame(service_plan_rows(args.slices), columns=["Min_Tones", "Max_Tones", "Service"])
+    cards_df = [card_history_frame(i, args.rows, n_slices=args.slices, seed=i) for i in range(args.cards)]
+
+    # بدون الطبقة: الدوال القديمة وتقسيم Service في كل فحص
+    fast = status_engine.normalize_name, status_engine.split_needed_services
+    status_engine.normalize_name, status_engine.split_needed_services = legacy_normalize_name, legacy_split_needed_services
+    try:
+        cards = [prepare_card(df) for df in cards_df]
+        without_s, expected = run(cards, plan, None)
+    finally:
+        status_engine.normalize_name, status_engine.split_needed_services = fast
+
+    # مع الطبقة: أسماء مطبعة عند التحميل + LRU
+    cards = [prepare_card(df) for df in cards_df]
+    needed = plan_services(plan)
+    with_s, tables = run(cards, plan, needed)
+    for a, b in zip(tables, expected):
+        pd.testing.assert_frame_equal(a, b)
+
+    print(f"{args.cards} cards x {args.slices} slices")
+    print(f"without normalization layer: {without_s * 1000:8.1f} ms")
+    print(f"with normalization layer   : {with_s * 1000:8.1f} ms  ({without_s / with_s:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
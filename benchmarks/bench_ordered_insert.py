@@ -0,0 +1,152 @@
+"""
+⏱ إضافة صف تحت الرينج: الأقنعة القديمة (astype(str) + pd.to_numeric لكل عمود + concat لثلاثة
+إطارات) مقابل البحث الثنائي في المفاتيح المحفوظة + سجل الإدراج المنتظر (EditSheets)
+مع التحقق أن موضع الإدراج والشيت الناتج متطابقان لنفس المدخلات
+
+    python benchmarks/bench_ordered_insert.py --rows 20000 50000 100000
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from edit_engine import insert_keys, insert_position, range_columns  # noqa: E402
+from sheet_store import SheetStore  # noqa: E402
+from benchmarks.synthetic_workbook import card_history_frame, service_plan_rows  # noqa: E402
+
+
+def legacy_insert(df_add, new_data):
+    """نفس كود تبويب الإضافة القديم (يرجع الموضع والشيت الجديد)"""
+    new_row_df = pd.DataFrame([new_data]).astype(str)
+    card_col, min_col, max_col = range_columns(df_add.columns)
+
+    def to_num_or_none(x):
+        try:
+            return float(x)
+        except Exception:
+            return None
+    new_min_raw = str(new_data.get(min_col, "")).strip()
+    new_max_raw = str(new_data.get(max_col, "")).strip()
+    new_min_num = to_num_or_none(new_min_raw)
+    new_max_num = to_num_or_none(new_max_raw)
+    insert_pos = len(df_add)
+    mask = pd.Series([False] * len(df_add))
+    if card_col:
+        new_card = str(new_data.get(card_col, "")).strip()
+        if new_card != "":
+            if new_min_num is not None and new_max_num is not None:
+                mask = (
+                    (df_add[card_col].astype(str).str.strip() == new_card) &
+                    (pd.to_numeric(df_add[min_col], errors='coerce') == new_min_num) &
+                    (pd.to_numeric(df_add[max_col], errors='coerce') == new_max_num)
+                )
+            else:
+                mask = (
+                    (df_add[card_col].astype(str).str.strip() == new_card) &
+                    (df_add[min_col].astype(str).str.strip() == new_min_raw) &
+                    (df_add[max_col].astype(str).str.strip() == new_max_raw)
+                )
+    if mask.any():
+        insert_pos = mask[mask].index[-1] + 1
+    else:
+        df_add = df_add.copy()
+        df_add["_min_num"] = pd.to_numeric(df_add[min_col], errors='coerce').fillna(-1)
+        if new_min_num is not None:
+            insert_pos = int((df_add["_min_num"] < new_min_num).sum())
+        df_add = df_add.drop(columns=["_min_num"])
+    df_top = df_add.iloc[:insert_pos].reset_index(drop=True)
+    df_bottom = df_add.iloc[insert_pos:].reset_index(drop=True)
+    df_new = pd.concat([df_top, new_row_df.reset_index(drop=True), df_bottom], ignore_index=True)
+    return insert_pos, df_new.astype(object)
+
+
+def new_insert(store, name, new_data):
+    """المسار الجديد: مفاتيح محفوظة مع المخزن + بحث ثنائي + سجل إدراج (بدون نسخ الشيت)"""
+    sheets = store.edit_sheets()
+    df_add = sheets[name]
+    card_col, min_col, max_col = range_columns(df_add.columns)
+    keys = store.derived(("insert_keys", name, card_col, min_col, max_col),
+                         lambda: insert_keys(df_add, card_col, min_col, max_col))
+    pos = insert_position(df_add, keys, card_col, min_col, max_col,
+                          str(new_data.get(card_col, "")).strip(),
+                          str(new_data.get(min_col, "")).strip(),
+                          str(new_data.get(max_col, "")).strip())
+    sheets.insert_row(name, pos, new_data)
+    return pos, sheets
+
+
+def queries(df, n, seed=0):
+    """مدخلات عشوائية: رينج موجود، رينج جديد، كارت آخر، قيم غير رقمية"""
+    rnd = random.Random(seed)
+    plan = service_plan_rows()
+    out = []
+    for i in range(n):
+        lo, hi, _ = rnd.choice(plan)
+        row = {c: "" for c in df.columns}
+        row["card"] = rnd.choice(["1", "1", "1", "2", ""])
+        row["Min_Tones"], row["Max_Tones"] = str(lo), str(hi)
+        if i % 7 == 3:
+            row["Min_Tones"] = str(lo + rnd.randint(1, 100))
+        if i % 11 == 5:
+            row["Max_Tones"] = "?"
+        row["Event"] = f"bench {i}"
+        out.append(row)
+    return out
+
+
+def timed(fn, items):
+    """متوسط الزمن لكل عنصر"""
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for item in items:
+            fn(item)
+        return (time.perf_counter() - start) / len(items)
+    finally:
+        gc.enable()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[20000, 50000, 100000])
+    parser.add_argument("--queries", type=int, default=30)
+    args = parser.parse_args()
+
+    for n_rows in args.rows:
+        card = card_history_frame(1, n_rows).astype(object)
+        store = SheetStore({"Card1": card})
+        qs = queries(card, args.queries, seed=n_rows)
+
+        start = time.perf_counter()
+        keys = store.derived(("insert_keys", "Card1", "card", "Min_Tones", "Max_Tones"),
+                             lambda: insert_keys(card, "card", "Min_Tones", "Max_Tones"))
+        keys_s = time.perf_counter() - start
+        assert keys["sorted"]
+
+        # الزمن للمدخلات الرقمية (الحالة المعتادة)؛ Min/Max غير الرقمية تمر بمقارنة نصية كاملة.
+        # كل مسار في حلقة مستقلة وgc معطل (مثل timeit): التبديل بينهما يطرد كاش المعالج لصالح القديم
+        numeric = [q for q in qs if q["Max_Tones"] != "?"]
+        legacy_s = timed(lambda q: legacy_insert(card, q), numeric)
+        new_s = timed(lambda q: new_insert(store, "Card1", q), numeric)
+
+        for q in qs:
+            legacy_pos, legacy_df = legacy_insert(card, q)
+            pos, sheets = new_insert(store, "Card1", q)
+            assert pos == legacy_pos, (q, pos, legacy_pos)
+            # الشيت الناتج (يُبنى عند الحفظ فقط) مطابق للنسخة القديمة بعد نفس التحويل
+            pd.testing.assert_frame_equal(sheets["Card1"].astype(str), legacy_df.astype(str))
+
+        print(f"rows {n_rows:>7}: equivalence OK ({len(qs)} inserts)  "
+              f"legacy {legacy_s * 1000:8.2f} ms/insert  "
+              f"binary search + log {new_s * 1000:7.3f} ms/insert  "
+              f"({legacy_s / new_s:.0f}x)  keys built once in {keys_s * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
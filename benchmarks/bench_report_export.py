@@ -0,0 +1,92 @@
+"""
+⏱ ملف تنزيل التقارير: to_excel القديم (في كل تشغيل للصفحة) مقابل الكتابة المتتالية
+(openpyxl write_only) و CSV، لجدول حالة ماكينة ولتقرير الأسطول — الزمن وذروة الذاكرة،
+مع التحقق أن الملفات تُقرأ بنفس البيانات، وأن العرض بدون ضغط لا يكتب أي ملف
+
+    python benchmarks/bench_report_export.py --cards 300
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from report_export import csv_bytes, deferred_report, xlsx_bytes  # noqa: E402
+from sheet_store import SheetStore  # noqa: E402
+from status_engine import VIEW_ALL, cached_status_table, fleet_status_report, status_table_key  # noqa: E402
+from benchmarks.synthetic_workbook import make_fleet_workbook  # noqa: E402
+
+
+def legacy_to_excel(df):
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False, engine="openpyxl")
+    return buffer.getvalue()
+
+
+def profile(fn, df, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        data = fn(df)
+    elapsed = (time.perf_counter() - start) / repeats
+    tracemalloc.start()
+    fn(df)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, data
+
+
+def check_same(df, legacy, fast, csv):
+    a = pd.read_excel(io.BytesIO(legacy), dtype=object)
+    b = pd.read_excel(io.BytesIO(fast), dtype=object)
+    pd.testing.assert_frame_equal(a, b)
+    c = pd.read_csv(io.BytesIO(csv), dtype=object, encoding="utf-8-sig", keep_default_na=False)
+    assert list(c.columns) == [str(col) for col in df.columns] and len(c) == len(df)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, default=300)
+    parser.add_argument("--rows", type=int, default=None, help="rows per card")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "fleet.xlsx")
+        make_fleet_workbook(path, n_cards=args.cards, rows_per_card=args.rows)
+        store = SheetStore.from_file(path).load_all()
+        sheets = store.typed_sheets()
+        status = cached_status_table(7, 1000, sheets, VIEW_ALL)
+        fleet, _ = fleet_status_report(sheets)
+
+    for label, df in (("status table", status), ("fleet report", fleet)):
+        legacy_s, legacy_peak, legacy = profile(legacy_to_excel, df, args.repeats)
+        fast_s, fast_peak, fast = profile(xlsx_bytes, df, args.repeats)
+        csv_s, csv_peak, csv = profile(csv_bytes, df, args.repeats)
+        check_same(df, legacy, fast, csv)
+        print(f"{label} ({len(df)} rows x {df.shape[1]} cols):")
+        print(f"  to_excel (every rerun) : {legacy_s * 1000:8.1f} ms  peak {legacy_peak / 2**20:6.1f} MiB")
+        print(f"  write_only xlsx        : {fast_s * 1000:8.1f} ms  peak {fast_peak / 2**20:6.1f} MiB  "
+              f"({legacy_s / fast_s:.1f}x)")
+        print(f"  csv                    : {csv_s * 1000:8.1f} ms  peak {csv_peak / 2**20:6.1f} MiB")
+
+    # عرض الصفحة بدون ضغط: لا كتابة؛ أول ضغط يكتب ويحفظ، والضغط التالي من الـ memo
+    key = status_table_key(7, 1000, VIEW_ALL)
+    data = deferred_report(status, "xlsx", store.memo, key)
+    assert not any(k[0] == "report" for k in store._memo)
+    first = data()
+    start = time.perf_counter()
+    again = deferred_report(status, "xlsx", store.memo, key)()
+    hit_s = time.perf_counter() - start
+    assert again is first
+    print(f"rerun without click: 0 writes; repeated click (memo): {hit_s * 1e6:.0f} us  "
+          "equivalence: OK (same cells as to_excel, CSV same shape)")
+
+
+if __name__ == "__main__":
+    main()
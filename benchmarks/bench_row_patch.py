@@ -0,0 +1,110 @@
+"""
+⏱ حفظ تعديلات المحرر: استبدال الشيت كله بنسخة المحرر النصية (القديم: edited_df.astype(object))
+مقابل فرق الصفوف (EditSheets.apply_patch): الزمن والبايتات المكتوبة للوضعين excel و sqlite،
+مع التحقق أن الشيت المحفوظ = الشيت الأصلي بعد الفرق، وأن الخلايا غير المعدّلة تحتفظ بأنواعها
+
+    python benchmarks/bench_row_patch.py --rows 20000 --cells 5
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from row_patch import apply_patch, editor_patch, patch_message  # noqa: E402
+from storage import ExcelBackend, SQLiteBackend  # noqa: E402
+from benchmarks.synthetic_workbook import card_history_frame, service_plan_rows  # noqa: E402
+
+
+def editor_state(view, n_cells, seed=0):
+    """حالة st.data_editor بعد تعديل n_cells خلية وحذف صفين وإضافة صف"""
+    rnd = random.Random(seed)
+    edited = {}
+    for _ in range(n_cells):
+        row = rnd.randrange(len(view))
+        edited.setdefault(row, {})["Event"] = f"edited {row}"
+    deleted = rnd.sample([r for r in range(len(view)) if r not in edited], 2)
+    added = [{"card": "1", "Min_Tones": "151", "Max_Tones": "300", "Event": "added"}]
+    return {"edited_rows": edited, "added_rows": added, "deleted_rows": deleted}
+
+
+def edit_sheets(backend, name):
+    """الشيت محمّل مسبقاً كما في التطبيق (المحرر يعرض نسخته النصية)"""
+    store = backend.load_store(backend.fingerprint())
+    store.raw[name]
+    return store.edit_sheets()
+
+
+def save_whole_sheet(backend, name, view, patch):
+    """القديم: المحرر يرجع الشيت كله نصاً ويستبدل به الشيت"""
+    sheets = edit_sheets(backend, name)
+    sheets[name] = apply_patch(view, patch).astype(object)
+    return backend.save(sheets, dirty=[name])
+
+
+def save_patch(backend, name, patch):
+    sheets = edit_sheets(backend, name)
+    sheets.apply_patch(name, patch)
+    return backend.save(sheets, dirty=[name])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--cells", type=int, default=5)
+    args = parser.parse_args()
+
+    name = "Card1"
+    card = card_history_frame(1, args.rows).astype(object)
+    plan = pd.DataFrame(service_plan_rows(), columns=["Min_Tones", "Max_Tones", "Service"], dtype=object)
+    view = card.astype(str).reset_index(drop=True)
+    patch = editor_patch(editor_state(view, args.cells), view)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "src.xlsx")
+        with pd.ExcelWriter(src) as writer:
+            plan.to_excel(writer, sheet_name="ServicePlan", index=False)
+            card.to_excel(writer, sheet_name=name, index=False)
+        original = pd.read_excel(src, sheet_name=name, dtype=object)
+        expected = apply_patch(original, patch)
+
+        for kind in ("excel", "sqlite"):
+            for mode in ("whole-sheet", "patch"):
+                path = os.path.join(tmp, f"{kind}-{mode}.xlsx")
+                shutil.copy(src, path)
+                if kind == "excel":
+                    backend = ExcelBackend(path)
+                else:
+                    backend = SQLiteBackend(os.path.join(tmp, f"{kind}-{mode}.db"), path)
+                    backend.fingerprint()  # الاستيراد الأول خارج القياس
+                if mode == "whole-sheet":
+                    report = save_whole_sheet(backend, name, view, patch)
+                else:
+                    report = save_patch(backend, name, patch)
+                saved = backend.load_store(backend.fingerprint()).raw[name]
+                results[kind, mode] = (report, saved)
+
+            saved = results[kind, "patch"][1]
+            pd.testing.assert_frame_equal(saved.astype(str), expected.astype(str))
+            # الخلايا غير المعدّلة تبقى أرقاماً وفراغات؛ القديم حوّل كل الشيت إلى نص ("nan" للفارغ)
+            assert saved["Min_Tones"].iloc[:-1].map(type).eq(int).all()
+            assert results[kind, "whole-sheet"][1]["Min_Tones"].map(type).eq(str).all()
+
+    print(f"sheet: {args.rows} rows; patch: {args.cells} cells, -2 rows, +1 row")
+    print("equivalence: OK (saved sheet == original + patch, untouched cells keep their types)")
+    for kind in ("excel", "sqlite"):
+        whole, patched = results[kind, "whole-sheet"][0], results[kind, "patch"][0]
+        print(f"{kind:6}: whole sheet {whole['seconds'] * 1000:8.1f} ms {whole['sheet_bytes'] / 1024:8.0f} KiB   "
+              f"patch {patched['seconds'] * 1000:7.1f} ms {patched['sheet_bytes'] / 1024:7.1f} KiB  "
+              f"({whole['seconds'] / patched['seconds']:.0f}x)")
+    print("commit message:\n  " + "\n  ".join(patch_message(name, patch, original, "bench").splitlines()[:4]))
+
+
+if __name__ == "__main__":
+    main()
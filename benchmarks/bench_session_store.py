@@ -0,0 +1,86 @@
+"""
+⏱ سجل الجلسات: state.json (قراءة + مسح + كتابة في كل تشغيل) مقابل SQLite WAL
+والتحقق أن حجز المقاعد ذري تحت تسجيل دخول متزامن من خيوط كثيرة
+
+    python benchmarks/bench_session_store.py --users 50 --slots 30
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session_store import ACQUIRED, NO_SLOTS, SessionStore  # noqa: E402
+
+DURATION = timedelta(minutes=10)
+
+
+def legacy_rerun(path):
+    """ما كان يحدث في كل تشغيل: load_state + cleanup_sessions (+ save_state إذا تغير شيء)"""
+    with open(path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    now = datetime.now()
+    changed = False
+    for info in state.values():
+        if info.get("active") and now - datetime.fromisoformat(info["login_time"]) > DURATION:
+            info["active"] = False
+            changed = True
+    if changed:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=4, ensure_ascii=False)
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--slots", type=int, default=30)
+    parser.add_argument("--reruns", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(os.path.join(tmp, "sessions.db"), DURATION)
+        barrier = threading.Barrier(args.users)
+
+        def login(i):
+            barrier.wait()
+            return store.acquire(f"user{i}", args.slots)
+
+        with ThreadPoolExecutor(args.users) as pool:
+            results = list(pool.map(login, range(args.users)))
+        granted = results.count(ACQUIRED)
+        assert granted == args.slots and results.count(NO_SLOTS) == args.users - args.slots, results
+        assert len(store.active_users()) == args.slots
+        print(f"{args.users} concurrent logins, {args.slots} slots -> exactly {granted} granted: OK")
+
+        # انتهاء الجلسات lazy: المقعد يتحرر عند أول حجز بعد الانتهاء
+        later = time.time() + DURATION.total_seconds() + 1
+        assert store.acquire("late", args.slots, now=later) == ACQUIRED
+        assert store.active_users(now=later) == ["late"]
+        print("expired sessions are reclaimed lazily on acquire: OK")
+
+        state_path = os.path.join(tmp, "state.json")
+        now = datetime.now().isoformat()
+        with open(state_path, "w", encoding="utf-8") as f:
+            json.dump({f"user{i}": {"active": True, "login_time": now} for i in range(args.slots)}, f)
+        start = time.perf_counter()
+        for _ in range(args.reruns):
+            legacy_rerun(state_path)
+        legacy_s = time.perf_counter() - start
+        start = time.perf_counter()
+        for i in range(args.reruns):
+            store.remaining(f"user{i % args.slots}")
+        sqlite_s = time.perf_counter() - start
+
+    print(f"per-rerun session check: state.json {legacy_s / args.reruns * 1e6:7.1f} us, "
+          f"sqlite {sqlite_s / args.reruns * 1e6:7.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+⏱ قياس زمن تحميل الشيتات: القراءة المزدوجة القديمة مقابل مخزن الشيتات (قراءة واحدة)
+
+    python benchmarks/bench_sheet_load.py --cards 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from sheet_store import SheetStore  # noqa: E402
+from benchmarks.synthetic_workbook import make_fleet_workbook  # noqa: E402
+
+
+def legacy_double_read(path):
+    typed = pd.read_excel(path, sheet_name=None)
+    raw = pd.read_excel(path, sheet_name=None, dtype=object)
+    return typed, raw
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, default=500)
+    parser.add_argument("--warm-repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "fleet.xlsx")
+        make_fleet_workbook(path, n_cards=args.cards)
+        print(f"workbook: {args.cards} cards, {os.path.getsize(path) / 1024:.0f} KiB")
+
+        legacy_s, _ = timed(legacy_double_read, path)
+        cold_s, store = timed(SheetStore.from_file, path)
+
+        start = time.perf_counter()
+        for _ in range(args.warm_repeats):
+            store.typed_sheets()
+            store.edit_sheets()
+        warm_s = (time.perf_counter() - start) / args.warm_repeats
+
+    print(f"legacy cold (2 x read_excel): {legacy_s:8.3f} s")
+    print(f"store cold  (1 parse)       : {cold_s:8.3f} s")
+    print(f"store warm  (cached views)  : {warm_s * 1e6:8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+⏱ قياس محرك الحالة (status_engine) مقابل حلقة iterrows القديمة في check_machine_status
+مع التحقق من أن الجدولين متطابقان (على الملف الحقيقي، وحالات حدية: صيغ تواريخ مختلفة، خلايا
+NaT/None/NA، شرائح بحد فارغ، وعلى كروت مولدة بآلاف الصفوف)،
+وأن الاستعلام من ملخص الكارت (machine_status_table) يعطي نفس الجدول
+
+    python benchmarks/bench_status_engine.py --rows 5000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from sheet_store import SheetStore  # noqa: E402
+from status_engine import (  # noqa: E402
+    VIEW_ALL, VIEW_CURRENT, VIEW_CUSTOM, VIEW_HIGHER, VIEW_LOWER, VIEW_OPTIONS,
+    build_status_table, card_summary, machine_status_table, normalize_name, select_slices, split_needed_services,
+)
+from benchmarks.synthetic_workbook import card_history_frame, service_plan_rows  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def legacy_select_slices(service_plan_df, view_option, current_tons, min_range, max_range):
+    """اختيار الشرائح القديم بالمسح الكامل (مرجع للمقارنة)"""
+    if view_option == VIEW_CURRENT:
+        return service_plan_df[(service_plan_df["Min_Tones"] <= current_tons) & (service_plan_df["Max_Tones"] >= current_tons)]
+    if view_option == VIEW_LOWER:
+        return service_plan_df[service_plan_df["Max_Tones"] <= current_tons]
+    if view_option == VIEW_HIGHER:
+        return service_plan_df[service_plan_df["Min_Tones"] >= current_tons]
+    if view_option == VIEW_CUSTOM:
+        return service_plan_df[(service_plan_df["Min_Tones"] >= min_range) & (service_plan_df["Max_Tones"] <= max_range)]
+    assert view_option == VIEW_ALL
+    return service_plan_df.copy()
+
+
+def legacy_status_table(card_num, selected_slices, card_df):
+    """نسخة طبق الأصل من حلقة check_machine_status القديمة (مرجع للمقارنة)"""
+    all_results = []
+    for _, current_slice in selected_slices.iterrows():
+        slice_min = current_slice["Min_Tones"]
+        slice_max = current_slice["Max_Tones"]
+        needed_service_raw = current_slice.get("Service", "")
+        needed_parts = split_needed_services(needed_service_raw)
+        needed_norm = [normalize_name(p) for p in needed_parts]
+
+        mask = (card_df.get("Min_Tones", 0).fillna(0) <= slice_max) & (card_df.get("Max_Tones", 0).fillna(0) >= slice_min)
+        matching_rows = card_df[mask]
+
+        done_services_set = set()
+        last_date = "-"
+        last_servised_by = "-"
+        last_event = "-"
+        last_correction = "-"
+
+        if not matching_rows.empty:
+            ignore_cols = {"card", "Tones", "Min_Tones", "Max_Tones", "Date", "Other", "Servised by", "Event", "Correction"}
+            for _, r in matching_rows.iterrows():
+                for col in matching_rows.columns:
+                    if col not in ignore_cols:
+                        val = str(r.get(col, "")).strip()
+                        if val and val.lower() not in ["nan", "none", ""]:
+                            done_services_set.add(col)
+            if "Date" in matching_rows.columns:
+                try:
+                    cleaned_dates = matching_rows["Date"].astype(str).str.replace("\\", "/", regex=False)
+                    dates = pd.to_datetime(cleaned_dates, errors="coerce", dayfirst=True)
+                    if dates.notna().any():
+                        idx = dates.idxmax()
+                        last_date = dates.loc[idx].strftime("%d/%m/%Y")
+                except Exception:
+                    last_date = "-"
+            if "Servised by" in matching_rows.columns:
+                last_servised_by = str(matching_rows["Servised by"].dropna().iloc[-1]) if matching_rows["Servised by"].notna().any() else "-"
+            if "Event" in matching_rows.columns:
+                last_event = str(matching_rows["Event"].dropna().iloc[-1]) if matching_rows["Event"].notna().any() else "-"
+            if "Correction" in matching_rows.columns:
+                last_correction = str(matching_rows["Correction"].dropna().iloc[-1]) if matching_rows["Correction"].notna().any() else "-"
+
+        done_services = sorted(list(done_services_set))
+        done_norm = [normalize_name(c) for c in done_services]
+        not_done = [orig for orig, n in zip(needed_parts, needed_norm) if n not in done_norm]
+
+        all_results.append({
+            "Card Number": card_num,
+            "Min_Tons": slice_min,
+            "Max_Tons": slice_max,
+            "Service Needed": " + ".join(needed_parts) if needed_parts else "-",
+            "Service Done": ", ".join(done_services) if done_services else "-",
+            "Service Didn't Done": ", ".join(not_done) if not_done else "-",
+            "Event": last_event,
+            "Correction": last_correction,
+            "Servised by": last_servised_by,
+            "Date": last_date
+        })
+
+    return pd.DataFrame(all_results).dropna(how="all").reset_index(drop=True)
+
+
+def check_equivalence(sheets, cards, tons_values):
+    """مقارنة المحرك بالحلقة القديمة لكل كارت/طن/نطاق عرض"""
+    plan = sheets["ServicePlan"]
+    checked = 0
+    for card_num in cards:
+        card_df = sheets[f"Card{card_num}"]
+        for tons in tons_values:
+            for view in VIEW_OPTIONS:
+                slices = select_slices(plan, view, tons, max(0, tons - 500), tons + 500)
+                legacy = legacy_select_slices(plan, view, tons, max(0, tons - 500), tons + 500)
+                pd.testing.assert_frame_equal(slices, legacy)
+                if slices.empty:
+                    continue
+                expected = legacy_status_table(card_num, legacy, card_df)
+                pd.testing.assert_frame_equal(build_status_table(card_num, slices, card_df), expected)
+                pd.testing.assert_frame_equal(
+                    machine_status_table(card_num, tons, sheets, view, max(0, tons - 500), tons + 500), expected,
+                )
+                checked += 1
+    return checked
+
+
+def edge_case_sheets():
+    """
+    مدخلات لا يغطيها الملف الحقيقي: تواريخ بصيغ مختلفة داخل نفس الكارت (الصيغة تُستنتج من أول
+    صف في كل شريحة)، قيم لا تُستنتج صيغتها، خلايا خدمات NaT / None / pd.NA، وشرائح خطة بحد فارغ
+    """
+    plan = pd.DataFrame({
+        "Min_Tones": [0, 151, 301, 451, np.nan, 601],
+        "Max_Tones": [150, 300, 450, np.nan, 700, 900],
+        "Service": ["Oil + Belt", "Belt", "Oil, Filter", "Oil", "Belt", "Filter"],
+    })
+    card = pd.DataFrame({
+        "card": [1] * 9,
+        "Min_Tones": [0, 0, 151, 151, 301, 301, 451, 601, np.nan],
+        "Max_Tones": [150, 150, 300, 300, 450, 450, 600, 900, np.nan],
+        "Tones": [100, 120, 200, 250, 320, 400, 500, 700, 50],
+        "Date": [
+            "2025-05-20", "21\\5\\2025",  # أول صف ISO: الثاني NaT في هذه الشريحة
+            "3\\6\\2025", "2025-06-30",  # أول صف d/m/Y: الثاني NaT
+            "next tuesday", "5 June 2025",  # لا صيغة مستنتجة: كل قيمة منفردة
+            np.nan, "1\\1\\1111\\", "7/7/2025",
+        ],
+        "Oil": [np.nan, "done", None, np.nan, "x", np.nan, np.nan, "y", np.nan],
+        "Belt": pd.Series([pd.NaT, pd.NaT, pd.Timestamp("2025-01-01"), pd.NaT, pd.NaT, pd.NaT, pd.NaT, pd.NaT,
+                           pd.NaT]),
+        "Filter": pd.array([pd.NA, "ok", pd.NA, pd.NA, pd.NA, pd.NA, pd.NA, pd.NA, pd.NA], dtype=object),
+        "Event": ["e1", np.nan, "e3", "e4", np.nan, "e6", "e7", np.nan, "e9"],
+        "Correction": [np.nan] * 9,
+        "Servised by": ["a", "b", np.nan, "d", "e", np.nan, "g", "h", "i"],
+    })
+    return {"ServicePlan": plan, "Card1": card}
+
+
+def timed(fn, *args, repeats=3):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--slices", type=int, default=11)
+    args = parser.parse_args()
+
+    workbook = os.path.join(ROOT, "Machine_Service_Lookup.xlsx")
+    if os.path.exists(workbook):
+        sheets = SheetStore.from_file(workbook).typed_sheets()
+        cards = [int(n[4:]) for n in sheets if n.startswith("Card")]
+        n = check_equivalence(sheets, cards, [0, 150, 400, 700, 1000, 2000])
+        print(f"equivalence (real workbook): {n} tables identical")
+
+    n = check_equivalence(edge_case_sheets(), [1], [0, 200, 460, 650, 800])
+    print(f"equivalence (edge cases: mixed date formats, NaT/None/NA cells, empty plan bounds): "
+          f"{n} tables identical")
+
+    plan = pd.DataFrame(service_plan_rows(args.slices), columns=["Min_Tones", "Max_Tones", "Service"])
+    for n_rows in args.rows:
+        card_df = card_history_frame(1, n_rows, n_slices=args.slices, seed=n_rows)
+        synthetic = {"ServicePlan": plan, "Card1": card_df}
+        check_equivalence(synthetic, [1], [0, 400, 1000])
+        slices = select_slices(plan, VIEW_OPTIONS[-1], 0)
+        legacy_s = timed(legacy_status_table, 1, slices, card_df, repeats=1)
+        engine_s = timed(build_status_table, 1, slices, card_df)
+        # الملخص مع البصمة: يُبنى مرة، وكل استعلام بعدها اختيار صفوف
+        store = SheetStore(synthetic)
+        typed = store.typed_sheets()
+        card_summary(typed, 1)
+        summary_s = timed(machine_status_table, 1, 400, typed, VIEW_LOWER)
+        print(f"{n_rows:>6} history rows x {len(slices)} slices: "
+              f"legacy {legacy_s * 1000:9.1f} ms | engine {engine_s * 1000:7.1f} ms "
+              f"({legacy_s / engine_s:.0f}x) | summary lookup {summary_s * 1000:5.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
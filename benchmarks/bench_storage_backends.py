@@ -0,0 +1,117 @@
+"""
+⏱ طبقة التخزين: ملف XLSX مقابل قاعدة SQLite على نفس الأسطول
+- أول تحميل + جدول حالة ماكينة واحدة (SQLite يقرأ الشيتات المطلوبة فقط)
+- حفظ شيت واحد معدّل، ثم التصدير إلى XLSX (ترقيع الشيت المعدّل)
+مع التحقق أن الوضعين يعطيان نفس الجدول ونفس البيانات بعد التصدير،
+وأن خلايا الوقت/التاريخ/المدة/np.bool_ تعود من SQLite بنفس نوعها (ونوع غير معروف يُرفض)
+
+    python benchmarks/bench_storage_backends.py --cards 1000
+"""
+import argparse
+import datetime as dt
+import decimal
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from status_engine import machine_status_table  # noqa: E402
+from storage import ExcelBackend, SQLiteBackend  # noqa: E402
+from benchmarks.bench_incremental_save import edit_one_sheet  # noqa: E402
+from benchmarks.synthetic_workbook import make_fleet_workbook  # noqa: E402
+
+
+def timed(fn):
+    start = time.perf_counter()
+    value = fn()
+    return value, time.perf_counter() - start
+
+
+def status_for(backend, card):
+    store = backend.load_store(backend.fingerprint())
+    return machine_status_table(card, 500, store.typed_sheets()), store
+
+
+CELL_VALUES = [
+    dt.time(8, 30), dt.time(23, 59, 59, 5), dt.date(2025, 5, 20), dt.timedelta(hours=1, microseconds=7),
+    np.bool_(True), True, dt.datetime(2025, 5, 20, 8, 30),
+    dt.datetime(2025, 5, 20, 8, 30, tzinfo=dt.timezone(dt.timedelta(hours=3))), 5, 2.5, "text",
+]
+
+
+def check_cell_types(tmp):
+    """خلايا بأنواع نادرة تعود من القاعدة بنفس النوع والقيمة، ونوع غير معروف يرفض الحفظ"""
+    backend = SQLiteBackend(os.path.join(tmp, "types.db"), os.path.join(tmp, "types.xlsx"))
+    df = pd.DataFrame({"value": pd.Series(CELL_VALUES, dtype=object)})
+    backend.import_sheets({"Types": df})
+    back = backend.read_sheet("Types")["value"].tolist()
+    for expected, value in zip(CELL_VALUES, back):
+        expected_type = bool if isinstance(expected, np.bool_) else type(expected)
+        assert type(value) is expected_type and value == expected, (expected, value)
+    try:
+        backend.save({"Types": pd.DataFrame({"value": [decimal.Decimal("1.5")]})}, dirty=["Types"])
+        raise AssertionError("Decimal cell was saved")
+    except TypeError:
+        pass
+    assert backend.read_sheet("Types")["value"].tolist() == back
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, default=1000)
+    parser.add_argument("--card", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        check_cell_types(tmp)
+        src = os.path.join(tmp, "fleet.xlsx")
+        make_fleet_workbook(src, n_cards=args.cards)
+        print(f"workbook: {args.cards} cards, {os.path.getsize(src) / 1024:.0f} KiB")
+        excel_path = os.path.join(tmp, "excel.xlsx")
+        sqlite_xlsx = os.path.join(tmp, "sqlite.xlsx")
+        shutil.copy(src, excel_path)
+        shutil.copy(src, sqlite_xlsx)
+
+        excel = ExcelBackend(excel_path)
+        sqlite = SQLiteBackend(os.path.join(tmp, "fleet.db"), sqlite_xlsx)
+        _, import_s = timed(sqlite.fingerprint)
+
+        (excel_table, excel_store), excel_load_s = timed(lambda: status_for(excel, args.card))
+        (sqlite_table, sqlite_store), sqlite_load_s = timed(lambda: status_for(sqlite, args.card))
+        pd.testing.assert_frame_equal(excel_table, sqlite_table)
+        loaded = len(sqlite_store.loaded_sheets())
+
+        name = f"Card{args.card}"
+        excel_sheets = excel_store.edit_sheets()
+        edit_one_sheet(excel_sheets, name)
+        excel_report, _ = timed(lambda: excel.save(excel_sheets, dirty=[name]))
+        sqlite_sheets = {name: excel_sheets[name]}
+        sqlite_report, _ = timed(lambda: sqlite.save(sqlite_sheets, dirty=[name]))
+        _, export_s = timed(sqlite.export_xlsx)
+
+        a = pd.read_excel(excel_path, sheet_name=None, dtype=object)
+        b = pd.read_excel(sqlite_xlsx, sheet_name=None, dtype=object)
+        assert list(a) == list(b)
+        for sheet in a:
+            pd.testing.assert_frame_equal(a[sheet], b[sheet])
+
+    print("equivalence: OK (same status table, same sheets after export)")
+    print("sqlite cell types: OK (time/date/timedelta/np.bool_ round-trip, Decimal refused)")
+    print(f"sqlite import (one-off) : {import_s:8.3f} s")
+    print(f"cold load + status excel: {excel_load_s:8.3f} s  ({args.cards + 2} sheets parsed)")
+    print(f"cold load + status sqlite: {sqlite_load_s:7.3f} s  ({loaded} sheets read)  "
+          f"({excel_load_s / sqlite_load_s:.1f}x faster)")
+    print(f"save one sheet excel    : {excel_report['seconds']:8.3f} s  ({excel_report['mode']})")
+    print(f"save one sheet sqlite   : {sqlite_report['seconds']:8.3f} s  "
+          f"({excel_report['seconds'] / sqlite_report['seconds']:.1f}x faster)")
+    print(f"export to xlsx (patch)  : {export_s:8.3f} s")
+
+
+if __name__ == "__main__":
+    main()
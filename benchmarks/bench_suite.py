@@ -0,0 +1,266 @@
+"""
+📈 مجموعة القياسات الثابتة: ملف أسطول تجريبي بنفس الحجم في كل مرة (نفس seed) ثم
+تحميل الشيتات، البصمة، جدول حالة ماكينة وتقرير الأسطول، إضافة صف، والحفظ (كامل وشيت واحد)
+الوسيط لكل سيناريو يُضاف كسطر JSONL إلى ملف النتائج (مع الـ commit والإصدارات)، ويُقارن بآخر
+تشغيل بنفس المعاملات لإظهار التراجع قبل أن يظهر في الإنتاج
+
+    python benchmarks/bench_suite.py --cards 300 --rows 40 --repeats 3
+    python benchmarks/bench_suite.py --only save --no-save
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd  # noqa: E402
+
+from batch_edit import insert_rows_by_range  # noqa: E402
+from durable_io import append_jsonl  # noqa: E402
+from sheet_store import ARROW_AVAILABLE, SheetStore, file_digest, file_fingerprint  # noqa: E402
+from status_engine import (  # noqa: E402
+    VIEW_CURRENT, cached_status_table, fleet_status_report, machine_status_table,
+)
+from storage import ExcelBackend, SQLiteBackend  # noqa: E402
+from benchmarks.bench_incremental_save import edit_one_sheet  # noqa: E402
+from benchmarks.synthetic_workbook import make_fleet_workbook  # noqa: E402
+
+RESULTS_FILE = os.path.join(ROOT, "benchmarks", "results", "suite.jsonl")
+REGRESSION_THRESHOLD = 0.2  # أبطأ من التشغيل السابق بأكثر من 20%
+REGRESSION_FLOOR_SECONDS = 0.001  # والفرق أكبر من 1ms (أزمنة الميكروثانية ضوضاء)
+
+
+def measure(fn, repeats, setup=None):
+    """وسيط زمن fn(setup()) على repeats مرة (التجهيز خارج القياس)"""
+    times = []
+    for _ in range(repeats):
+        arg = setup() if setup is not None else None
+        start = time.perf_counter()
+        fn(arg)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+_copies = itertools.count()
+
+
+def fresh_copy(src, tmp):
+    """نسخة جديدة من الملف لكل تكرار (الحفظ يغيّر الملف)"""
+    path = os.path.join(tmp, f"run{next(_copies)}.xlsx")
+    shutil.copy(src, path)
+    return path
+
+
+# -------------------------------
+# 🧪 السيناريوهات: كل دالة ترجع {الاسم: الثواني}
+# -------------------------------
+def bench_load(src, tmp, card, repeats):
+    cache_dir = os.path.join(tmp, "cache")
+    out = {
+        "load.xlsx_all": measure(lambda _: SheetStore.from_file(src), repeats),
+        "load.lazy_one_sheet": measure(
+            lambda backend: backend.load_store(backend.fingerprint()).raw[f"Card{card}"], repeats,
+            setup=lambda: ExcelBackend(fresh_copy(src, tmp)),
+        ),
+    }
+    if ARROW_AVAILABLE:
+        fingerprint = file_fingerprint(src)
+        SheetStore.from_file(src, fingerprint=fingerprint, cache_dir=cache_dir)
+        out["load.columnar_cache"] = measure(
+            lambda _: SheetStore.from_file(src, fingerprint=fingerprint, cache_dir=cache_dir), repeats,
+        )
+    return out
+
+
+def bench_fingerprint(src, tmp, repeats):
+    file_fingerprint(src)
+    sqlite = SQLiteBackend(os.path.join(tmp, "fingerprint.db"), fresh_copy(src, tmp))
+    sqlite.fingerprint()
+    return {
+        "fingerprint.digest": measure(lambda _: file_digest(src), repeats),
+        "fingerprint.stat_hit": measure(lambda _: file_fingerprint(src), repeats),
+        "fingerprint.sqlite": measure(lambda _: sqlite.fingerprint(), repeats),
+    }
+
+
+def bench_status(src, card, tons, repeats):
+    store = SheetStore.from_file(src).load_all()
+    typed = store.typed_sheets()
+    table = machine_status_table(card, tons, typed, VIEW_CURRENT)
+    assert table is not None and len(table), "no status rows for the benchmark card"
+    memo = cached_status_table(card, tons, typed, VIEW_CURRENT)
+    pd.testing.assert_frame_equal(memo, table)
+    assert cached_status_table(card, tons, typed, VIEW_CURRENT) is memo, "memo miss on the same query"
+    return {
+        # أول فحص لكل بصمة: تجهيز الكارت وفهرس الخطة
+        "status.machine_cold": measure(
+            lambda sheets: machine_status_table(card, tons, sheets, VIEW_CURRENT), repeats,
+            setup=lambda: SheetStore.from_file(src).load_all().typed_sheets(),
+        ),
+        "status.machine_warm": measure(lambda _: machine_status_table(card, tons, typed, VIEW_CURRENT), repeats),
+        # إعادة تشغيل بنفس الاستعلام (ودجت آخر): النتيجة من memo البصمة
+        "status.machine_memo_hit": measure(lambda _: cached_status_table(card, tons, typed, VIEW_CURRENT), repeats),
+        "status.fleet_report": measure(
+            lambda sheets: fleet_status_report(sheets), repeats,
+            setup=lambda: SheetStore.from_file(src).load_all().typed_sheets(),
+        ),
+    }
+
+
+def bench_insert(src, card, repeats):
+    name = f"Card{card}"
+    store = SheetStore.from_file(src)
+    row = {"card": str(card), "Min_Tones": "151", "Max_Tones": "300", "Event": "inserted"}
+
+    def insert(sheets):
+        insert_rows_by_range(sheets, name, [row])
+        assert (sheets[name]["Event"] == "inserted").sum() == 1
+
+    return {"insert.one_row": measure(insert, repeats, setup=store.edit_sheets)}
+
+
+def bench_save(src, tmp, card, repeats):
+    name = f"Card{card}"
+
+    def excel_sheets(full):
+        backend = ExcelBackend(fresh_copy(src, tmp))
+        store = backend.load_store(backend.fingerprint())
+        if full:
+            store.load_all()
+        sheets = store.edit_sheets()
+        edit_one_sheet(sheets, name)
+        return backend, sheets
+
+    def sqlite_sheets():
+        path = fresh_copy(src, tmp)
+        backend = SQLiteBackend(path[:-len(".xlsx")] + ".db", path)
+        sheets = backend.load_store(backend.fingerprint()).edit_sheets()
+        edit_one_sheet(sheets, name)
+        return backend, sheets
+
+    return {
+        "save.excel_full": measure(lambda a: a[0].save(a[1]), repeats, setup=lambda: excel_sheets(True)),
+        "save.excel_one_sheet": measure(lambda a: a[0].save(a[1], dirty=[name]), repeats,
+                                        setup=lambda: excel_sheets(False)),
+        "save.sqlite_one_sheet": measure(lambda a: a[0].save(a[1], dirty=[name]), repeats, setup=sqlite_sheets),
+    }
+
+
+SUITES = ("load", "fingerprint", "status", "insert", "save")
+
+
+# -------------------------------
+# 💾 حفظ النتائج والمقارنة
+# -------------------------------
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                             timeout=10)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def previous_results(path, params):
+    """آخر تشغيل مسجل بنفس المعاملات (الأسطر التالفة تُتجاهل)"""
+    if not os.path.exists(path):
+        return None
+    last = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("params") == params:
+                last = record
+    return last
+
+
+def print_results(results, previous, threshold):
+    """الجدول مع التغير عن التشغيل السابق؛ يرجع أسماء السيناريوهات المتراجعة"""
+    regressions = []
+    before = (previous or {}).get("results", {})
+    for name, seconds in results.items():
+        line = f"{name:24} {seconds * 1000:10.2f} ms"
+        if name in before and before[name] > 0:
+            change = seconds / before[name] - 1
+            flag = ""
+            if change > threshold and seconds - before[name] > REGRESSION_FLOOR_SECONDS:
+                flag = "  REGRESSION"
+                regressions.append(name)
+            line += f"   prev {before[name] * 1000:10.2f} ms  {change:+7.1%}{flag}"
+        print(line)
+    if previous:
+        print(f"compared with {previous.get('time')} (commit {previous.get('commit')})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, default=300)
+    parser.add_argument("--rows", type=int, default=None, help="rows per card (default: one per slice)")
+    parser.add_argument("--slices", type=int, default=11)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--card", type=int, default=7)
+    parser.add_argument("--tons", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--only", nargs="+", choices=SUITES, default=list(SUITES))
+    parser.add_argument("--results", default=RESULTS_FILE)
+    parser.add_argument("--label", default=None, help="free text stored with the run (machine, branch...)")
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    params = {"cards": args.cards, "rows": args.rows, "slices": args.slices, "seed": args.seed,
+              "card": args.card, "tons": args.tons}
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "fleet.xlsx")
+        make_fleet_workbook(src, n_cards=args.cards, n_slices=args.slices, seed=args.seed, rows_per_card=args.rows)
+        rows = len(pd.read_excel(src, sheet_name=f"Card{args.card}"))
+        print(f"workbook: {args.cards} cards x {rows} rows, {os.path.getsize(src) / 1024:.0f} KiB, "
+              f"median of {args.repeats}")
+        if "load" in args.only:
+            results.update(bench_load(src, tmp, args.card, args.repeats))
+        if "fingerprint" in args.only:
+            results.update(bench_fingerprint(src, tmp, args.repeats))
+        if "status" in args.only:
+            results.update(bench_status(src, args.card, args.tons, args.repeats))
+        if "insert" in args.only:
+            results.update(bench_insert(src, args.card, args.repeats))
+        if "save" in args.only:
+            results.update(bench_save(src, tmp, args.card, args.repeats))
+
+    regressions = print_results(results, previous_results(args.results, params), args.threshold)
+    if not args.no_save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+        append_jsonl(args.results, {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "label": args.label,
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "machine": platform.node(),
+            "params": params,
+            "repeats": args.repeats,
+            "results": {name: round(seconds, 6) for name, seconds in results.items()},
+        })
+        print(f"saved to {args.results}")
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
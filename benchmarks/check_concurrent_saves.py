@@ -0,0 +1,279 @@
+"""
+✅ فحص الحفظ المتزامن: جلستان تحمّلان نفس البصمة وتحفظان بالتتابع (الثانية ببصمة قديمة)
+للوضعين excel و sqlite:
+- شيتات مختلفة، وصفوف مختلفة في نفس الشيت (فرق المحرر + إدراج + حذف + استبدال الشيت) → دمج
+- نفس الصف من الجلستين → SaveConflict ولا يُكتب شيء
+- شيت يُقرأ متأخراً (أول مرة أو بعد الـ LRU) لا يُقرأ من حفظ أحدث من نسخة المخزن
+  (sqlite: StaleSheet بدل معاملة قراءة مفتوحة تمنع الـ checkpoint)
+- شيت محذوف يُحذف من الملف/القاعدة
+- القديم (بدون base): الحفظ الثاني يكتب فوق تعديل الأول في نفس الشيت
+ثم طابور الرفع على عميل GitHub وهمي: رفع من جهاز آخر بعد آخر مزامنة → 409 → دمج ثم رفع
+
+    python benchmarks/check_concurrent_saves.py --cards 20
+"""
+import argparse
+import io
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from batch_edit import EditBatch  # noqa: E402
+from merge_engine import SaveConflict, merge_remote  # noqa: E402
+from push_queue import PushQueue  # noqa: E402
+from storage import ExcelBackend, SQLiteBackend, StaleSheet  # noqa: E402
+from benchmarks.fake_github import FakeGithub, FakeRepo  # noqa: E402
+from benchmarks.synthetic_workbook import make_fleet_workbook  # noqa: E402
+
+
+def edit(row, value):
+    return {"edited_rows": {row: {"Event": value}}, "added_rows": [], "deleted_rows": []}
+
+
+def delete(row):
+    return {"edited_rows": {}, "added_rows": [], "deleted_rows": [row]}
+
+
+def new_row(card):
+    return {"card": str(card), "Min_Tones": "151", "Max_Tones": "300", "Tones": "200", "Event": "inserted"}
+
+
+def open_backend(kind, tmp, src, label):
+    path = os.path.join(tmp, f"{kind}-{label}.xlsx")
+    shutil.copy(src, path)
+    if kind == "excel":
+        return ExcelBackend(path)
+    backend = SQLiteBackend(os.path.join(tmp, f"{kind}-{label}.db"), path)
+    backend.fingerprint()
+    return backend
+
+
+def sessions(backend, names=("Card1", "Card2")):
+    """
+    جلستان على نفس البصمة (كل جلسة بمخزنها كما في get_edit_store)، والشيتات معروضة قبل التعديل
+    كما في التبويبات (وضع sqlite يقرأ الشيت من القاعدة عند أول طلب)
+    """
+    fingerprint = backend.fingerprint()
+    out = []
+    for _ in range(2):
+        store = backend.load_store(fingerprint)
+        for name in names:
+            store.string_view(name)
+        out.append(store.edit_sheets())
+    return out
+
+
+def current(backend, name):
+    return backend.load_store(backend.fingerprint()).raw[name].reset_index(drop=True)
+
+
+def save(backend, sheets, dirty, stale_base=True):
+    base = sheets.base_fingerprint if stale_base else None
+    return backend.save(sheets, dirty=dirty, base=base)
+
+
+def check_backend(kind, tmp, src):
+    original = pd.read_excel(src, sheet_name=None, dtype=object)
+    card1, card2 = original["Card1"], original["Card2"]
+    timings = {}
+
+    # 1) شيتات مختلفة: فرق المحرر في Card1 ودفعة إضافة صف في Card2
+    backend = open_backend(kind, tmp, src, "sheets")
+    a, b = sessions(backend)
+    a.apply_patch("Card1", edit(2, "edit A"))
+    save(backend, a, ["Card1"])
+    batch = EditBatch()
+    batch.add_row("Card2", new_row(2))
+    report = save(backend, b, batch.apply(b))
+    assert report["merged"] == [] and current(backend, "Card1").at[2, "Event"] == "edit A"
+    assert len(current(backend, "Card2")) == len(card2) + 1
+
+    # 2) نفس الشيت، صفوف مختلفة: تعديل + حذف + إدراج تحت الرينج + استبدال الشيت
+    backend = open_backend(kind, tmp, src, "rows")
+    a, b = sessions(backend)
+    a.apply_patch("Card1", edit(2, "edit A"))
+    save(backend, a, ["Card1"])
+    b.apply_patch("Card1", delete(8))
+    start = time.perf_counter()
+    report = save(backend, b, ["Card1"])
+    timings["rebase"] = time.perf_counter() - start
+    assert report["merged"] == ["Card1"], report
+    expected = card1.copy()
+    expected.at[2, "Event"] = "edit A"
+    expected = expected.drop(index=[8]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(current(backend, "Card1").astype(str), expected.astype(str))
+
+    a, c = sessions(backend)
+    a.insert_rows("Card1", [(1, new_row(1))])
+    save(backend, a, ["Card1"])
+    c["Card1"] = c["Card1"].drop(index=[5]).reset_index(drop=True)  # تبويب/دفعة يستبدل الشيت
+    report = save(backend, c, ["Card1"])
+    df = current(backend, "Card1")
+    assert report["merged"] == ["Card1"] and len(df) == len(card1) - 1
+    assert df.at[1, "Event"] == "inserted" and df.at[3, "Event"] == "edit A"
+
+    a, b = sessions(backend)
+    a.apply_patch("Card1", edit(0, "x"))
+    save(backend, a, ["Card1"])
+    batch = EditBatch()
+    batch.add_row("Card1", new_row(1))
+    report = save(backend, b, batch.apply(b))
+    df = current(backend, "Card1")
+    assert report["merged"] == ["Card1"] and df.at[0, "Event"] == "x"
+    assert (df["Event"] == "inserted").sum() == 2
+
+    # 3) نفس الصف من الجلستين: تعارض، ولا يتغير الملف
+    a, b = sessions(backend)
+    a.apply_patch("Card1", edit(4, "same row A"))
+    save(backend, a, ["Card1"])
+    before = backend.fingerprint()
+    b.apply_patch("Card1", edit(4, "same row B"))
+    try:
+        save(backend, b, ["Card1"])
+        raise AssertionError("overlapping edit was saved")
+    except SaveConflict as e:
+        assert e.sheets == ["Card1"], e.conflicts
+    assert backend.fingerprint() == before and current(backend, "Card1").at[4, "Event"] == "same row A"
+
+    # 4) شيت يُقرأ لأول مرة (أو بعد إخراجه من الـ LRU) بعد حفظ جلسة أخرى: لا يُقرأ بصفوف أحدث من
+    #    نسخة المخزن. excel يقرؤه من bytes نفس النسخة فيُدمج الحفظ على الأساس الصحيح؛ sqlite لا يبقي
+    #    معاملة قراءة مفتوحة، فالشيت الذي تغيّر يرفع StaleSheet (والذي لم يتغير يُقرأ عادياً)
+    backend = open_backend(kind, tmp, src, "pinned")
+    backend.max_loaded = 1
+    a = backend.load_store(backend.fingerprint()).edit_sheets()
+    store = backend.load_store(backend.fingerprint())
+    store.raw["Card1"]
+    store.raw["Card2"]  # يخرج Card1 من الـ LRU
+    a.apply_patch("Card1", edit(2, "edit A"))
+    save(backend, a, ["Card1"])
+    a.apply_patch("Card3", edit(1, "edit A3"))
+    save(backend, a, ["Card3"], stale_base=False)
+    assert str(store.raw["Card4"].at[1, "Event"]) == str(original["Card4"].at[1, "Event"])
+    b = store.edit_sheets()
+    b.apply_patch("Card1", edit(4, "edit B"))
+    if kind == "sqlite":
+        for name in ("Card1", "Card3"):
+            try:
+                store.raw[name]
+                raise AssertionError(f"{name} re-read at a newer revision")
+            except StaleSheet as e:
+                assert e.sheets == [name]
+        try:
+            save(backend, b, ["Card1"])
+            raise AssertionError("saved over a sheet read at a newer revision")
+        except SaveConflict:
+            pass
+        assert str(current(backend, "Card1").at[4, "Event"]) == str(card1.at[4, "Event"])
+        conn = sqlite3.connect(backend.db_path)
+        checkpoint = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        conn.close()
+        assert checkpoint[0] == 0 and checkpoint[1] == 0, f"open read transaction blocks checkpoint {checkpoint}"
+    else:
+        assert str(store.raw["Card1"].at[2, "Event"]) == str(card1.at[2, "Event"]), "evicted sheet re-read at a newer revision"
+        assert str(store.raw["Card3"].at[1, "Event"]) == str(original["Card3"].at[1, "Event"]), "late sheet read at a newer revision"
+        report = save(backend, b, ["Card1"])
+        df = current(backend, "Card1")
+        assert report["merged"] == ["Card1"] and df.at[2, "Event"] == "edit A" and df.at[4, "Event"] == "edit B"
+
+    # 5) حذف شيت معدّل: يختفي من المخزن التالي (ومن ملف التصدير) ويظهر في تقرير الحفظ
+    backend = open_backend(kind, tmp, src, "removed")
+    a, _ = sessions(backend, names=("Card3",))
+    del a["Card3"]
+    report = save(backend, a, ["Card3"])
+    assert "Card3" not in backend.load_store(backend.fingerprint()).sheet_names(), "removed sheet still stored"
+    if kind == "sqlite":
+        assert "Card3" in report["sheets"], report
+        assert "Card3" not in pd.read_excel(backend.export_xlsx(), sheet_name=None), "removed sheet exported"
+
+    # 6) القديم (بدون base): الحفظ الثاني يكتب فوق تعديل الأول في نفس الشيت
+    backend = open_backend(kind, tmp, src, "legacy")
+    a, b = sessions(backend)
+    a.apply_patch("Card1", edit(2, "edit A"))
+    save(backend, a, ["Card1"], stale_base=False)
+    b["Card1"] = b["Card1"].drop(index=[8]).reset_index(drop=True)
+    save(backend, b, ["Card1"], stale_base=False)
+    lost = current(backend, "Card1").at[2, "Event"] != "edit A"
+    return timings, lost
+
+
+def check_push_queue(tmp, src):
+    """جهازان يرفعان نفس الملف: الثاني يرد عليه GitHub بـ 409 فيدمج ثم يرفع"""
+    repo = FakeRepo()
+    with open(src, "rb") as f:
+        repo.create_file("book.xlsx", "init", f.read())
+    base_sha = repo.files["book.xlsx"].sha
+
+    def other_machine_push(sheet, row, value):
+        other = os.path.join(tmp, "other.xlsx")
+        with open(other, "wb") as f:
+            f.write(repo.files["book.xlsx"].decoded_content)
+        backend = ExcelBackend(other)
+        sheets = backend.load_store(backend.fingerprint()).edit_sheets()
+        sheets.apply_patch(sheet, edit(row, value))
+        backend.save(sheets, dirty=[sheet])
+        with open(other, "rb") as f:
+            repo.update_file("book.xlsx", "other machine", f.read(), sha=repo.files["book.xlsx"].sha)
+
+    backend = open_backend("excel", tmp, src, "push")
+    synced = {"sha": base_sha}
+    queue = PushQueue(
+        lambda: FakeGithub(repo), "owner/cmms", "book.xlsx", backend.xlsx_path,
+        queue_file=os.path.join(tmp, "push_queue.json"), coalesce_seconds=0, retry_base=0.05,
+        base_sha=lambda: synced["sha"],
+        merge=lambda base, theirs: merge_remote(backend, base, theirs),
+        on_pushed=lambda digest, sha: synced.update(sha=sha), start=False,
+    )
+
+    other_machine_push("Card3", 1, "remote edit")
+    sheets = backend.load_store(backend.fingerprint()).edit_sheets()
+    sheets.apply_patch("Card1", edit(2, "local edit"))
+    backend.save(sheets, dirty=["Card1"])
+    queue.enqueue("local edit")
+    queue.start()
+    assert queue.flush(timeout=30)
+    result = queue.status()["last_result"]
+    assert result["ok"] and result["merged"], result
+    pushed = pd.read_excel(io.BytesIO(repo.files["book.xlsx"].decoded_content), sheet_name=None, dtype=object)
+    assert pushed["Card1"].at[2, "Event"] == "local edit" and pushed["Card3"].at[1, "Event"] == "remote edit"
+    assert synced["sha"] == repo.files["book.xlsx"].sha
+
+    # نفس الصف من الجهازين: لا يُرفع شيء ويبقى الطلب في الطابور
+    other_machine_push("Card1", 2, "remote conflicting edit")
+    sheets = backend.load_store(backend.fingerprint()).edit_sheets()
+    sheets.apply_patch("Card1", edit(2, "local edit 2"))
+    backend.save(sheets, dirty=["Card1"])
+    commits = len(repo.commits)
+    queue.enqueue("conflicting edit")
+    deadline = time.monotonic() + 30
+    while queue.status()["last_result"]["ok"] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    result = queue.status()["last_result"]
+    queue.stop()
+    assert not result["ok"] and "Card1" in result["error"] and len(repo.commits) == commits, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "fleet.xlsx")
+        make_fleet_workbook(src, n_cards=args.cards)
+        for kind in ("excel", "sqlite"):
+            timings, lost = check_backend(kind, tmp, src)
+            print(f"{kind:6}: different sheets/rows merged, same row -> SaveConflict, removed sheet deleted: OK "
+                  f"(stale save with rebase {timings['rebase'] * 1000:.0f} ms); "
+                  f"without base the first edit is {'lost' if lost else 'kept'}")
+        check_push_queue(tmp, src)
+        print("push queue: 409 on stale sha -> merged with remote -> pushed; same row -> not pushed: OK")
+
+
+if __name__ == "__main__":
+    main()
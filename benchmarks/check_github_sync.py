@@ -0,0 +1,139 @@
+"""
+✅ فحص الجلب المشروط على خادم HTTP محلي (بديل GitHub RAW) وعميل GitHub وهمي:
+- 304 / sha مطابق → لا كتابة للملف ولا تغيير للبصمة
+- تغيير في الريبو → تحميل واستبدال
+- تعديل محلي → لا نرسل ETag القديم ونستعيد نسخة الريبو
+- ملف محلي بدون سجل مزامنة (تثبيت جديد/ترقية) → الجلب الدوري لا يكتب فوقه
+- خادم بدون ETag → البصمة و sha تُسجل بعد كل جلب ناجح
+- الجلب عبر API مع only_if_clean لا يكتب فوق التعديلات المحلية
+- جلسة HTTP واحدة: اتصال TCP واحد لكل الطلبات
+
+    python benchmarks/check_github_sync.py
+"""
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from github_sync import GithubSync, git_blob_sha  # noqa: E402
+from sheet_store import file_fingerprint  # noqa: E402
+from benchmarks.fake_github import FakeContentFile, FakeGithub, FakeRepo  # noqa: E402
+
+
+class Remote:
+    content = b"revision-1" * 1000
+    send_etag = True
+    requests = []  # (path, status)
+    connections = set()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive حتى يظهر إعادة استخدام الاتصال
+
+    def do_GET(self):
+        Remote.connections.add(self.client_address)
+        etag = '"%s"' % hashlib.md5(Remote.content).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            Remote.requests.append((self.path, 304))
+            return
+        self.send_response(200)
+        if Remote.send_etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(Remote.content)))
+        self.end_headers()
+        self.wfile.write(Remote.content)
+        Remote.requests.append((self.path, 200))
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/Machine_Service_Lookup.xlsx"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        local = os.path.join(tmp, "book.xlsx")
+        sync = GithubSync(local, url, meta_file=os.path.join(tmp, "sync_meta.json"))
+
+        assert sync.fetch_raw() == {"changed": True, "status": 200}
+        fp = file_fingerprint(local)
+        inode = os.stat(local).st_ino
+        assert sync.fetch_raw() == {"changed": False, "status": 304}
+        assert os.stat(local).st_ino == inode and file_fingerprint(local) == fp
+        print("RAW: unchanged remote -> 304, no write: OK")
+
+        Remote.content = b"revision-2" * 1000
+        assert sync.fetch_raw()["changed"]
+        with open(local, "rb") as f:
+            assert f.read() == Remote.content
+        print("RAW: changed remote -> streamed + replaced: OK")
+
+        with open(local, "ab") as f:
+            f.write(b"local edit")
+        assert sync.fetch_raw() == {"changed": True, "status": 200}
+        print("RAW: local edit -> no stale If-None-Match, repo copy restored: OK")
+        assert len(Remote.connections) == 1, Remote.connections
+        print(f"RAW: {len(Remote.requests)} requests over {len(Remote.connections)} pooled connection: OK")
+
+        # GitHub API: sha مطابق → لا تحميل
+        repo = FakeRepo()
+        remote = FakeContentFile("Machine_Service_Lookup.xlsx", Remote.content)
+        remote.download_url = url
+        repo.files[remote.path] = remote
+        FakeGithub.instances = 0
+        before = len(Remote.requests)
+        assert git_blob_sha(local) == remote.sha
+        result = sync.fetch_api(lambda: FakeGithub(repo), "owner/cmms", remote.path, key="t")
+        assert result["changed"] is False and len(Remote.requests) == before
+        Remote.content = b"revision-3" * 1000
+        remote = FakeContentFile(remote.path, Remote.content)
+        remote.download_url = url
+        repo.files[remote.path] = remote
+        assert sync.fetch_api(lambda: FakeGithub(repo), "owner/cmms", remote.path, key="t")["changed"]
+        assert git_blob_sha(local) == remote.sha and FakeGithub.instances == 1
+        print("API: sha compare skips download, client reused: OK")
+
+        # ملف محلي موجود بدون سجل مزامنة: لا نعرف إن كان معدلاً → الجلب الدوري يتخطى
+        fresh = os.path.join(tmp, "fresh.xlsx")
+        with open(fresh, "wb") as f:
+            f.write(b"local only edits")
+        fresh_sync = GithubSync(fresh, url, meta_file=os.path.join(tmp, "fresh_meta.json"))
+        assert not fresh_sync.is_clean()
+        assert fresh_sync.fetch_raw(only_if_clean=True)["status"] == "local-changes"
+        with open(fresh, "rb") as f:
+            assert f.read() == b"local only edits"
+        print("RAW: local file without sync meta is not overwritten by the poller: OK")
+
+        # بدون ETag: الجلب الصريح يسجل البصمة و sha، فالجلب الدوري التالي يعمل
+        Remote.send_etag = False
+        assert fresh_sync.fetch_raw()["changed"] and fresh_sync.is_clean()
+        assert fresh_sync.synced_sha() == git_blob_sha(fresh)
+        Remote.content = b"revision-4" * 1000
+        assert fresh_sync.fetch_raw(only_if_clean=True)["changed"]
+        assert fresh_sync.is_clean() and fresh_sync.synced_sha() == git_blob_sha(fresh)
+        Remote.send_etag = True
+        print("RAW: no ETag -> fingerprint and sha still recorded: OK")
+
+        # الجلب اليدوي عبر API بدون تأكيد الاستبدال: نفس شرط الجلب الدوري
+        with open(fresh, "ab") as f:
+            f.write(b"unpushed")
+        result = fresh_sync.fetch_api(lambda: FakeGithub(repo), "owner/cmms", remote.path, key="t",
+                                      only_if_clean=True)
+        assert result["status"] == "local-changes" and not result["changed"]
+        assert fresh_sync.fetch_api(lambda: FakeGithub(repo), "owner/cmms", remote.path, key="t")["changed"]
+        print("API: local edits kept unless the overwrite is confirmed: OK")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
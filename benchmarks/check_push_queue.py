@@ -0,0 +1,92 @@
+"""
+✅ فحص طابور الرفع على عميل GitHub وهمي:
+زمن الحفظ من وجهة نظر المستخدم، دمج التعديلات في commit واحد، إعادة المحاولة، والاستمرار بعد إعادة التشغيل
+
+    python benchmarks/check_push_queue.py --latency 0.3
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from push_queue import PushQueue  # noqa: E402
+from benchmarks.fake_github import FakeGithub, FakeRepo  # noqa: E402
+
+
+def make_queue(tmp, repo, **kwargs):
+    kwargs.setdefault("coalesce_seconds", 0.2)
+    return PushQueue(
+        lambda: FakeGithub(repo), "owner/cmms", "Machine_Service_Lookup.xlsx",
+        os.path.join(tmp, "book.xlsx"), queue_file=os.path.join(tmp, "push_queue.json"), **kwargs,
+    )
+
+
+def write_book(tmp, content):
+    with open(os.path.join(tmp, "book.xlsx"), "wb") as f:
+        f.write(content)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.3, help="زمن كل طلب للعميل الوهمي")
+    parser.add_argument("--edits", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 1) الرفع المتزامن القديم: عميل جديد + get_contents + update_file داخل طلب المستخدم
+        repo = FakeRepo(latency=args.latency)
+        repo.create_file("Machine_Service_Lookup.xlsx", "init", b"v")
+        start = time.perf_counter()
+        legacy = FakeGithub(repo).get_repo("owner/cmms")
+        sha = legacy.get_contents("Machine_Service_Lookup.xlsx").sha
+        legacy.update_file("Machine_Service_Lookup.xlsx", "edit", b"v0", sha=sha)
+        sync_s = time.perf_counter() - start
+
+        # 2) الطابور: الحفظ يرجع فوراً والتعديلات المتتالية تُدمج
+        repo = FakeRepo(latency=args.latency)
+        FakeGithub.instances = 0
+        queue = make_queue(tmp, repo)
+        enqueue_s = []
+        for i in range(args.edits):
+            write_book(tmp, b"v%d" % i)
+            start = time.perf_counter()
+            queue.enqueue(f"edit {i}")
+            enqueue_s.append(time.perf_counter() - start)
+        assert queue.flush(timeout=30)
+        assert len(repo.commits) == 1, repo.commits
+        assert repo.files["Machine_Service_Lookup.xlsx"].decoded_content == b"v%d" % (args.edits - 1)
+        write_book(tmp, b"next")
+        queue.enqueue("one more")
+        assert queue.flush(timeout=30)
+        assert len(repo.commits) == 2 and FakeGithub.instances == 1
+        queue.stop()
+        print(f"per-save wait: sync {sync_s * 1000:.0f} ms, queued {max(enqueue_s) * 1000:.2f} ms")
+        print(f"{args.edits} edits -> 1 commit, client built once: OK")
+
+        # 3) فشل مؤقت: إعادة المحاولة مع backoff
+        repo = FakeRepo(fail_first=2)
+        queue = make_queue(tmp, repo, retry_base=0.05)
+        write_book(tmp, b"retry")
+        queue.enqueue("retry me")
+        assert queue.flush(timeout=30)
+        status = queue.status()
+        assert status["last_result"]["ok"] and len(repo.commits) == 1
+        queue.stop()
+        print("retry with backoff after 2 failures: OK")
+
+        # 4) الطابور محفوظ على القرص: طلب لم يُرفع قبل الإيقاف يُرفع بعد إعادة التشغيل
+        repo = FakeRepo()
+        queue = make_queue(tmp, repo, start=False)
+        write_book(tmp, b"persisted")
+        queue.enqueue("survives restart")
+        restarted = make_queue(tmp, repo)
+        assert restarted.flush(timeout=30) and repo.commits[-1][1] == "survives restart"
+        restarted.stop()
+        print("persistent queue across restart: OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+✅ فحص خدمة المزامنة الدورية على خادم HTTP محلي:
+- تغيير في الريبو يظهر لكل الجلسات (نفس الكائن المشترك) خلال دورة جلب واحدة
+- التعديلات المحلية غير المرفوعة لا يتم الكتابة فوقها
+- بعد رفع ناجح (mark_synced) يستأنف الجلب الدوري
+
+    python benchmarks/check_sync_service.py
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from github_sync import GithubSync  # noqa: E402
+from sheet_store import file_digest  # noqa: E402
+from sync_service import SyncService  # noqa: E402
+from benchmarks.check_github_sync import Handler, Remote  # noqa: E402
+
+INTERVAL = 0.2
+
+
+def wait_for(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(INTERVAL / 4)
+    return False
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/Machine_Service_Lookup.xlsx"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        local = os.path.join(tmp, "book.xlsx")
+        sync = GithubSync(local, url, meta_file=os.path.join(tmp, "sync_meta.json"))
+        service = SyncService(local, poll=lambda: sync.fetch_raw(only_if_clean=True), interval=INTERVAL)
+
+        assert wait_for(lambda: service.status()["last_poll"] is not None)
+        first = service.current_fingerprint()
+        assert first != "initial"
+
+        # جلستان تقرآن نفس الكائن المشترك
+        Remote.content = b"remote revision 2" * 500
+        start = time.monotonic()
+        assert wait_for(lambda: service.current_fingerprint() != first)
+        print(f"remote change visible to all sessions after {time.monotonic() - start:.2f} s "
+              f"(interval {INTERVAL} s), revision {service.status()['revision']}: OK")
+
+        # تعديل محلي غير مرفوع: الجلب الدوري يتخطى
+        with open(local, "ab") as f:
+            f.write(b"unpushed local edit")
+        edited = file_digest(local)
+        Remote.content = b"remote revision 3" * 500
+        assert wait_for(lambda: (service.status()["last_poll"] or {}).get("status") == "local-changes")
+        time.sleep(INTERVAL * 2)
+        assert file_digest(local) == edited
+        print("unpushed local edits are never overwritten by the poller: OK")
+
+        # بعد رفع ناجح يعتبر المحلي = الريبو، والجلب الدوري يلتقط المراجعة التالية
+        Remote.content = open(local, "rb").read()
+        sync.mark_synced(edited)
+        Remote.content = b"remote revision 4" * 500
+        assert wait_for(lambda: open(local, "rb").read() == Remote.content)
+        print("polling resumes after mark_synced (successful push): OK")
+        service.stop()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+🧪 عميل GitHub وهمي محلي (نفس واجهة PyGithub التي نستخدمها) لتجربة طابور الرفع والمزامنة
+بدون شبكة: تأخير اختياري لكل طلب، وفشل متعمد لأول N طلبات رفع،
+ورفض الرفع بـ sha قديم (409) مثل GitHub
+"""
+import base64
+import hashlib
+import threading
+import time
+
+
+class FakeGithubException(Exception):
+    """مثل github.GithubException: الحالة في status"""
+
+    def __init__(self, status, message):
+        super().__init__(f"{status} {message}")
+        self.status = status
+
+
+class FakeGitBlob:
+    def __init__(self, content):
+        self.content = base64.b64encode(content).decode()
+        self.encoding = "base64"
+
+
+class FakeContentFile:
+    def __init__(self, path, content):
+        self.path = path
+        self.decoded_content = content
+        self.sha = hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+class FakeRepo:
+    def __init__(self, latency=0.0, fail_first=0):
+        self.latency = latency
+        self.fail_first = fail_first
+        self.files = {}
+        self.blobs = {}  # sha -> المحتوى (كل النسخ التي رُفعت)
+        self.commits = []  # (path, message)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _request(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+
+    def _maybe_fail(self):
+        with self._lock:
+            if self.fail_first > 0:
+                self.fail_first -= 1
+                raise ConnectionError("fake GitHub: simulated network failure")
+
+    def get_contents(self, path, ref=None):
+        self._request()
+        if path not in self.files:
+            raise FileNotFoundError(path)
+        return self.files[path]
+
+    def update_file(self, path, message, content, sha, branch=None):
+        self._request()
+        self._maybe_fail()
+        if path not in self.files or self.files[path].sha != sha:
+            raise FakeGithubException(409, "sha does not match")
+        return self._commit(path, message, content)
+
+    def create_file(self, path, message, content, branch=None):
+        self._request()
+        self._maybe_fail()
+        if path in self.files:
+            raise FakeGithubException(422, "file already exists")
+        return self._commit(path, message, content)
+
+    def get_git_blob(self, sha):
+        self._request()
+        return FakeGitBlob(self.blobs[sha])
+
+    def _commit(self, path, message, content):
+        f = FakeContentFile(path, content)
+        self.files[path] = f
+        self.blobs[f.sha] = content
+        self.commits.append((path, message))
+        return {"content": f, "commit": None}
+
+
+class FakeGithub:
+    """بديل Github(token): نفس الـ repo لكل الاستدعاءات، ويعدّ مرات إنشاء العميل"""
+    instances = 0
+
+    def __init__(self, repo):
+        FakeGithub.instances += 1
+        self.repo = repo
+
+    def get_repo(self, name):
+        self.repo._request()
+        return self.repo
@@ -0,0 +1,139 @@
+"""
+🏭 مولد ملف إكسل تجريبي بنفس شكل Machine_Service_Lookup.xlsx
+(شيت Machine + شيت ServicePlan + شيت Card{N} لكل ماكينة) لاستخدامه في القياسات
+عدد الكروت والشرائح وصفوف كل كارت قابلة للتحديد، ونفس seed يعطي نفس الملف
+
+    python benchmarks/synthetic_workbook.py fleet.xlsx --cards 500 --rows 40
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openpyxl import Workbook  # noqa: E402
+
+from status_engine import NO_SERVICE  # noqa: E402
+
+SERVICES = [
+    "Revolving flats(X)",
+    "1.carding elemnt(o)",
+    "licker_in carding element(o)",
+    "Doffer carding element(o)",
+    "cylinder(X)",
+    "doffer(X)",
+    "Revolving flats(o)",
+]
+
+
+def service_plan_rows(n_slices=11, step=150):
+    rows = []
+    for i in range(n_slices):
+        lo = 0 if i == 0 else i * step + 1
+        hi = (i + 1) * step
+        services = NO_SERVICE if i == 0 else "+".join(SERVICES[: 2 + i % (len(SERVICES) - 1)])
+        rows.append((lo, hi, services))
+    return rows
+
+
+def _extra_rows(card, plan, n_extra, seed):
+    """
+    صفوف أحداث إضافية للكارت (rows_per_card أكبر من عدد الشرائح): كل صف تحت شريحة عشوائية
+    بنفس Min/Max، فيه خدمات ✔ أو حدث/تصحيح — مرتبة بالشريحة كما في ملفات الكروت الحقيقية
+    """
+    rnd = random.Random(seed * 1_000_003 + card)  # مولد مستقل: الصفوف الأساسية لا تتغير
+    out = {}
+    for _ in range(n_extra):
+        i = rnd.randrange(len(plan))
+        lo, hi, _ = plan[i]
+        done = [("✔" if rnd.random() < 0.15 else None) for _ in SERVICES]
+        tons = rnd.randint(lo, hi)
+        date = f"{rnd.randint(1, 28)}\\{rnd.randint(1, 12)}\\{rnd.choice((2024, 2025))}"
+        event = rnd.choice(("تم تشغيل", "توقف للصيانة", None, None))
+        correction = "لايوجد" if rnd.random() < 0.1 else None
+        out.setdefault(i, []).append([card, lo, hi, tons] + done + [date, event, correction])
+    return out
+
+
+def make_fleet_workbook(path, n_cards=500, n_slices=11, seed=0, rows_per_card=None):
+    """
+    إنشاء ملف فيه n_cards شيت Card{N} وحفظه في path
+    rows_per_card: عدد صفوف كل كارت (الافتراضي صف لكل شريحة)؛ الزيادة صفوف أحداث تحت شرائحها
+    """
+    rnd = random.Random(seed)
+    plan = service_plan_rows(n_slices)
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Machine"
+    ws.append(["card", "Current_Tones"])
+    for card in range(1, n_cards + 1):
+        ws.append([card, rnd.randint(0, plan[-1][1])])
+
+    ws = wb.create_sheet("ServicePlan")
+    ws.append(["Min_Tones", "Max_Tones", "Service"])
+    for row in plan:
+        ws.append(list(row))
+
+    header = ["card", "Min_Tones", "Max_Tones", "Tones"] + [s.replace("(X)", "(x)") for s in SERVICES] + ["Date", "Event", "Correction"]
+    for card in range(1, n_cards + 1):
+        ws = wb.create_sheet(f"Card{card}")
+        ws.append(header)
+        extra = _extra_rows(card, plan, max(0, (rows_per_card or 0) - len(plan)), seed)
+        for i, (lo, hi, _) in enumerate(plan):
+            done = [("✔" if rnd.random() < 0.4 else None) for _ in SERVICES]
+            tons = rnd.randint(lo, hi) if any(done) else None
+            date = f"{rnd.randint(1, 28)}\\{rnd.randint(1, 12)}\\{rnd.choice((2024, 2025))}" if any(done) else None
+            event = "تم تشغيل" if rnd.random() < 0.1 else None
+            ws.append([card, lo, hi, tons] + done + [date, event, None])
+            for row in extra.get(i, ()):
+                ws.append(row)
+    wb.save(path)
+    return path
+
+
+def card_history_frame(card, n_rows, n_slices=11, seed=0):
+    """سجل كارت (DataFrame بنفس أنواع read_excel) فيه n_rows صف موزعة على الشرائح"""
+    import numpy as np
+    import pandas as pd
+
+    rnd = np.random.default_rng(seed)
+    plan = service_plan_rows(n_slices)
+    slice_idx = np.sort(rnd.integers(0, len(plan), n_rows))
+    lo = np.array([plan[i][0] for i in slice_idx])
+    hi = np.array([plan[i][1] for i in slice_idx])
+    data = {
+        "card": np.full(n_rows, card),
+        "Min_Tones": lo,
+        "Max_Tones": hi,
+        "Tones": np.where(rnd.random(n_rows) < 0.5, rnd.integers(lo, hi + 1), np.nan),
+    }
+    for s in SERVICES:
+        data[s.replace("(X)", "(x)")] = np.where(rnd.random(n_rows) < 0.1, "✔", None)
+    days, months, years = rnd.integers(1, 29, n_rows), rnd.integers(1, 13, n_rows), rnd.integers(2023, 2026, n_rows)
+    dates = [f"{d}\\{m}\\{y}" for d, m, y in zip(days, months, years)]
+    data["Date"] = np.where(rnd.random(n_rows) < 0.6, dates, None)
+    data["Event"] = np.where(rnd.random(n_rows) < 0.05, "تم تشغيل", None)
+    data["Correction"] = np.where(rnd.random(n_rows) < 0.03, "لايوجد", None)
+    data["Servised by"] = np.where(rnd.random(n_rows) < 0.3, rnd.choice(["hossam", "Eng.Zakria"], n_rows), None)
+    df = pd.DataFrame(data)
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].astype("str").where(df[col].notna())
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path")
+    parser.add_argument("--cards", type=int, default=500)
+    parser.add_argument("--slices", type=int, default=11)
+    parser.add_argument("--rows", type=int, default=None, help="rows per card (default: one per slice)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    make_fleet_workbook(args.path, n_cards=args.cards, n_slices=args.slices, seed=args.seed, rows_per_card=args.rows)
+    print(f"{args.path}: {args.cards} cards x {max(args.rows or 0, args.slices)} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+🛡 كتابة آمنة للملفات (ملف الإكسل، users.json، state.json)
+الكتابة تتم في ملف مؤقت بجانب الملف الأصلي ثم fsync ثم os.replace،
+فالقارئ يرى إما النسخة القديمة كاملة أو الجديدة كاملة، ولا يبقى ملف مقطوع بعد توقف مفاجئ.
+
+قبل الاستبدال تُحفظ النسخة الحالية في حلقة أجيال سابقة داخل مجلد .generations
+(1 = الأحدث) للرجوع الفوري بدون إعادة التحميل من GitHub.
+الملفات للإضافة فقط (سجل التغييرات) تُكتب سطراً سطراً مع fsync (append_jsonl).
+"""
+import json
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+
+GENERATIONS_DIR = ".generations"
+
+_path_locks = {}
+_path_locks_guard = threading.Lock()
+
+
+def _lock_for(path):
+    key = os.path.abspath(path)
+    with _path_locks_guard:
+        return _path_locks.setdefault(key, threading.Lock())
+
+
+def _fsync_dir(directory):
+    # على ويندوز لا يمكن فتح المجلد — نتجاهل
+    try:
+        fd = os.open(directory or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _fsync_file(path):
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+
+def temp_path_for(path):
+    """مسار مؤقت في نفس المجلد (نفس نظام الملفات) مع الاحتفاظ بامتداد الملف"""
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{uuid.uuid4().hex[:12]}.{name}")
+
+
+# -------------------------------
+# 🗄 حلقة الأجيال السابقة
+# -------------------------------
+def generation_path(path, n):
+    directory, name = os.path.split(path)
+    return os.path.join(directory, GENERATIONS_DIR, f"{name}.{n}")
+
+
+def _rotate_generations(path, keep):
+    """إزاحة الأجيال (n -> n+1) ثم ربط النسخة الحالية كجيل 1 (hard link بدون نسخ إن أمكن)"""
+    if keep <= 0 or not os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(generation_path(path, 1)), exist_ok=True)
+    oldest = generation_path(path, keep)
+    if os.path.exists(oldest):
+        os.remove(oldest)
+    for n in range(keep - 1, 0, -1):
+        src = generation_path(path, n)
+        if os.path.exists(src):
+            os.replace(src, generation_path(path, n + 1))
+    newest = generation_path(path, 1)
+    try:
+        os.link(path, newest)
+    except OSError:
+        shutil.copy2(path, newest)
+
+
+def list_generations(path):
+    """الأجيال المحفوظة: [{n, path, size, modified}] من الأحدث للأقدم"""
+    out = []
+    n = 1
+    while True:
+        gen = generation_path(path, n)
+        if not os.path.exists(gen):
+            break
+        st = os.stat(gen)
+        out.append({
+            "n": n,
+            "path": gen,
+            "size": st.st_size,
+            "modified": datetime.fromtimestamp(st.st_mtime),
+        })
+        n += 1
+    return out
+
+
+# -------------------------------
+# ✍️ الكتابة الذرية
+# -------------------------------
+def atomic_replace(path, write, generations=0):
+    """
+    write(tmp_path) يكتب المحتوى الجديد في ملف مؤقت؛ بعدها fsync ثم حفظ النسخة
+    الحالية كجيل سابق ثم os.replace. أي استثناء من write يترك الملف الأصلي كما هو.
+    """
+    tmp = temp_path_for(path)
+    try:
+        write(tmp)
+        _fsync_file(tmp)
+        with _lock_for(path):
+            _rotate_generations(path, generations)
+            os.replace(tmp, path)
+        _fsync_dir(os.path.dirname(path))
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def atomic_write_bytes(path, data, generations=0):
+    def write(tmp):
+        with open(tmp, "wb") as f:
+            f.write(data)
+    atomic_replace(path, write, generations)
+
+
+def atomic_write_json(path, obj, generations=0):
+    def write(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(obj, f, indent=4, ensure_ascii=False)
+    atomic_replace(path, write, generations)
+
+
+def append_jsonl(path, record):
+    """
+    إضافة سطر JSON واحد لملف للإضافة فقط (سجل التغييرات): سطر كامل في كتابة واحدة ثم fsync،
+    فالتوقف المفاجئ لا يترك إلا السطر الأخير ناقصاً
+    """
+    line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+    with _lock_for(path):
+        with open(path, "ab") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def read_json(path):
+    """
+    قراءة JSON؛ إذا كان الملف تالفاً نجرّب الأجيال السابقة من الأحدث للأقدم.
+    يرجع (القيمة، رقم الجيل أو 0 للملف نفسه) ويرفع الخطأ الأصلي إذا فشل الكل.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f), 0
+    except (OSError, ValueError) as first_error:
+        for gen in list_generations(path):
+            try:
+                with open(gen["path"], "r", encoding="utf-8") as f:
+                    return json.load(f), gen["n"]
+            except (OSError, ValueError):
+                continue
+        raise first_error
+
+
+def restore_generation(path, n, generations=0):
+    """
+    استرجاع الجيل n ذرياً. النسخة الحالية نفسها تدخل حلقة الأجيال،
+    فالاسترجاع يمكن التراجع عنه.
+    """
+    gen = generation_path(path, n)
+    if not os.path.exists(gen):
+        raise FileNotFoundError(gen)
+    atomic_replace(path, lambda tmp: shutil.copyfile(gen, tmp), generations)
@@ -0,0 +1,149 @@
+"""
+✏ محرك إضافة الصفوف
+موضع إدراج صف جديد تحت الرينج المناسب بالبحث الثنائي بدل إعادة بناء أقنعة كاملة
+(astype(str) + pd.to_numeric لكل عمود) عند كل إضافة:
+مفاتيح رقمية (card, Min, Max) تُبنى مرة واحدة لكل شيت وبصمة وتُحفظ مع المخزن.
+شيتات الكروت مرتبة بالحد الأدنى، والإدراج في الموضع المحسوب يحافظ على الترتيب.
+"""
+import numpy as np
+import pandas as pd
+
+MIN_COLS = ("min_tones", "min_tone", "min tones", "min")
+MAX_COLS = ("max_tones", "max_tone", "max tones", "max")
+CARD_COLS = ("card", "machine", "machine_no", "machine id")
+
+
+def range_columns(columns):
+    """(عمود الكارت، عمود Min، عمود Max) أو None لكل منها — آخر عمود مطابق هو المعتمد"""
+    card_col = min_col = max_col = None
+    for c in columns:
+        c_low = str(c).strip().lower()
+        if c_low in MIN_COLS:
+            min_col = c
+        if c_low in MAX_COLS:
+            max_col = c
+        if c_low in CARD_COLS:
+            card_col = c
+    return card_col, min_col, max_col
+
+
+def to_num_or_none(x):
+    try:
+        return float(x)
+    except Exception:
+        return None
+
+
+def insert_keys(df, card_col, min_col, max_col):
+    """
+    مفاتيح الشيت للبحث: Min/Max كأرقام (NaN للفارغ)، Min للترتيب (الفارغ = -1 كما في
+    الإدراج القديم)، ونص الكارت بعد strip. sorted: هل الشيت مرتب بالحد الأدنى
+    """
+    min_num = pd.to_numeric(df[min_col], errors="coerce").to_numpy(dtype=float)
+    min_key = np.where(np.isnan(min_num), -1.0, min_num)
+    return {
+        "rows": len(df),
+        "card_text": None if card_col is None else df[card_col].astype(str).str.strip().to_numpy(dtype=object),
+        "min_num": min_num,
+        "max_num": pd.to_numeric(df[max_col], errors="coerce").to_numpy(dtype=float),
+        "min_key": min_key,
+        "sorted": bool(np.all(np.diff(min_key) >= 0)),
+    }
+
+
+def _last_match(mask, offset=0):
+    hits = np.flatnonzero(mask)
+    return None if not len(hits) else offset + int(hits[-1]) + 1
+
+
+def with_text_keys(df, keys, min_col, max_col):
+    """المفاتيح + نص Min/Max بعد strip (للإدراج المتتالي لمدخلات غير رقمية بدون الرجوع للإطار)"""
+    if "min_text" in keys:
+        return keys
+    return dict(
+        keys,
+        min_text=df[min_col].astype(str).str.strip().to_numpy(dtype=object),
+        max_text=df[max_col].astype(str).str.strip().to_numpy(dtype=object),
+    )
+
+
+def _text_position(df, keys, card_col, min_col, max_col, new_card, new_min_raw, new_max_raw):
+    """Min/Max غير رقمية: مقارنة نصية كما في الواجهة القديمة (حالة نادرة)"""
+    if card_col is not None and new_card == "":
+        return None
+    if "min_text" in keys:
+        mask = (keys["min_text"] == new_min_raw) & (keys["max_text"] == new_max_raw)
+    else:
+        mask = (
+            (df[min_col].astype(str).str.strip() == new_min_raw).to_numpy()
+            & (df[max_col].astype(str).str.strip() == new_max_raw).to_numpy()
+        )
+    if card_col is not None:
+        mask &= keys["card_text"] == new_card
+    return _last_match(mask)
+
+
+def insert_position(df, keys, card_col, min_col, max_col, new_card, new_min_raw, new_max_raw):
+    """
+    نفس قاعدة الإدراج القديمة:
+    - بعد آخر صف له نفس (الكارت، Min، Max)
+    - وإلا قبل أول صف حده الأدنى >= Min الجديد (عدد الصفوف الأقل)، أو في النهاية إذا Min غير رقمي
+    الشيت المرتب بالحد الأدنى: بحث ثنائي ثم فحص كتلة الصفوف التي لها نفس Min فقط
+    """
+    new_min = to_num_or_none(new_min_raw)
+    new_max = to_num_or_none(new_max_raw)
+    n = keys["rows"]
+    if new_min is None or new_max is None:
+        pos = _text_position(df, keys, card_col, min_col, max_col, new_card, new_min_raw, new_max_raw)
+    elif card_col is not None and new_card == "":
+        pos = None
+    elif keys["sorted"]:
+        lo = int(np.searchsorted(keys["min_key"], new_min, side="left"))
+        hi = int(np.searchsorted(keys["min_key"], new_min, side="right"))
+        mask = (keys["min_num"][lo:hi] == new_min) & (keys["max_num"][lo:hi] == new_max)
+        if card_col is not None:
+            mask &= keys["card_text"][lo:hi] == new_card
+        pos = _last_match(mask, lo)
+    else:
+        mask = (keys["min_num"] == new_min) & (keys["max_num"] == new_max)
+        if card_col is not None:
+            mask &= keys["card_text"] == new_card
+        pos = _last_match(mask)
+    if pos is not None:
+        return pos
+    if new_min is None:
+        return n
+    if keys["sorted"]:
+        return int(np.searchsorted(keys["min_key"], new_min, side="left"))
+    return int((keys["min_key"] < new_min).sum())
+
+
+def _cell_number(value):
+    """نفس تحويل pd.to_numeric(errors='coerce') لخلية واحدة"""
+    return float(pd.to_numeric(pd.Series([value], dtype=object), errors="coerce").iloc[0])
+
+
+def advance_keys(keys, pos, row, card_col, min_col, max_col):
+    """
+    المفاتيح بعد إدراج row في الموضع pos (نسخة جديدة؛ المفاتيح المحفوظة مع البصمة لا تتغير)
+    الإدراجات المتتالية بهذه المفاتيح تعطي نفس المواضع كإضافة الصفوف واحداً تلو الآخر
+    """
+    min_num = _cell_number(row.get(min_col, np.nan))
+    min_key = -1.0 if np.isnan(min_num) else min_num
+    old_key = keys["min_key"]
+    out = dict(
+        keys,
+        rows=keys["rows"] + 1,
+        min_num=np.insert(keys["min_num"], pos, min_num),
+        max_num=np.insert(keys["max_num"], pos, _cell_number(row.get(max_col, np.nan))),
+        min_key=np.insert(old_key, pos, min_key),
+        sorted=keys["sorted"]
+        and (pos == 0 or old_key[pos - 1] <= min_key)
+        and (pos == len(old_key) or min_key <= old_key[pos]),
+    )
+    if keys["card_text"] is not None:
+        out["card_text"] = np.insert(keys["card_text"], pos, str(row.get(card_col, np.nan)).strip())
+    if "min_text" in keys:
+        out["min_text"] = np.insert(keys["min_text"], pos, str(row.get(min_col, np.nan)).strip())
+        out["max_text"] = np.insert(keys["max_text"], pos, str(row.get(max_col, np.nan)).strip())
+    return out
@@ -0,0 +1,191 @@
+"""
+🔄 جلب الملف من GitHub بشكل مشروط
+- جلسة HTTP واحدة (requests.Session) يعاد استخدامها لكل الطلبات (connection pooling)
+- رابط RAW: نرسل If-None-Match بآخر ETag؛ رد 304 يعني لا تغيير → لا كتابة ولا تغيير بصمة
+- GitHub API: نقارن sha الملف في الريبو بـ git blob sha للملف المحلي قبل أي تحميل
+- sha آخر نسخة متزامنة (جلب أو رفع) يُحفظ مع البصمة: الرفع التالي يُبنى عليه (synced_sha)
+  فيكتشف GitHub أي رفع من غيرنا بعدها بدل الكتابة فوقه
+- التحميل يتم على دفعات إلى ملف مؤقت ثم يستبدل الملف المحلي ذرياً (durable_io)
+"""
+import hashlib
+import os
+import threading
+
+import requests
+
+import metrics
+from durable_io import atomic_replace, atomic_write_json, read_json
+from sheet_store import file_digest, file_fingerprint
+
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+REQUEST_TIMEOUT = 20
+
+
+class _Unchanged(Exception):
+    """المحتوى المحمّل مطابق للملف المحلي — نلغي الاستبدال"""
+
+
+def git_blob_sha(path, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """نفس sha الذي يرجعه GitHub للملف (sha1 على 'blob <size>\\0' + المحتوى)"""
+    h = hashlib.sha1(b"blob %d\0" % os.path.getsize(path))
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class GithubSync:
+    def __init__(self, local_file, raw_url, meta_file="sync_meta.json", generations=0, session=None):
+        self.local_file = local_file
+        self.raw_url = raw_url
+        self.meta_file = meta_file
+        self.generations = generations
+        self.session = session or requests.Session()
+        self._lock = threading.Lock()  # تحميل واحد في نفس الوقت لكل العملية
+        self._repo = None
+        self._repo_key = None
+
+    # -------------------------------
+    # 🗂 ETag المحفوظ
+    # -------------------------------
+    def _load_meta(self):
+        if not os.path.exists(self.meta_file):
+            return {}
+        try:
+            return read_json(self.meta_file)[0]
+        except Exception:
+            return {}
+
+    def _local_fingerprint(self):
+        if not os.path.exists(self.local_file):
+            return None
+        return file_fingerprint(self.local_file)
+
+    def _download(self, url, headers=None):
+        """
+        تحميل url إلى ملف مؤقت ثم استبدال الملف المحلي.
+        يرجع (changed, response). الرد 304 أو محتوى مطابق للملف المحلي → changed=False
+        """
+        with self.session.get(url, headers=headers or {}, stream=True, timeout=REQUEST_TIMEOUT) as response:
+            metrics.count(f"github.http_{response.status_code}")
+            if response.status_code == 304:
+                response.content  # تفريغ الرد حتى يعود الاتصال للـ pool
+                return False, response
+            response.raise_for_status()
+            local_digest = file_digest(self.local_file) if os.path.exists(self.local_file) else None
+
+            def write(tmp):
+                with open(tmp, "wb") as f:
+                    for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+                if local_digest is not None and file_digest(tmp) == local_digest:
+                    raise _Unchanged()
+
+            try:
+                atomic_replace(self.local_file, write, self.generations)
+            except _Unchanged:
+                return False, response
+            return True, response
+
+    # -------------------------------
+    # 🌐 رابط RAW مع ETag
+    # -------------------------------
+    def is_clean(self, meta=None):
+        """
+        الملف المحلي لم يتغير منذ آخر مزامنة (جلب أو رفع) — لا توجد تعديلات محلية غير مرفوعة
+        بدون سجل مزامنة (تثبيت جديد أو ترقية) لا نعرف أصل الملف المحلي فنعتبره معدلاً؛
+        فقط غياب الملف نفسه يعني أنه لا يوجد ما نخسره
+        """
+        local = self._local_fingerprint()
+        if local is None:
+            return True
+        meta = self._load_meta() if meta is None else meta
+        return meta.get("fingerprint") == local
+
+    def mark_synced(self, fingerprint, sha=None):
+        """تسجيل أن المحتوى المحلي (بهذه البصمة) هو نفس نسخة الريبو (بالـ sha) — بعد رفع ناجح"""
+        with self._lock:
+            atomic_write_json(self.meta_file, {"etag": None, "fingerprint": fingerprint, "sha": sha})
+
+    def synced_sha(self):
+        """sha نسخة الريبو التي بُني عليها الملف المحلي (None إذا لم نتزامن بعد)"""
+        return self._load_meta().get("sha")
+
+    def _local_sha(self):
+        return git_blob_sha(self.local_file) if os.path.exists(self.local_file) else None
+
+    @metrics.timed("github.fetch_raw")
+    def fetch_raw(self, only_if_clean=False):
+        """
+        يرجع dict: changed, status.
+        only_if_clean: لا نجلب إذا كانت هناك تعديلات محلية غير مرفوعة
+        (الجلب الدوري، واليدوي بدون تأكيد الاستبدال)
+        """
+        with self._lock:
+            meta = self._load_meta()
+            if only_if_clean and not self.is_clean(meta):
+                return {"changed": False, "status": "local-changes"}
+            headers = {}
+            # نرسل ETag فقط إذا لم يتغير الملف المحلي منذ آخر تحميل (وإلا نريد نسخة الريبو)
+            if meta.get("etag") and meta.get("fingerprint") == self._local_fingerprint():
+                headers["If-None-Match"] = meta["etag"]
+            changed, response = self._download(self.raw_url, headers)
+            # كل جلب ناجح يسجل البصمة و sha حتى بدون ETag (وإلا يبقى الملف "غير متزامن")
+            if response.status_code != 304:
+                atomic_write_json(self.meta_file, {
+                    "etag": response.headers.get("ETag"), "fingerprint": self._local_fingerprint(),
+                    "sha": self._local_sha(),
+                })
+            return {"changed": changed, "status": response.status_code}
+
+    # -------------------------------
+    # 🔑 GitHub API مع مقارنة sha
+    # -------------------------------
+    def _get_repo(self, client_factory, repo_name, key):
+        if self._repo is None or self._repo_key != (key, repo_name):
+            with metrics.span("github.get_repo"):
+                self._repo = client_factory().get_repo(repo_name)
+            self._repo_key = (key, repo_name)
+        return self._repo
+
+    @metrics.timed("github.fetch_api")
+    def fetch_api(self, client_factory, repo_name, file_path, branch="main", key=None, only_if_clean=False):
+        """
+        key يميّز العميل المحفوظ (مثل التوكين) حتى نعيد بناءه إذا تغير.
+        يرجع dict: changed, sha (و status="local-changes" إذا only_if_clean وهناك تعديلات محلية)
+        """
+        with self._lock:
+            if only_if_clean and not self.is_clean():
+                return {"changed": False, "sha": None, "status": "local-changes"}
+            try:
+                repo = self._get_repo(client_factory, repo_name, key)
+                with metrics.span("github.get_contents"):
+                    remote = repo.get_contents(file_path, ref=branch)
+            except Exception:
+                self._repo = None
+                raise
+            if os.path.exists(self.local_file) and git_blob_sha(self.local_file) == remote.sha:
+                self._record_sha(remote.sha)
+                return {"changed": False, "sha": remote.sha}
+
+            url = getattr(remote, "download_url", None)
+            if url:
+                changed, _ = self._download(url)
+            else:
+                # بدون رابط تحميل: المحتوى موجود في الرد نفسه
+                content = remote.decoded_content
+
+                def write(tmp):
+                    with open(tmp, "wb") as f:
+                        f.write(content)
+                atomic_replace(self.local_file, write, self.generations)
+                changed = True
+            self._record_sha(remote.sha)
+            return {"changed": changed, "sha": remote.sha}
+
+    def _record_sha(self, sha):
+        """المحلي = نسخة الريبو بهذا الـ sha (الـ ETag يبقى فقط إذا لم يتغير الملف)"""
+        meta = self._load_meta()
+        fingerprint = self._local_fingerprint()
+        etag = meta.get("etag") if meta.get("fingerprint") == fingerprint else None
+        atomic_write_json(self.meta_file, {"etag": etag, "fingerprint": fingerprint, "sha": sha})
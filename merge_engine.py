@@ -0,0 +1,251 @@
+"""
+🔀 دمج التعديلات المتزامنة (optimistic concurrency)
+كل حفظ يحمل البصمة التي بُنيت عليها تعديلاته (base). إذا تغيّر الملف منذ ذلك الحين
+لا نكتب فوق تعديلات الآخرين ولا نقفل التحرير على الجميع، بل ندمج عند الحفظ:
+
+- شيت لم يتغير عند الطرف الآخر: تعديلاتنا تُطبق كما هي (نفس مسار الحفظ على مستوى الصف)
+- إضافة صف تحت الرينج: يُعاد حساب موضعه في الشيت الحالي (نفس قاعدة تبويب الإضافة)
+- فرق المحرر (row_patch): أرقام الصفوف تُنقل للشيت الحالي بمطابقة محتوى الصفوف
+- استبدال الشيت كاملاً: دمج ثلاثي على مستوى الصف (الأصل، نسختنا، النسخة الحالية)
+أي صف عدّله أو حذفه الطرفان، أو تغيير أعمدة عند الطرفين، يرفع SaveConflict ولا يُكتب شيء.
+
+merge_workbooks يطبق نفس الدمج الثلاثي على مستوى الملف (للرفع إلى GitHub عند تعارض sha).
+"""
+import difflib
+import io
+
+import pandas as pd
+
+from batch_edit import insert_rows_by_range
+from edit_engine import range_columns
+from sheet_store import SheetStore
+
+
+class SaveConflict(Exception):
+    """تعديلات متعارضة مع تعديلات حُفظت بعد البصمة الأساسية (conflicts: [(الشيت، السبب)])"""
+
+    def __init__(self, conflicts):
+        self.conflicts = list(conflicts)
+        super().__init__("; ".join(f"{sheet}: {reason}" for sheet, reason in self.conflicts))
+
+    @property
+    def sheets(self):
+        return [sheet for sheet, _ in self.conflicts]
+
+
+# -------------------------------
+# 🧮 مطابقة الصفوف بالمحتوى
+# -------------------------------
+def _row_hashes(df):
+    # المقارنة نصية حتى لا تختلف 151 عن 151.0 بين مصادر القراءة
+    return pd.util.hash_pandas_object(df.astype(str), index=False).tolist()
+
+
+def same_sheet(a, b):
+    """نفس الأعمدة ونفس الصفوف (مقارنة نصية)"""
+    if a is None or b is None:
+        return a is b
+    return list(a.columns) == list(b.columns) and a.shape == b.shape and _row_hashes(a) == _row_hashes(b)
+
+
+def row_map(base_df, other_df):
+    """
+    {صف الأصل: صفه في النسخة الأخرى} للصفوف التي بقيت كما هي (نفس المحتوى ونفس الترتيب)
+    البادئة واللاحقة المشتركة تُطابق مباشرة، والوسط بـ SequenceMatcher
+    """
+    a, b = _row_hashes(base_df), _row_hashes(other_df)
+    mapping = {}
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        mapping[start] = start
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        mapping[len(a) - 1 - end] = len(b) - 1 - end
+        end += 1
+    middle = difflib.SequenceMatcher(None, a[start:len(a) - end], b[start:len(b) - end], autojunk=False)
+    for i, j, n in middle.get_matching_blocks():
+        for k in range(n):
+            mapping[start + i + k] = start + j + k
+    return mapping
+
+
+def _gaps(mapping, n_base, n_other):
+    """صفوف النسخة الأخرى غير المطابقة مجمعة بمرساتها: {صف الأصل التالي المحتفظ به: [صفوف]}"""
+    gaps = {}
+    kept = sorted(mapping.items())
+    prev = -1
+    for i, j in kept + [(n_base, n_other)]:
+        if j > prev + 1:
+            gaps[i] = list(range(prev + 1, j))
+        prev = j
+    return gaps
+
+
+def merge_sheet(name, base_df, ours_df, theirs_df):
+    """
+    دمج ثلاثي على مستوى الصف: صفوف الأصل التي بقيت عند الطرفين تبقى، وما عدّله/حذفه/أضافه
+    طرف واحد يُطبق، والصفوف المضافة عند نفس الموضع من الطرفين تُكتب كلها (نسختنا أولاً).
+    صف الأصل الذي غيّره الطرفان بشكل مختلف = تعارض
+    """
+    if list(ours_df.columns) != list(base_df.columns) or list(theirs_df.columns) != list(base_df.columns):
+        raise SaveConflict([(name, "columns changed")])
+    n = len(base_df)
+    ours_map, theirs_map = row_map(base_df, ours_df), row_map(base_df, theirs_df)
+    ours_gaps = _gaps(ours_map, n, len(ours_df))
+    theirs_gaps = _gaps(theirs_map, n, len(theirs_df))
+    ours_rows, theirs_rows = _row_hashes(ours_df), _row_hashes(theirs_df)
+
+    pieces = []  # (المصدر، رقم الصف)
+    for k in range(n + 1):
+        mine = ours_gaps.get(k, [])
+        other = theirs_gaps.get(k, [])
+        pieces.extend(("ours", j) for j in mine)
+        if [theirs_rows[j] for j in other] != [ours_rows[j] for j in mine]:
+            pieces.extend(("theirs", j) for j in other)
+        if k == n:
+            break
+        if k in ours_map and k in theirs_map:
+            pieces.append(("ours", ours_map[k]))
+        elif k not in ours_map and k not in theirs_map:
+            # عدّله أو حذفه الطرفان: مقبول فقط إذا كان التغيير نفسه عند الطرفين
+            if _next_kept(ours_map, k, n) != _next_kept(theirs_map, k, n) or \
+                    [ours_rows[j] for j in ours_gaps.get(_next_kept(ours_map, k, n), [])] != \
+                    [theirs_rows[j] for j in theirs_gaps.get(_next_kept(theirs_map, k, n), [])]:
+                raise SaveConflict([(name, f"row {k} changed on both sides")])
+    frames = {"ours": ours_df.reset_index(drop=True), "theirs": theirs_df.reset_index(drop=True)}
+    parts = [frames[src].iloc[[j]] for src, j in pieces]
+    if not parts:
+        return base_df.iloc[0:0].reset_index(drop=True)
+    return pd.concat(parts, ignore_index=True)
+
+
+def _next_kept(mapping, k, n):
+    while k < n and k not in mapping:
+        k += 1
+    return k
+
+
+# -------------------------------
+# 💾 إعادة بناء تعديلات الحفظ فوق النسخة الحالية
+# -------------------------------
+def _rebase_patch(name, patch, base_df, current_df):
+    """أرقام صفوف فرق المحرر بعد نقلها للشيت الحالي (كل صف لمسه الفرق يجب أن يبقى كما هو)"""
+    if list(base_df.columns) != list(current_df.columns):
+        raise SaveConflict([(name, "columns changed")])
+    mapping = row_map(base_df, current_df)
+    touched = set(patch["edited_rows"]) | set(patch["deleted_rows"])
+    lost = sorted(r for r in touched if r not in mapping)
+    if lost:
+        raise SaveConflict([(name, f"rows {lost} changed by another edit")])
+    return {
+        "edited_rows": {mapping[r]: changes for r, changes in patch["edited_rows"].items()},
+        "added_rows": list(patch["added_rows"]),
+        "deleted_rows": sorted(mapping[r] for r in patch["deleted_rows"]),
+    }
+
+
+def rebase_edits(sheets, dirty, current):
+    """
+    تعديلات sheets (EditSheets مبني على بصمة قديمة) للشيتات dirty فوق المخزن الحالي current
+    يرجع (EditSheets جديد فوق current، الشيتات التي احتاجت دمجاً) أو يرفع SaveConflict
+    """
+    merged = current.edit_sheets()
+    merged_names = []
+    conflicts = []
+    for name in dirty:
+        kind, payload = sheets.pending(name)
+        base_df = sheets.base_sheet(name)
+        current_df = current.raw[name] if name in current.raw else None
+        try:
+            if kind is None:
+                continue
+            if same_sheet(base_df, current_df):
+                # لم يتغير عند الآخرين: نفس التعديل كما هو
+                _replay(merged, name, kind, payload, base_df)
+                continue
+            if current_df is None or base_df is None:
+                raise SaveConflict([(name, "sheet added or removed by another edit")])
+            merged_names.append(name)
+            if kind == "inserts":
+                rows = [dict(zip(base_df.columns, values)) for _, values in payload]
+                if not all(range_columns(current_df.columns)[1:]):
+                    raise SaveConflict([(name, "no Min/Max columns to place new rows")])
+                insert_rows_by_range(merged, name, rows)
+            elif kind == "patch":
+                merged.apply_patch(name, _rebase_patch(name, payload, base_df, current_df))
+            elif kind == "replaced":
+                merged[name] = merge_sheet(name, base_df, payload, current_df)
+            else:
+                raise SaveConflict([(name, "sheet removed while changed by another edit")])
+        except SaveConflict as e:
+            conflicts.extend(e.conflicts)
+    if conflicts:
+        raise SaveConflict(conflicts)
+    return merged, merged_names
+
+
+def _replay(merged, name, kind, payload, base_df):
+    if kind == "inserts":
+        merged.insert_rows(name, [(pos, dict(zip(base_df.columns, values))) for pos, values in payload])
+    elif kind == "patch":
+        merged.apply_patch(name, payload)
+    elif kind == "replaced":
+        merged[name] = payload
+    elif name in merged:
+        del merged[name]
+
+
+# -------------------------------
+# 🌐 دمج ملفات كاملة (رفع GitHub عند تعارض sha)
+# -------------------------------
+def merge_workbooks(base, ours, theirs):
+    """
+    base/ours/theirs: {الشيت: إطار}. يرجع (الشيتات التي تتغير في نسختنا: {الشيت: إطار أو None للحذف})
+    شيت تغيّر عند طرف واحد يؤخذ منه، وعند الطرفين يُدمج على مستوى الصف
+    """
+    changes = {}
+    conflicts = []
+    for name in list(ours) + [n for n in theirs if n not in ours]:
+        b, o, t = base.get(name), ours.get(name), theirs.get(name)
+        if same_sheet(b, t) or same_sheet(o, t):
+            continue
+        if same_sheet(b, o):
+            changes[name] = t
+            continue
+        if b is None or o is None or t is None:
+            conflicts.append((name, "sheet added or removed on both sides"))
+            continue
+        try:
+            changes[name] = merge_sheet(name, b, o, t)
+        except SaveConflict as e:
+            conflicts.extend(e.conflicts)
+    if conflicts:
+        raise SaveConflict(conflicts)
+    return changes
+
+
+def _read_workbook(data):
+    # نفس تطبيع المخزن (أسماء أعمدة بدون مسافات) حتى تتطابق الشيتات مع نسختنا
+    return SheetStore(pd.read_excel(io.BytesIO(data), sheet_name=None, dtype=object)).raw
+
+
+def merge_remote(storage, base_bytes, theirs_bytes):
+    """
+    دمج نسخة الريبو الأحدث (theirs) في طبقة التخزين المحلية، والأصل المشترك base هو آخر نسخة متزامنة
+    (لطابور الرفع عند رد 409). يرجع أسماء الشيتات التي تغيّرت محلياً، أو يرفع SaveConflict
+    """
+    fingerprint = storage.fingerprint()
+    store = storage.load_store(fingerprint).load_all()
+    ours = dict(store.raw.items())
+    changes = merge_workbooks(_read_workbook(base_bytes), ours, _read_workbook(theirs_bytes))
+    if not changes:
+        return []
+    sheets = store.edit_sheets()
+    for name, df in changes.items():
+        if df is None:
+            del sheets[name]
+        else:
+            sheets[name] = df
+    storage.save(sheets, dirty=list(changes), base=fingerprint)
+    return list(changes)
@@ -0,0 +1,283 @@
+"""
+⏱ قياس المسارات الساخنة: زمن كل مرحلة وعدّادات (أخطاء الكاش، قراءة الشيتات...) لكل تشغيل
+- timed("name") للدوال و span("name") لأي كتلة، و count("name") للعدّادات
+- عند الإيقاف (الافتراضي) كل استدعاء = فحص متغير واحد ولا يُسجَّل شيء
+- كل تشغيل للصفحة (begin_run ... end_run) يجمع مراحله في سجل واحد (ومنها تقرير الأسطول: حلقة
+  على الكروت في خيط الصفحة)، وكذلك كل وحدة عمل في خيوط الخلفية (رفع أو جلب من GitHub: kind مختلف)؛
+  المراحل خارج أي تشغيل (قبل begin_run) تدخل الإجماليات والنافذة فقط
+- نافذة متحركة لآخر MAX_SAMPLES زمن لكل مرحلة لحساب p50/p95/p99 في لوحة المدير
+- المخرج: سطر JSONL لكل سجل (append_jsonl)، أو ملف Prometheus textfile (.prom) يُعاد كتابته ذرياً
+  كل FLUSH_SECONDS على الأكثر (node_exporter --collector.textfile)
+
+    @timed("check_machine_status")
+    def check_machine_status(...): ...
+
+    with span("storage.save"):
+        report = get_storage().save(...)
+"""
+import functools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from durable_io import append_jsonl, atomic_write_bytes
+
+ENABLED = os.environ.get("CMMS_METRICS", "0") == "1"
+# .prom = Prometheus textfile، غير ذلك JSONL
+SINK_FILE = os.environ.get("CMMS_METRICS_FILE", "metrics.jsonl")
+MAX_SAMPLES = int(os.environ.get("CMMS_METRICS_SAMPLES", "2048"))  # لكل مرحلة
+FLUSH_SECONDS = float(os.environ.get("CMMS_METRICS_FLUSH_SECONDS", "10"))  # Prometheus فقط
+QUANTILES = (0.5, 0.95, 0.99)
+
+_enabled = ENABLED
+_local = threading.local()  # التشغيل الحالي لهذا الخيط (خيط الصفحة في Streamlit)
+
+
+def enabled():
+    return _enabled
+
+
+def set_enabled(on):
+    """تشغيل/إيقاف القياس للعملية كلها (لوحة المدير)"""
+    global _enabled
+    _enabled = bool(on)
+
+
+# -------------------------------
+# 📊 التجميع على مستوى العملية
+# -------------------------------
+class Registry:
+    """الإجماليات ونافذة الأزمنة الأخيرة لكل مرحلة، والمخرج (JSONL أو Prometheus)"""
+
+    def __init__(self, sink_file=SINK_FILE, max_samples=MAX_SAMPLES, flush_seconds=FLUSH_SECONDS):
+        self.sink_file = sink_file
+        self.max_samples = max_samples
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._spans = {}  # الاسم -> [العدد، المجموع، deque الأزمنة الأخيرة]
+        self._counters = {}
+        self._last_flush = 0.0
+
+    @property
+    def prometheus(self):
+        return bool(self.sink_file) and self.sink_file.endswith(".prom")
+
+    def observe(self, name, seconds):
+        with self._lock:
+            entry = self._spans.get(name)
+            if entry is None:
+                entry = self._spans[name] = [0, 0.0, deque(maxlen=self.max_samples)]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2].append(seconds)
+
+    def add(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def summary(self):
+        """{المرحلة: {"n", "total", "p50", "p95", "p99"}} (الشرائح من النافذة الأخيرة)"""
+        with self._lock:
+            spans = {name: (n, total, sorted(window)) for name, (n, total, window) in self._spans.items()}
+        out = {}
+        for name, (n, total, window) in spans.items():
+            row = {"n": n, "total": total}
+            for q in QUANTILES:
+                row[f"p{int(q * 100)}"] = _quantile(window, q)
+            out[name] = row
+        return out
+
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+
+    def emit(self, record):
+        """سجل تشغيل إلى المخرج؛ فشل الكتابة لا يوقف التطبيق"""
+        if not self.sink_file:
+            return
+        try:
+            if self.prometheus:
+                now = time.monotonic()
+                if now - self._last_flush >= self.flush_seconds:
+                    self._last_flush = now
+                    atomic_write_bytes(self.sink_file, self.prometheus_text().encode())
+            else:
+                append_jsonl(self.sink_file, record)
+        except OSError:
+            pass
+
+    def prometheus_text(self):
+        """صيغة Prometheus text exposition: summary لكل مرحلة + counter لكل عدّاد"""
+        lines = [
+            "# HELP cmms_span_seconds Time spent in instrumented code paths.",
+            "# TYPE cmms_span_seconds summary",
+        ]
+        for name, row in sorted(self.summary().items()):
+            label = _label(name)
+            for q in QUANTILES:
+                lines.append(f'cmms_span_seconds{{span="{label}",quantile="{q}"}} {row[f"p{int(q * 100)}"]:.6f}')
+            lines.append(f'cmms_span_seconds_sum{{span="{label}"}} {row["total"]:.6f}')
+            lines.append(f'cmms_span_seconds_count{{span="{label}"}} {row["n"]}')
+        lines += ["# HELP cmms_events_total Instrumented event counters.", "# TYPE cmms_events_total counter"]
+        for name, value in sorted(self.counters().items()):
+            lines.append(f'cmms_events_total{{event="{_label(name)}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+def _quantile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def _label(name):
+    return str(name).replace("\\", "\\\\").replace('"', '\\"')
+
+
+registry = Registry()
+
+
+# -------------------------------
+# 🔁 سجل التشغيل الواحد
+# -------------------------------
+class RunRecord:
+    """مراحل وعدّادات تشغيل واحد (للصفحة أو وحدة عمل في الخلفية)"""
+
+    def __init__(self, user=None, kind="page"):
+        self.user = user
+        self.kind = kind
+        self.started = time.perf_counter()
+        self.last = self.started  # نهاية آخر مرحلة مقاسة
+        self.interrupted = False
+        self.time = datetime.now().isoformat(timespec="seconds")
+        self.spans = {}  # الاسم -> [العدد، المجموع]
+        self.counters = {}
+        self.seconds = None
+
+    def observe(self, name, seconds):
+        self.last = time.perf_counter()
+        entry = self.spans.get(name)
+        if entry is None:
+            self.spans[name] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def add(self, name, n):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def finish(self, interrupted=False):
+        # تشغيل لم يصل لنهايته (st.stop / إعادة تشغيل): ينتهي عند آخر مرحلة مقاسة
+        self.interrupted = interrupted
+        self.seconds = (self.last if interrupted else time.perf_counter()) - self.started
+        return self
+
+    def as_dict(self):
+        return {
+            "time": self.time,
+            "kind": self.kind,
+            "user": self.user,
+            "seconds": round(self.seconds, 6) if self.seconds is not None else None,
+            "interrupted": self.interrupted,
+            "spans": {name: {"n": n, "s": round(total, 6)} for name, (n, total) in self.spans.items()},
+            "counters": dict(self.counters),
+        }
+
+    def breakdown(self):
+        """[(المرحلة، العدد، الثواني)] الأبطأ أولاً"""
+        return sorted(((name, n, total) for name, (n, total) in self.spans.items()), key=lambda r: -r[2])
+
+
+def begin_run(user=None, kind="page"):
+    """بداية تشغيل جديد في هذا الخيط (None إذا كان القياس متوقفاً)"""
+    run = RunRecord(user, kind) if _enabled else None
+    _local.run = run
+    return run
+
+
+def end_run(run=None, interrupted=False):
+    """
+    إنهاء التشغيل (الحالي أو المعطى) وكتابته للمخرج؛ يرجع السجل المنتهي أو None
+    (التشغيل المنتهي مسبقاً لا يُكتب مرتين)
+    """
+    run = getattr(_local, "run", None) if run is None else run
+    if getattr(_local, "run", None) is run:
+        _local.run = None
+    if run is None or run.seconds is not None:
+        return None
+    run.finish(interrupted)
+    registry.observe(f"run.{run.kind}", run.seconds)
+    registry.emit(run.as_dict())
+    return run
+
+
+def _record(name, seconds):
+    registry.observe(name, seconds)
+    run = getattr(_local, "run", None)
+    if run is not None:
+        run.observe(name, seconds)
+
+
+# -------------------------------
+# ⏱ الواجهة: timed / span / count
+# -------------------------------
+def timed(name):
+    """ديكوريتر: زمن كل استدعاء للدالة تحت الاسم name (والاستثناءات تُقاس أيضاً)"""
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _record(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def _span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, time.perf_counter() - start)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name):
+    """with span("name"): ... — كتلة مقاسة (كائن فارغ مشترك عند الإيقاف)"""
+    return _span(name) if _enabled else _NO_SPAN
+
+
+def count(name, n=1):
+    """عدّاد حدث (خطأ كاش، قراءة شيت، رفع...)"""
+    if not _enabled:
+        return
+    registry.add(name, n)
+    run = getattr(_local, "run", None)
+    if run is not None:
+        run.add(name, n)
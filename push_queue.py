@@ -0,0 +1,253 @@
+"""
+📤 طابور رفع التعديلات إلى GitHub في الخلفية
+الحفظ المحلي يرجع فوراً ويضيف طلب رفع إلى طابور محفوظ على القرص (push_queue.json).
+خيط واحد في الخلفية يفرّغ الطابور:
+- يدمج كل الطلبات المنتظرة في commit واحد (المحتوى دائماً هو الملف المحلي الحالي)
+- يعيد المحاولة مع تأخير متزايد (backoff) عند الفشل
+- يعيد استخدام نفس عميل Github ونفس repo handle وآخر sha معروف للملف
+- الرفع مبني على sha آخر نسخة متزامنة (base_sha)، لا على sha يُجلب قبل الرفع مباشرة:
+  إذا رفع غيرنا بعدها يرد GitHub بـ 409، فندمج نسختهم مع نسختنا (merge) ثم نرفع فوقها
+
+العميل يُمرَّر كـ client_factory (مثل lambda: Github(token))، فيمكن تجربته بعميل وهمي محلي.
+"""
+import base64
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+
+import metrics
+from durable_io import atomic_write_json, read_json
+
+COALESCE_SECONDS = 2.0  # انتظار قصير لتجميع التعديلات المتتالية في commit واحد
+RETRY_BASE_SECONDS = 2.0
+RETRY_MAX_SECONDS = 300.0
+CONFLICT_STATUSES = (409,)  # update_file بـ sha قديم
+
+
+def coalesced_message(entries):
+    """رسالة commit واحدة لكل الطلبات المدمجة"""
+    if len(entries) == 1:
+        return entries[0]["message"]
+    lines = [f"{len(entries)} edits from Streamlit", ""]
+    lines.extend(f"- {e['message']}" for e in entries)
+    return "\n".join(lines)
+
+
+def load_pending(queue_file):
+    """الطلبات المنتظرة المحفوظة في ملف الطابور (قائمة فارغة إذا لم يوجد أو تلف)"""
+    if not os.path.exists(queue_file):
+        return []
+    try:
+        return list(read_json(queue_file)[0])
+    except Exception:
+        return []
+
+
+class PushQueue:
+    def __init__(self, client_factory, repo_name, file_path, local_file, branch="main",
+                 queue_file="push_queue.json", coalesce_seconds=COALESCE_SECONDS,
+                 retry_base=RETRY_BASE_SECONDS, retry_max=RETRY_MAX_SECONDS, on_pushed=None, prepare=None,
+                 base_sha=None, merge=None, start=True):
+        """
+        prepare(): يُستدعى قبل قراءة الملف لكل دفعة (مثلاً تصدير قاعدة البيانات إلى XLSX)
+        on_pushed(digest, sha): يُستدعى بعد كل رفع ناجح بهاش المحتوى المرفوع و sha الملف في الريبو
+        base_sha(): sha نسخة الريبو التي بُني عليها الملف المحلي (آخر جلب أو رفع)، أو None
+        merge(base_bytes, theirs_bytes): يدمج نسخة الريبو الأحدث في الملف المحلي عند التعارض
+        (يرفع استثناء إذا تعذر الدمج، فيُسجَّل كخطأ ويُعاد المحاولة لاحقاً)
+        """
+        self.client_factory = client_factory
+        self.repo_name = repo_name
+        self.file_path = file_path
+        self.local_file = local_file
+        self.branch = branch
+        self.queue_file = queue_file
+        self.coalesce_seconds = coalesce_seconds
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.on_pushed = on_pushed
+        self.prepare = prepare
+        self.base_sha = base_sha
+        self.merge = merge
+
+        self._cond = threading.Condition()
+        self._stop = False
+        self._pushing = False
+        self._repo = None
+        self._remote_sha = None  # sha آخر نسخة رفعناها/قرأناها من GitHub
+        self._pushed_digest = None  # هاش آخر محتوى تم رفعه (لتجاهل الرفع المكرر)
+        self.last_result = None
+        self._pending = load_pending(self.queue_file)
+        self._thread = None
+        if start:
+            self.start()
+
+    # -------------------------------
+    # 💾 حفظ الطابور على القرص
+    # -------------------------------
+    def _persist(self):
+        atomic_write_json(self.queue_file, self._pending)
+
+    # -------------------------------
+    # 🧵 الخيط والواجهة العامة
+    # -------------------------------
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name="github-push-queue", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def enqueue(self, message, fingerprint=None):
+        """إضافة طلب رفع (يرجع فوراً) — يرجع عدد الطلبات المنتظرة"""
+        with self._cond:
+            self._pending.append({
+                "message": message,
+                "fingerprint": fingerprint,
+                "queued_at": datetime.now().isoformat(timespec="seconds"),
+            })
+            self._persist()
+            self._cond.notify_all()
+            return len(self._pending)
+
+    def status(self):
+        with self._cond:
+            return {
+                "depth": len(self._pending),
+                "pushing": self._pushing,
+                "last_result": dict(self.last_result) if self.last_result else None,
+            }
+
+    def flush(self, timeout=None):
+        """انتظار تفريغ الطابور (للاختبارات والإيقاف النظيف) — يرجع True إذا فرغ"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._pushing:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    # -------------------------------
+    # 🔁 حلقة التفريغ
+    # -------------------------------
+    def _run(self):
+        attempt = 0
+        while True:
+            with self._cond:
+                while not self._pending and not self._stop:
+                    self._cond.wait()
+                if self._stop:
+                    return
+            # مهلة قصيرة لتجميع التعديلات التالية في نفس الـ commit
+            if attempt == 0 and self.coalesce_seconds:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._stop, self.coalesce_seconds)
+            with self._cond:
+                if self._stop:
+                    return
+                batch = list(self._pending)
+                self._pushing = True
+            run = metrics.begin_run(kind="github-push")
+            try:
+                with metrics.span("github.push"):
+                    result = self._push(batch)
+                ok = True
+                attempt = 0
+            except Exception as e:
+                ok = False
+                attempt += 1
+                self._repo = None  # نعيد بناء العميل في المحاولة التالية
+                self._remote_sha = None
+                result = {"error": str(e), "attempts": attempt}
+                metrics.count("github.push_error")
+            metrics.end_run(run)
+            with self._cond:
+                self._pushing = False
+                if ok:
+                    # الطلبات التي وصلت أثناء الرفع تبقى للدفعة التالية
+                    del self._pending[:len(batch)]
+                    self._persist()
+                result.update({
+                    "ok": ok,
+                    "edits": len(batch),
+                    "time": datetime.now().isoformat(timespec="seconds"),
+                })
+                self.last_result = result
+                self._cond.notify_all()
+                if not ok:
+                    delay = min(self.retry_base * (2 ** (attempt - 1)), self.retry_max)
+                    self._cond.wait_for(lambda: self._stop, delay)
+
+    def _get_repo(self):
+        if self._repo is None:
+            with metrics.span("github.get_repo"):
+                self._repo = self.client_factory().get_repo(self.repo_name)
+        return self._repo
+
+    def _read_local(self):
+        if self.prepare is not None:
+            self.prepare()
+        with open(self.local_file, "rb") as f:
+            content = f.read()
+        return content, hashlib.blake2b(content, digest_size=16).hexdigest()
+
+    def _push(self, batch):
+        with metrics.span("github.read_local"):
+            content, digest = self._read_local()
+        if digest == self._pushed_digest:
+            return {"skipped": True, "message": coalesced_message(batch)}
+
+        repo = self._get_repo()
+        message = coalesced_message(batch)
+        if self._remote_sha is None and self.base_sha is not None:
+            self._remote_sha = self.base_sha()
+        if self._remote_sha is None:
+            # لا نعرف النسخة الأساسية (أول رفع بدون مزامنة سابقة): نرفع فوق نسخة الريبو الحالية
+            try:
+                with metrics.span("github.get_contents"):
+                    self._remote_sha = repo.get_contents(self.file_path, ref=self.branch).sha
+            except Exception:
+                self._remote_sha = None
+        merged = False
+        if self._remote_sha is None:
+            with metrics.span("github.create_file"):
+                res = repo.create_file(path=self.file_path, message=message, content=content, branch=self.branch)
+        else:
+            try:
+                with metrics.span("github.update_file"):
+                    res = repo.update_file(path=self.file_path, message=message, content=content,
+                                           sha=self._remote_sha, branch=self.branch)
+            except Exception as e:
+                if getattr(e, "status", None) not in CONFLICT_STATUSES or self.merge is None:
+                    raise
+                # رفع غيرنا بعد النسخة الأساسية: ندمج نسختهم ثم نرفع فوقها
+                metrics.count("github.conflict")
+                with metrics.span("github.get_contents"):
+                    theirs_sha = repo.get_contents(self.file_path, ref=self.branch).sha
+                with metrics.span("github.merge"):
+                    self.merge(self._blob(repo, self._remote_sha), self._blob(repo, theirs_sha))
+                content, digest = self._read_local()
+                merged = True
+                with metrics.span("github.update_file"):
+                    res = repo.update_file(path=self.file_path, message=message, content=content,
+                                           sha=theirs_sha, branch=self.branch)
+        self._remote_sha = res["content"].sha
+        self._pushed_digest = digest
+        if self.on_pushed is not None:
+            self.on_pushed(digest, self._remote_sha)
+        return {"skipped": False, "merged": merged, "message": message}
+
+    @staticmethod
+    def _blob(repo, sha):
+        """محتوى نسخة الملف بالـ sha (git blob، بدون حد حجم get_contents)"""
+        blob = repo.get_git_blob(sha)
+        return base64.b64decode(blob.content) if blob.encoding == "base64" else blob.content.encode()
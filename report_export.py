@@ -0,0 +1,63 @@
+"""
+💾 تصدير التقارير (جدول حالة ماكينة، تقرير الأسطول) للتنزيل
+- XLSX بوضع openpyxl write_only: الصفوف تُكتب متتالية بذاكرة ثابتة تقريباً
+  (بدل to_excel الذي يبني كل الخلايا وتنسيقاتها في الذاكرة أولاً)
+- CSV بترميز utf-8-sig (يفتح في Excel بالعربي مباشرة) للتقارير الكبيرة
+- report_bytes لا يُستدعى إلا عند الضغط على زر التنزيل (data=callable في st.download_button)،
+  والناتج يُحفظ مع مخزن البصمة بنفس مفتاح الاستعلام
+"""
+import io
+
+import pandas as pd
+from openpyxl import Workbook
+
+import metrics
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CSV_MIME = "text/csv"
+FORMATS = {"xlsx": XLSX_MIME, "csv": CSV_MIME}
+
+
+def _cell(v):
+    # الخلايا الفارغة (NaN/NaT/None) تبقى فارغة كما في to_excel
+    return None if pd.isna(v) else v
+
+
+def xlsx_bytes(df, sheet_name="Sheet1"):
+    """DataFrame → XLSX (صف العناوين ثم الصفوف، بدون الفهرس) بالكتابة المتتالية"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    ws.append([str(c) for c in df.columns])
+    for row in df.itertuples(index=False, name=None):
+        ws.append([_cell(v) for v in row])
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def csv_bytes(df):
+    return df.to_csv(index=False).encode("utf-8-sig")
+
+
+def report_bytes(df, fmt):
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown report format: {fmt}")
+    with metrics.span(f"report.{fmt}"):
+        return xlsx_bytes(df) if fmt == "xlsx" else csv_bytes(df)
+
+
+def deferred_report(df, fmt, memo=None, key=None, max_entries=None):
+    """
+    دالة بدون معاملات لـ st.download_button: تبني الملف عند الضغط فقط (في خيط منفصل)
+    memo/key: memo مخزن البصمة (SheetStore.memo) ومفتاح الاستعلام، فالضغطات التالية لنفس
+    الاستعلام لا تعيد الكتابة؛ max_entries: حد الـ LRU (نفس حد جداول الحالة)
+    """
+    if memo is None or key is None:
+        return lambda: report_bytes(df, fmt)
+
+    def build():
+        report_key = ("report", fmt, key)
+        if max_entries is None:
+            return memo(report_key, lambda: report_bytes(df, fmt))
+        return memo(report_key, lambda: report_bytes(df, fmt), max_entries)
+    return build
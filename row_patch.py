@@ -0,0 +1,197 @@
+"""
+🩹 تعديلات الصفوف (patch) بدل استبدال الشيت كاملاً
+محرر الشيت (st.data_editor) يعرف ما تغيّر فقط: خلايا معدّلة، صفوف مضافة، صفوف محذوفة.
+نحفظ هذا الفرق كما هو ونطبقه على الإطار الأساسي، فلا يتحول الشيت كله إلى نص،
+وطبقة التخزين تكتب الصفوف المتأثرة فقط (EditSheets.row_patch)، ورسالة الـ commit
+وسجل التغييرات (JSONL للإضافة فقط) يُبنيان من نفس الفرق.
+
+شكل الفرق (نفس مفاتيح st.data_editor، والأرقام مواضع في الشيت قبل التعديل):
+    {"edited_rows": {الصف: {العمود: القيمة}}, "added_rows": [{العمود: القيمة}], "deleted_rows": [الصف]}
+ترتيب التطبيق: تعديل الخلايا، ثم حذف الصفوف، ثم إضافة الصفوف الجديدة في النهاية.
+"""
+import datetime as dt
+import math
+
+import numpy as np
+import pandas as pd
+
+# أقصى عدد أسطر تفاصيل في رسالة الـ commit (السجل يحتفظ بالكل)
+MAX_MESSAGE_LINES = 20
+
+
+def _cell(value):
+    """قيمة المحرر -> قيمة الخلية (الخلية الممسوحة تصبح فارغة مثل باقي الخلايا الفارغة)"""
+    return np.nan if value is None else value
+
+
+def _same(old, new):
+    if _is_blank(old) and _is_blank(new):
+        return True
+    return str(old) == str(new)
+
+
+def _is_blank(value):
+    if value is None:
+        return True
+    try:
+        return bool(pd.isna(value))
+    except (TypeError, ValueError):
+        return False
+
+
+def _old(df, row, col):
+    return df.iat[row, df.columns.get_loc(col)]
+
+
+def editor_patch(state, view):
+    """
+    الفرق من حالة st.data_editor (session_state[key]) على النسخة النصية view:
+    أرقام الصفوف أعداد صحيحة، وتُحذف التعديلات التي أعادت نفس القيمة المعروضة
+    """
+    edited = {}
+    for row, changes in (state or {}).get("edited_rows", {}).items():
+        row = int(row)
+        kept = {c: v for c, v in changes.items() if c in view.columns and not _same(_old(view, row, c), v)}
+        if kept:
+            edited[row] = kept
+    added = [dict(r) for r in (state or {}).get("added_rows", []) if any(not _is_blank(v) for v in r.values())]
+    deleted = sorted({int(r) for r in (state or {}).get("deleted_rows", [])})
+    # تعديل صف محذوف لا معنى له
+    gone = set(deleted)
+    edited = {r: c for r, c in edited.items() if r not in gone}
+    return {"edited_rows": edited, "added_rows": added, "deleted_rows": deleted}
+
+
+def diff_frames(old, new):
+    """
+    الفرق بين إطارين بنفس الأعمدة حيث new = old بعد تعديل خلايا وإضافة صفوف في النهاية
+    (للاستخدام خارج المحرر؛ المقارنة نصية مثل ما يعرضه المحرر)
+    """
+    old = old.reset_index(drop=True)
+    new = new.reset_index(drop=True)
+    common = min(len(old), len(new))
+    a = old.iloc[:common].astype(str).to_numpy()
+    b = new.iloc[:common].astype(str).to_numpy()
+    edited = {}
+    for row, col in zip(*np.nonzero(a != b)):
+        edited.setdefault(int(row), {})[old.columns[col]] = new.iat[row, col]
+    added = [dict(zip(new.columns, values)) for values in new.iloc[common:].itertuples(index=False, name=None)]
+    deleted = list(range(common, len(old)))
+    return {"edited_rows": edited, "added_rows": added, "deleted_rows": deleted}
+
+
+def patch_is_empty(patch):
+    return not (patch["edited_rows"] or patch["added_rows"] or patch["deleted_rows"])
+
+
+def patch_counts(patch):
+    """(خلايا معدّلة، صفوف معدّلة، صفوف مضافة، صفوف محذوفة)"""
+    cells = sum(len(c) for c in patch["edited_rows"].values())
+    return cells, len(patch["edited_rows"]), len(patch["added_rows"]), len(patch["deleted_rows"])
+
+
+def apply_patch(df, patch):
+    """الإطار بعد الفرق: يُنسخ فقط كل عمود فيه خلايا معدّلة، والصفوف غير المعدّلة تبقى بأنواعها"""
+    out = df.reset_index(drop=True)
+    by_column = {}
+    for row, changes in patch["edited_rows"].items():
+        for col, value in changes.items():
+            by_column.setdefault(col, ([], []))
+            by_column[col][0].append(row)
+            by_column[col][1].append(_cell(value))
+    if by_column:
+        out = out.copy(deep=False)
+        for col, (rows, values) in by_column.items():
+            column = out[col].to_numpy(dtype=object, copy=True)
+            column[rows] = values
+            out[col] = column
+    if patch["deleted_rows"]:
+        out = out.drop(index=patch["deleted_rows"]).reset_index(drop=True)
+    if patch["added_rows"]:
+        rows = pd.DataFrame([[_cell(r.get(c)) for c in out.columns] for r in patch["added_rows"]],
+                            columns=out.columns, dtype=object)
+        out = pd.concat([out, rows], ignore_index=True)
+    return out
+
+
+def storage_patch(df, patch):
+    """
+    الفرق بصيغة طبقة التخزين (القيم بترتيب الأعمدة):
+    {"updated": [(الموضع، القيم)], "deleted": [الموضع], "appended": [القيم]}
+    المواضع في updated قبل الحذف، والصفوف المضافة تأتي بعد آخر صف متبقٍ
+    """
+    columns = list(df.columns)
+    updated = []
+    for row in sorted(patch["edited_rows"]):
+        values = list(df.iloc[row])
+        for col, value in patch["edited_rows"][row].items():
+            values[columns.index(col)] = _cell(value)
+        updated.append((row, values))
+    appended = [[_cell(r.get(c)) for c in columns] for r in patch["added_rows"]]
+    return {"updated": updated, "deleted": list(patch["deleted_rows"]), "appended": appended}
+
+
+# -------------------------------
+# 📝 رسالة الـ commit وسجل التغييرات
+# -------------------------------
+def _short(value, limit=40):
+    text = "" if _is_blank(value) else str(value)
+    return text if len(text) <= limit else text[: limit - 1] + "…"
+
+
+def patch_message(sheet, patch, df, username=None):
+    """سطر ملخص (مثل رسائل التبويبات) ثم سطر لكل تغيير حتى MAX_MESSAGE_LINES"""
+    cells, rows, added, deleted = patch_counts(patch)
+    parts = []
+    if cells:
+        parts.append(f"{cells} cells in {rows} rows")
+    if added:
+        parts.append(f"+{added} rows")
+    if deleted:
+        parts.append(f"-{deleted} rows")
+    head = f"Edit sheet {sheet}: " + ", ".join(parts)
+    if username:
+        head += f" by {username}"
+    lines = []
+    for row in sorted(patch["edited_rows"]):
+        for col, value in patch["edited_rows"][row].items():
+            lines.append(f"- row {row} {col}: '{_short(_old(df, row, col))}' -> '{_short(value)}'")
+    lines.extend(f"- deleted row {row}" for row in patch["deleted_rows"])
+    lines.extend("- added row: " + ", ".join(f"{c}={_short(v)}" for c, v in r.items() if not _is_blank(v))
+                 for r in patch["added_rows"])
+    if len(lines) > MAX_MESSAGE_LINES:
+        lines = lines[:MAX_MESSAGE_LINES] + [f"- ... {len(lines) - MAX_MESSAGE_LINES} more"]
+    return "\n".join([head, ""] + lines) if lines else head
+
+
+def _json_value(value):
+    if _is_blank(value):
+        return None
+    if isinstance(value, (np.integer, np.floating, np.bool_)):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, (dt.datetime, dt.date, dt.time)):
+        return value.isoformat()
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def change_log_entry(sheet, patch, df, username=None, base_fingerprint=None):
+    """سجل واحد لكل حفظ: كل خلية بقيمتها القديمة والجديدة، والصفوف المحذوفة بقيمها"""
+    return {
+        "time": dt.datetime.now().isoformat(timespec="seconds"),
+        "user": username,
+        "sheet": sheet,
+        "base": base_fingerprint,
+        "edited": [
+            {"row": row, "column": str(col), "old": _json_value(_old(df, row, col)), "new": _json_value(value)}
+            for row in sorted(patch["edited_rows"]) for col, value in patch["edited_rows"][row].items()
+        ],
+        "deleted": [
+            {"row": row, "values": {str(c): _json_value(v) for c, v in df.iloc[row].items()}}
+            for row in patch["deleted_rows"]
+        ],
+        "added": [{str(c): _json_value(v) for c, v in r.items()} for r in patch["added_rows"]],
+    }
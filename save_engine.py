@@ -0,0 +1,263 @@
+"""
+💾 محرك الحفظ
+حفظ ملف الإكسل بعد التعديل مع إعادة كتابة الشيتات المعدّلة فقط (dirty):
+ملف XLSX هو أرشيف zip فيه ملف XML لكل شيت، فننسخ أجزاء الشيتات الأخرى
+كما هي ونولّد XML جديد للشيتات المعدّلة فقط بدل تمرير كل الشيتات عبر openpyxl.
+
+إذا لم يكن الترقيع ممكناً (الملف غير موجود، شيت جديد/محذوف، أو قيم لا نكتبها
+بنفس شكل pandas مثل التواريخ والمعادلات) نرجع للحفظ الكامل عبر pd.ExcelWriter.
+كل حفظ يرجع تقريراً: الطريقة، الشيتات المكتوبة، عدد البايتات، والزمن.
+
+ونفس معرفة الأرشيف تُستخدم للقراءة: أسماء الشيتات من workbook.xml فقط، وقراءة شيت
+واحد عبر أرشيف مصغر في الذاكرة لا يحتوي إلا هذا الشيت (openpyxl يفحص كل الشيتات عند الفتح).
+"""
+import io
+import math
+import os
+import posixpath
+import re
+import time
+import zipfile
+from numbers import Integral, Real
+from xml.etree import ElementTree as ET
+from xml.sax.saxutils import escape
+
+import pandas as pd
+
+from durable_io import atomic_replace
+
+SAVE_MODE_PATCH = "patch"
+SAVE_MODE_FULL = "full"
+
+_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+# نفس الحروف التي يرفضها openpyxl داخل الخلايا
+_ILLEGAL_XML_RE = re.compile(r"[\000-\010]|[\013-\014]|[\016-\037]")
+_HEADER_STYLE_RE = re.compile(rb'<c r="A1"[^>]*?\ss="(\d+)"')
+_SHEET_ENTRY_RE = re.compile(rb"<(?:\w+:)?sheet\b[^>]*/>")
+_DEFINED_NAMES_RE = re.compile(rb"<(?:\w+:)?definedNames\b.*?</(?:\w+:)?definedNames>", re.S)
+
+
+class PatchNotPossible(Exception):
+    """الشيت لا يمكن ترقيعه بأمان — نستخدم الحفظ الكامل"""
+
+
+# -------------------------------
+# 📝 توليد XML الشيت
+# -------------------------------
+def _column_letter(idx):
+    """0 -> A, 25 -> Z, 26 -> AA"""
+    letters = ""
+    idx += 1
+    while idx:
+        idx, rem = divmod(idx - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _cell_xml(ref, value, style=None):
+    """خلية واحدة بنفس ما يكتبه to_excel (الفارغ يُترك بدون خلية)"""
+    s_attr = f' s="{style}"' if style is not None else ""
+    if value is None or value is pd.NA or value is pd.NaT:
+        return ""
+    if isinstance(value, bool):
+        return f'<c r="{ref}"{s_attr} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, Integral):
+        return f'<c r="{ref}"{s_attr} t="n"><v>{int(value)}</v></c>'
+    if isinstance(value, Real):
+        value = float(value)
+        if math.isnan(value):
+            return ""
+        if math.isinf(value):
+            # pandas يكتب inf كنص (inf_rep)
+            value = "inf" if value > 0 else "-inf"
+        else:
+            return f'<c r="{ref}"{s_attr} t="n"><v>{repr(value)}</v></c>'
+    if not isinstance(value, str):
+        # تواريخ/أوقات تحتاج تنسيق أرقام من styles.xml
+        raise PatchNotPossible(f"unsupported cell type {type(value).__name__}")
+    if value.startswith("="):
+        # openpyxl يكتبها كمعادلة
+        raise PatchNotPossible("formula cell")
+    if _ILLEGAL_XML_RE.search(value):
+        raise PatchNotPossible("illegal character in cell")
+    return f'<c r="{ref}"{s_attr} t="inlineStr"><is><t xml:space="preserve">{escape(value)}</t></is></c>'
+
+
+def sheet_xml(df, header_style=None):
+    """XML شيت كامل (صف العناوين + البيانات) بنصوص inline بدون sharedStrings"""
+    n_rows, n_cols = df.shape
+    letters = [_column_letter(i) for i in range(max(n_cols, 1))]
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n',
+        f'<worksheet xmlns="{_MAIN_NS}">',
+        f'<dimension ref="A1:{letters[-1]}{n_rows + 1}"/>',
+        "<sheetData>",
+        '<row r="1">',
+    ]
+    parts.extend(_cell_xml(f"{letters[j]}1", col, header_style) for j, col in enumerate(df.columns))
+    parts.append("</row>")
+    values = df.to_numpy(dtype=object)
+    for i in range(n_rows):
+        r = i + 2
+        parts.append(f'<row r="{r}">')
+        row = values[i]
+        parts.extend(_cell_xml(f"{letters[j]}{r}", row[j]) for j in range(n_cols))
+        parts.append("</row>")
+    parts.append("</sheetData></worksheet>")
+    return "".join(parts).encode("utf-8")
+
+
+# -------------------------------
+# 🗂 خريطة الشيتات داخل الأرشيف
+# -------------------------------
+def workbook_sheet_parts(zf):
+    """قائمة (اسم الشيت، مسار XML داخل الأرشيف) بترتيب الملف"""
+    workbook = ET.fromstring(zf.read("xl/workbook.xml"))
+    rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    targets = {rel.get("Id"): rel.get("Target") for rel in rels.iter(f"{{{_PKG_REL_NS}}}Relationship")}
+    parts = []
+    for sheet in workbook.iter(f"{{{_MAIN_NS}}}sheet"):
+        target = targets.get(sheet.get(f"{{{_REL_NS}}}id"))
+        if target is None:
+            raise PatchNotPossible(f"missing relationship for sheet {sheet.get('name')}")
+        if target.startswith("/"):
+            part = target.lstrip("/")
+        else:
+            part = posixpath.normpath(posixpath.join("xl", target))
+        parts.append((sheet.get("name"), part))
+    return parts
+
+
+def _patch_workbook(path, sheets, dirty, generations=0):
+    """نسخ الأرشيف مع استبدال XML الشيتات المعدّلة فقط، ثم استبدال الملف ذرياً"""
+    sheet_bytes = []
+
+    def write(tmp):
+        with zipfile.ZipFile(path) as zin:
+            parts = workbook_sheet_parts(zin)
+            if [name for name, _ in parts] != list(sheets.keys()):
+                raise PatchNotPossible("sheet list changed")
+            part_of = dict(parts)
+            new_parts = {}
+            for name in dirty:
+                old_xml = zin.read(part_of[name])
+                m = _HEADER_STYLE_RE.search(old_xml[:4096])
+                new_parts[part_of[name]] = sheet_xml(sheets[name], m.group(1).decode() if m else None)
+            with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_DEFLATED) as zout:
+                for item in zin.infolist():
+                    data = new_parts.get(item.filename)
+                    if data is None:
+                        data = zin.read(item.filename)
+                    zout.writestr(item, data, compress_type=zipfile.ZIP_DEFLATED)
+        sheet_bytes.append(sum(len(x) for x in new_parts.values()))
+
+    atomic_replace(path, write, generations)
+    return sheet_bytes[0]
+
+
+def _write_full(path, sheets, generations=0):
+    """الحفظ الكامل كما كان: كل الشيتات عبر pd.ExcelWriter (في ملف مؤقت ثم استبدال)"""
+    def write(tmp):
+        with pd.ExcelWriter(tmp, engine="openpyxl") as writer:
+            for name, sh in sheets.items():
+                try:
+                    sh.to_excel(writer, sheet_name=name, index=False)
+                except Exception:
+                    sh.astype(object).to_excel(writer, sheet_name=name, index=False)
+
+    atomic_replace(path, write, generations)
+
+
+# -------------------------------
+# 📖 قراءة شيت واحد بدون فتح كل الشيتات
+# -------------------------------
+def workbook_sheet_names(data):
+    """أسماء الشيتات بالترتيب من محتوى ملف XLSX (bytes) — بدون قراءة أي شيت"""
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        return [name for name, _ in workbook_sheet_parts(zf)]
+
+
+def _single_sheet_archive(data, name):
+    """أرشيف XLSX في الذاكرة فيه الشيت name فقط (مع الأنماط والنصوص المشتركة)"""
+    with zipfile.ZipFile(io.BytesIO(data)) as zin:
+        parts = workbook_sheet_parts(zin)
+        names = [n for n, _ in parts]
+        if name not in names:
+            raise KeyError(name)
+        workbook = zin.read("xl/workbook.xml")
+        entries = list(_SHEET_ENTRY_RE.finditer(workbook))
+        if len(entries) != len(parts):
+            raise PatchNotPossible("unexpected workbook.xml layout")
+        keep = entries[names.index(name)].group(0)
+        workbook = workbook[:entries[0].start()] + keep + workbook[entries[-1].end():]
+        # الأسماء المعرفة تشير لأرقام شيتات لم تعد موجودة
+        workbook = _DEFINED_NAMES_RE.sub(b"", workbook)
+        drop = {part for n, part in parts if n != name}
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_STORED) as zout:
+            for item in zin.infolist():
+                if item.filename in drop or item.filename.startswith("xl/worksheets/_rels/"):
+                    continue
+                content = workbook if item.filename == "xl/workbook.xml" else zin.read(item.filename)
+                zout.writestr(item.filename, content)
+    buf.seek(0)
+    return buf
+
+
+def read_single_sheet(data, name):
+    """
+    شيت واحد بنفس نتيجة pd.read_excel(sheet_name=name, dtype=object)
+    إذا لم يكن الأرشيف بالشكل المتوقع نقرأ من الملف كاملاً
+    """
+    try:
+        source = _single_sheet_archive(data, name)
+    except (PatchNotPossible, zipfile.BadZipFile, ET.ParseError):
+        source = io.BytesIO(data)
+    return pd.read_excel(source, sheet_name=name, dtype=object)
+
+
+# -------------------------------
+# 🚀 الواجهة العامة
+# -------------------------------
+def save_workbook(path, sheets, dirty=None, generations=0):
+    """
+    حفظ الشيتات في path (كتابة ذرية مع الاحتفاظ بعدد generations من النسخ السابقة).
+    dirty: أسماء الشيتات التي تغيّرت؛ None يعني حفظ كامل لكل الشيتات.
+    يرجع تقرير dict: mode, sheets, bytes (حجم الملف المكتوب), sheet_bytes, seconds
+    """
+    start = time.perf_counter()
+    mode = SAVE_MODE_FULL
+    written = list(sheets.keys())
+    sheet_bytes = None
+    if dirty is not None and os.path.exists(path):
+        dirty_set = set(dirty)
+        dirty = [name for name in sheets if name in dirty_set]
+        try:
+            sheet_bytes = _patch_workbook(path, sheets, dirty, generations)
+            mode = SAVE_MODE_PATCH
+            written = dirty
+        except (PatchNotPossible, zipfile.BadZipFile, KeyError, ET.ParseError):
+            sheet_bytes = None
+    if mode == SAVE_MODE_FULL:
+        _write_full(path, sheets, generations)
+    return {
+        "mode": mode,
+        "sheets": written,
+        "bytes": os.path.getsize(path),
+        "sheet_bytes": sheet_bytes,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def format_save_report(report):
+    """سطر مختصر للواجهة"""
+    mode = {SAVE_MODE_PATCH: "ترقيع", SAVE_MODE_FULL: "كامل", "sqlite": "في قاعدة البيانات"}.get(report["mode"], report["mode"])
+    names = ", ".join(report["sheets"]) if len(report["sheets"]) <= 3 else f"{len(report['sheets'])} شيت"
+    line = f"💾 حفظ {mode} ({names}) — {report['bytes'] / 1024:.1f} KB في {report['seconds'] * 1000:.0f} ms"
+    if report.get("merged"):
+        # الملف تغيّر بعد التحميل (جلسة أخرى): التعديلات دُمجت مع النسخة الحالية
+        line += " — 🔀 دمج مع تعديلات أحدث: " + ", ".join(report["merged"])
+    return line
@@ -0,0 +1,129 @@
+"""
+🔐 سجل الجلسات النشطة في SQLite (WAL)
+بديل state.json: كل عملية تسجيل دخول هي معاملة واحدة (BEGIN IMMEDIATE) تحذف الجلسات
+المنتهية ثم تفحص المستخدم وعدد المقاعد ثم تحجز المقعد — بدون سباق بين الجلسات.
+انتهاء الجلسات يتم عند الحاجة (lazy) عبر فهرس على expires_at بدل مسح كل المستخدمين في كل تشغيل.
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from durable_io import read_json
+
+ACQUIRED = "ok"
+ALREADY_ACTIVE = "already-active"
+NO_SLOTS = "full"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    username   TEXT PRIMARY KEY,
+    login_time REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at);
+"""
+
+
+class SessionStore:
+    def __init__(self, db_path, duration, migrate_from=None):
+        """
+        duration: مدة الجلسة (timedelta)
+        migrate_from: مسار state.json القديم — تُنقل جلساته النشطة مرة واحدة عند إنشاء القاعدة
+        """
+        self.db_path = db_path
+        self.duration = duration.total_seconds() if isinstance(duration, timedelta) else float(duration)
+        self._local = threading.local()
+        is_new = not os.path.exists(db_path)
+        self._conn().executescript(_SCHEMA)
+        if is_new and migrate_from and os.path.exists(migrate_from):
+            self._migrate_state_json(migrate_from)
+
+    # -------------------------------
+    # 🔌 اتصال لكل خيط (كل جلسة Streamlit تعمل في خيط)
+    # -------------------------------
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """معاملة كتابة: BEGIN IMMEDIATE يأخذ قفل الكتابة من البداية فلا يتداخل حجزان"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _migrate_state_json(self, path):
+        try:
+            state = read_json(path)[0]
+        except Exception:
+            return
+        rows = []
+        for user, info in state.items():
+            if not info.get("active") or "login_time" not in info:
+                continue
+            try:
+                login = datetime.fromisoformat(info["login_time"]).timestamp()
+            except Exception:
+                continue
+            rows.append((user, login, login + self.duration))
+        with self._transaction() as conn:
+            conn.executemany("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)", rows)
+
+    # -------------------------------
+    # 🚪 الواجهة العامة
+    # -------------------------------
+    def acquire(self, username, max_active, bypass_limit=False, now=None):
+        """
+        حجز مقعد ذرياً. يرجع ACQUIRED أو ALREADY_ACTIVE أو NO_SLOTS.
+        bypass_limit (admin): يتخطى الحد ويجدد الجلسة إن كانت موجودة
+        """
+        now = time.time() if now is None else now
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+            if not bypass_limit:
+                if conn.execute("SELECT 1 FROM sessions WHERE username = ?", (username,)).fetchone():
+                    return ALREADY_ACTIVE
+                (active,) = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+                if active >= max_active:
+                    return NO_SLOTS
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (username, login_time, expires_at) VALUES (?, ?, ?)",
+                (username, now, now + self.duration),
+            )
+            return ACQUIRED
+
+    def release(self, username):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM sessions WHERE username = ?", (username,))
+
+    def active_users(self, now=None):
+        now = time.time() if now is None else now
+        rows = self._conn().execute(
+            "SELECT username FROM sessions WHERE expires_at > ? ORDER BY login_time", (now,)
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def remaining(self, username, now=None):
+        """الوقت المتبقي (timedelta) أو None إذا انتهت الجلسة أو غير موجودة"""
+        if not username:
+            return None
+        now = time.time() if now is None else now
+        row = self._conn().execute(
+            "SELECT expires_at FROM sessions WHERE username = ? AND expires_at > ?", (username, now)
+        ).fetchone()
+        if row is None:
+            return None
+        return timedelta(seconds=row[0] - now)
@@ -0,0 +1,712 @@
+"""
+📦 مخزن الشيتات
+قراءة ملف الإكسل مرة واحدة فقط لكل بصمة، ومنها تُشتق العروض:
+- نسخة object (كما هي في الخلايا) لواجهة التحرير — الإطار الأساسي لكل شيت
+- نسخة نصية للعرض وst.data_editor (تُبنى عند الطلب وتُحفظ لكل بصمة)
+- نسخة بأنواع مستنتجة (أرقام/تواريخ) لفحص الماكينات
+
+كما يحفظ نسخة عمودية (Arrow/Feather) من كل شيت في مجلد جانبي مفتاحه البصمة،
+حتى تقرأ العمليات الجديدة (إعادة تشغيل Streamlit / حاويات تشارك نفس المجلد)
+من الكاش بدل تحليل XLSX عبر openpyxl من جديد
+"""
+import datetime as dt
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from collections.abc import Mapping, MutableMapping
+
+import numpy as np
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+import metrics
+from row_patch import apply_patch, storage_patch
+
+# pyarrow اختياري: بدونه نقرأ من XLSX دائماً
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    ARROW_AVAILABLE = True
+except Exception:
+    ARROW_AVAILABLE = False
+
+CACHE_FORMAT_VERSION = 2  # 2: وسوم الوقت/التاريخ/المدة (نسخ 1 حفظتها نصاً)
+CACHE_KEEP_GENERATIONS = 2  # عدد نسخ الكاش (بصمات) التي نحتفظ بها
+MAX_STRING_VIEWS = 8  # النسخ النصية (للعرض والمحرر) المحفوظة لكل بصمة
+MAX_MEMO_RESULTS = 64  # نتائج الاستعلامات (جداول حالة الماكينات) المحفوظة لكل بصمة
+FINGERPRINT_CHUNK_SIZE = 1 << 20  # قراءة الملف على دفعات 1MB عند حساب الهاش
+
+
+# -------------------------------
+# 🆔 بصمة الملف (مشتركة على مستوى العملية)
+# -------------------------------
+_fingerprints = {}  # المسار -> ((mtime_ns, size, inode), الهاش)
+_fingerprint_lock = threading.Lock()
+
+
+def _stat_key(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def file_digest(path, chunk_size=FINGERPRINT_CHUNK_SIZE):
+    """هاش blake2b لمحتوى الملف بالقراءة على دفعات (بدون تحميل الملف كاملاً في الذاكرة)"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def file_fingerprint(path):
+    """
+    بصمة محتوى الملف
+    نثق في (mtime_ns, size, inode) إذا لم تتغير ونرجع الهاش المحفوظ،
+    وإلا نعيد حساب الهاش مرة واحدة فقط لكل العملية (كل الجلسات تشترك فيه)
+    """
+    key_path = os.path.abspath(path)
+    key = _stat_key(path)
+    cached = _fingerprints.get(key_path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    with _fingerprint_lock:
+        # ربما حسبتها جلسة أخرى أثناء انتظارنا
+        cached = _fingerprints.get(key_path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        digest = file_digest(path)
+        # لا نحفظ النتيجة إذا تغير الملف أثناء القراءة
+        if _stat_key(path) == key:
+            _fingerprints[key_path] = (key, digest)
+        return digest
+
+
+def infer_sheet_types(raw_df, columns=None):
+    """
+    استنتاج الأنواع من نسخة dtype=object بنفس منطق pd.read_excel الافتراضي
+    (نفس TextParser الذي يستخدمه read_excel داخلياً) بدون إعادة قراءة الملف
+    """
+    if raw_df.shape[1] == 0:
+        return pd.DataFrame()
+    header = list(raw_df.columns) if columns is None else list(columns)
+    rows = [header] + raw_df.values.tolist()
+    return TextParser(rows, header=0).read()
+
+
+# -------------------------------
+# 🗄 الكاش العمودي (Feather) بجانب ملف الإكسل
+# -------------------------------
+def _cache_key(fingerprint):
+    return re.sub(r"[^0-9A-Za-z._-]", "_", str(fingerprint))
+
+
+class _Unencodable(Exception):
+    """قيمة لا يمكن حفظها في الكاش واسترجاعها بنفس نوعها — الشيت يُقرأ من XLSX"""
+
+
+def _is_missing(v):
+    return v is None or v is pd.NaT or (isinstance(v, (float, np.floating)) and np.isnan(v))
+
+
+def _value_tag(v):
+    if isinstance(v, (bool, np.bool_)):
+        return "b"
+    if isinstance(v, (int, np.integer)):
+        return "i"
+    if isinstance(v, (float, np.floating)):
+        return "f"
+    if isinstance(v, str):
+        return "s"
+    if isinstance(v, dt.datetime):
+        # بمنطقة زمنية: نصاً حتى لا يحولها عمود timestamp إلى UTC
+        return "d" if v.tzinfo is None else "z"
+    if isinstance(v, dt.date):
+        return "a"
+    if isinstance(v, dt.time):
+        return "t"
+    if isinstance(v, dt.timedelta):
+        return "D"
+    raise _Unencodable(type(v).__name__)
+
+
+def _encode_column(values):
+    """
+    تحويل عمود object إلى مصفوفة arrow
+    عمود من نوع واحد يُحفظ بنوعه، والعمود المختلط يُحفظ نصاً مع وسم النوع لكل خلية
+    قيمة من نوع غير معروف ترفع _Unencodable (لا نحفظها نصاً فتعود بنوع مختلف)
+    """
+    plain = [None if _is_missing(v) else v for v in values]
+    tags = {_value_tag(v) for v in plain if v is not None}
+    if len(tags) == 1:
+        tag = next(iter(tags))
+        if tag == "i":
+            plain = [None if v is None else int(v) for v in plain]
+            if all(v is None or -2**63 <= v < 2**63 for v in plain):
+                return "i", pa.array(plain, type=pa.int64())
+        elif tag == "f":
+            return "f", pa.array(plain, type=pa.float64())
+        elif tag == "s":
+            return "s", pa.array(plain, type=pa.string())
+        elif tag == "b":
+            return "b", pa.array([None if v is None else bool(v) for v in plain], type=pa.bool_())
+        elif tag == "d":
+            return "d", pa.array(plain, type=pa.timestamp("us"))
+    if not tags:
+        return "s", pa.array(plain, type=pa.string())
+    encoded = []
+    for v in plain:
+        tag = None if v is None else _value_tag(v)
+        if v is None:
+            encoded.append(None)
+        elif tag in ("d", "z", "a", "t"):
+            encoded.append(f"{tag}:" + v.isoformat())
+        elif tag == "D":
+            encoded.append(f"D:{v // dt.timedelta(microseconds=1)}")
+        elif tag == "f":
+            encoded.append("f:" + repr(float(v)))
+        elif tag in ("i", "b"):
+            encoded.append(f"{tag}:{int(v)}")
+        else:
+            encoded.append("s:" + v)
+    return "tagged", pa.array(encoded, type=pa.string())
+
+
+def _decode_tagged(v):
+    tag, text = v[0], v[2:]
+    if tag in ("d", "z"):
+        return dt.datetime.fromisoformat(text)
+    if tag == "a":
+        return dt.date.fromisoformat(text)
+    if tag == "t":
+        return dt.time.fromisoformat(text)
+    if tag == "D":
+        return dt.timedelta(microseconds=int(text))
+    if tag == "f":
+        return float(text)
+    if tag == "i":
+        return int(text)
+    if tag == "b":
+        return bool(int(text))
+    return text
+
+
+def _decode_column(encoding, arr):
+    values = arr.to_pylist()
+    if encoding == "tagged":
+        values = [None if v is None else _decode_tagged(v) for v in values]
+    out = np.empty(len(values), dtype=object)
+    out[:] = [np.nan if v is None else v for v in values]
+    return out
+
+
+def write_columnar_cache(cache_dir, fingerprint, raw_sheets):
+    """
+    كتابة ملف Feather لكل شيت في cache_dir/<البصمة> (قبل تنظيف أسماء الأعمدة)
+    الكتابة تتم في مجلد مؤقت ثم إعادة تسمية، فلا يقرأ أحد كاشاً نصف مكتوب
+    قيمة لا تعود بنفس نوعها (_Unencodable) تلغي الكاش كله: القراءة تبقى من XLSX
+    """
+    if not ARROW_AVAILABLE or not cache_dir:
+        return False
+    target = os.path.join(cache_dir, _cache_key(fingerprint))
+    if os.path.isdir(target):
+        return True
+    tmp = os.path.join(cache_dir, f".tmp-{uuid.uuid4().hex}")
+    try:
+        os.makedirs(tmp)
+        manifest = {"version": CACHE_FORMAT_VERSION, "fingerprint": str(fingerprint), "sheets": []}
+        for i, (name, df) in enumerate(raw_sheets.items()):
+            entry = {"name": name, "columns": list(df.columns), "rows": len(df), "file": None, "encodings": []}
+            if df.shape[1] > 0:
+                arrays = []
+                for col in range(df.shape[1]):
+                    encoding, arr = _encode_column(df.iloc[:, col].tolist())
+                    entry["encodings"].append(encoding)
+                    arrays.append(arr)
+                table = pa.Table.from_arrays(arrays, names=[f"c{j}" for j in range(len(arrays))])
+                entry["file"] = f"sheet{i}.feather"
+                feather.write_feather(table, os.path.join(tmp, entry["file"]))
+            manifest["sheets"].append(entry)
+        with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        try:
+            os.rename(tmp, target)
+        except OSError:
+            # عملية أخرى كتبت نفس البصمة قبلنا
+            shutil.rmtree(tmp, ignore_errors=True)
+        _prune_columnar_cache(cache_dir, keep=target)
+        return True
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        return False
+
+
+def open_columnar_cache(cache_dir, fingerprint):
+    """
+    (أسماء الشيتات، load(name)) من الكاش العمودي لهذه البصمة، أو None إن لم يوجد:
+    الفهرس (manifest) فقط يُقرأ هنا، و load يقرأ ملف Feather الشيت المطلوب وحده
+    """
+    if not ARROW_AVAILABLE or not cache_dir:
+        return None
+    target = os.path.join(cache_dir, _cache_key(fingerprint))
+    manifest_path = os.path.join(target, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != CACHE_FORMAT_VERSION:
+            return None
+        entries = {entry["name"]: entry for entry in manifest["sheets"]}
+    except Exception:
+        return None
+
+    def load(name):
+        entry = entries[name]
+        if entry["file"] is None:
+            return pd.DataFrame(index=pd.RangeIndex(entry["rows"]))
+        table = feather.read_table(os.path.join(target, entry["file"]), memory_map=True)
+        data = {
+            j: _decode_column(enc, table.column(j))
+            for j, enc in enumerate(entry["encodings"])
+        }
+        df = pd.DataFrame(data, dtype=object)
+        df.columns = pd.Index(entry["columns"], dtype=object)
+        return df
+
+    return [entry["name"] for entry in manifest["sheets"]], load
+
+
+def read_columnar_cache(cache_dir, fingerprint):
+    """قراءة كل الشيتات من الكاش العمودي، أو None إن لم يوجد كاش لهذه البصمة"""
+    opened = open_columnar_cache(cache_dir, fingerprint)
+    if opened is None:
+        return None
+    names, load = opened
+    try:
+        return {name: load(name) for name in names}
+    except Exception:
+        return None
+
+
+def _prune_columnar_cache(cache_dir, keep):
+    """حذف أقدم نسخ الكاش والإبقاء على آخر CACHE_KEEP_GENERATIONS"""
+    try:
+        entries = [
+            os.path.join(cache_dir, d) for d in os.listdir(cache_dir)
+            if not d.startswith(".tmp-")
+        ]
+        entries = [d for d in entries if os.path.isdir(d) and d != keep]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for old in entries[CACHE_KEEP_GENERATIONS - 1:]:
+            shutil.rmtree(old, ignore_errors=True)
+    except Exception:
+        pass
+
+
+def _strip_columns(sheets):
+    for name, df in sheets.items():
+        df.columns = df.columns.str.strip()
+    return sheets
+
+
+class LazySheets(Mapping):
+    """
+    شيتات تُحمَّل عند أول طلب فقط عبر loader(name) (من قاعدة بيانات أو من XLSX شيتاً شيتاً)
+    الأسماء معروفة مسبقاً، فعرض القوائم لا يحمّل أي شيت.
+    max_loaded: أقصى عدد شيتات في الذاكرة (LRU) — الأقدم استخداماً يُحذف ويعاد تحميله عند الطلب
+    bulk_loader(): قراءة كل الشيتات دفعة واحدة (أسرع من شيت شيت عند الحاجة للكل)
+    """
+
+    def __init__(self, names, loader, bulk_loader=None, max_loaded=None):
+        self._names = list(names)
+        self._name_set = set(self._names)
+        self._loader = loader
+        self._bulk_loader = bulk_loader
+        self.max_loaded = max_loaded
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+        self.raw_columns = {}  # أسماء الأعمدة قبل التنظيف لكل شيت محمّل
+
+    def _store(self, name, df):
+        self.raw_columns[name] = list(df.columns)
+        df = _strip_columns({name: df})[name]
+        self._loaded[name] = df
+        return df
+
+    def __getitem__(self, name):
+        if name not in self._name_set:
+            raise KeyError(name)
+        with self._lock:
+            df = self._loaded.get(name)
+            if df is None:
+                with metrics.span("sheets.load_sheet"):
+                    df = self._store(name, self._loader(name))
+                if self.max_loaded is not None:
+                    while len(self._loaded) > self.max_loaded:
+                        self._loaded.popitem(last=False)
+            else:
+                self._loaded.move_to_end(name)
+        return df
+
+    def load_all(self):
+        """
+        تحميل كل الشيتات (تقرير الأسطول، الحفظ الكامل) — يرفع حد max_loaded لهذه النسخة
+        لأن كل الشيتات مطلوبة على أي حال
+        """
+        with self._lock:
+            self.max_loaded = None
+            missing = [n for n in self._names if n not in self._loaded]
+            if not missing:
+                return self
+            metrics.count("sheets.load_all")
+            if self._bulk_loader is not None:
+                everything = self._bulk_loader()
+                for name in missing:
+                    self._store(name, everything[name])
+            else:
+                for name in missing:
+                    self._store(name, self._loader(name))
+            # نفس ترتيب الشيتات في الملف
+            for name in self._names:
+                self._loaded.move_to_end(name)
+        return self
+
+    def items(self):
+        self.load_all()
+        return super().items()
+
+    def values(self):
+        self.load_all()
+        return super().values()
+
+    def __contains__(self, name):
+        return name in self._name_set
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def loaded(self):
+        """الشيتات المحمّلة حتى الآن فقط"""
+        with self._lock:
+            return dict(self._loaded)
+
+
+class EditSheets(MutableMapping):
+    """
+    عرض التحرير: القراءة من شيتات المخزن (الكسولة) والتعديلات في طبقة فوقها،
+    فلا يُنسخ ولا يُحمَّل شيت لم تطلبه التبويبات، ولا يتغير المخزن المشترك بين الجلسات.
+    إدراج الصفوف يُسجَّل في سجل منتظر (insert_row) ولا يبني الإطار إلا عند قراءة الشيت؛
+    طبقة التخزين التي تدعم الإدراج على مستوى الصف تقرأ السجل مباشرة (row_inserts)
+    وكذلك فرق المحرر (apply_patch / row_patch): الخلايا والصفوف المتأثرة فقط.
+    base_fingerprint: بصمة الشيتات التي بُنيت عليها التعديلات (الحفظ يدمج إذا تغيّر الملف بعدها)
+    """
+
+    def __init__(self, base, base_fingerprint=None):
+        self._base = base
+        self.base_fingerprint = base_fingerprint
+        self._changed = {}
+        self._removed = set()
+        self._inserts = {}  # الشيت -> [(الموضع، القيم بترتيب الأعمدة)]
+        self._patches = {}  # الشيت -> فرق المحرر على النسخة الأصلية (row_patch)
+
+    def __getitem__(self, name):
+        if name in self._changed:
+            return self._changed[name]
+        if name in self._removed:
+            raise KeyError(name)
+        if name in self._inserts:
+            # يُبنى مرة واحدة ويصبح الشيت المعدّل (السجل يبقى لطبقة التخزين)
+            self._changed[name] = self._apply_inserts(self._base[name], self._inserts[name])
+            return self._changed[name]
+        if name in self._patches:
+            self._changed[name] = apply_patch(self._base[name], self._patches[name])
+            return self._changed[name]
+        return self._base[name]
+
+    def __setitem__(self, name, df):
+        self._changed[name] = df
+        self._removed.discard(name)
+        self._inserts.pop(name, None)
+        self._patches.pop(name, None)
+
+    def __delitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+        self._changed.pop(name, None)
+        self._inserts.pop(name, None)
+        self._patches.pop(name, None)
+        self._removed.add(name)
+
+    @staticmethod
+    def _apply_inserts(df, inserts):
+        """كل الإدراجات في نسخة واحدة: ترتيب الصفوف النهائي ثم take"""
+        order = np.arange(len(df))
+        for i, (pos, _) in enumerate(inserts):
+            order = np.insert(order, pos, len(df) + i)
+        rows = pd.DataFrame([values for _, values in inserts], columns=df.columns, dtype=object)
+        return pd.concat([df, rows], ignore_index=True).take(order).reset_index(drop=True)
+
+    def insert_row(self, name, pos, row):
+        """
+        إدراج صف (dict: العمود -> القيمة) في الموضع pos من الشيت الحالي
+        الأعمدة غير الموجودة في row تبقى فارغة
+        """
+        self.insert_rows(name, [(pos, row)])
+
+    def insert_rows(self, name, inserts):
+        """
+        عدة إدراجات [(الموضع، الصف)] بالترتيب، كل موضع في الشيت بعد الإدراجات السابقة
+        (الشيت المستبدل يُبنى مرة واحدة لكل الدفعة لا مرة لكل صف)
+        """
+        if not inserts:
+            return
+        if name in self._patches:
+            # بعد فرق المحرر: الشيت يصبح نسخة مستبدلة
+            self[name] = self[name]
+        if name in self._changed and name not in self._inserts:
+            # الشيت استُبدل كاملاً: نعدّل النسخة المستبدلة
+            df = self._changed[name]
+            self._changed[name] = self._apply_inserts(
+                df, [(pos, [row.get(c, np.nan) for c in df.columns]) for pos, row in inserts])
+            return
+        columns = self._base[name].columns
+        self._inserts.setdefault(name, []).extend(
+            (pos, [row.get(c, np.nan) for c in columns]) for pos, row in inserts)
+        self._changed.pop(name, None)
+
+    def row_inserts(self, name):
+        """
+        [(الموضع، القيم)] إذا كانت كل تعديلات الشيت إدراجات فوق النسخة الأصلية، وإلا None
+        """
+        return list(self._inserts[name]) if name in self._inserts else None
+
+    def apply_patch(self, name, patch):
+        """
+        فرق المحرر (row_patch.editor_patch) على الشيت الحالي؛ فوق النسخة الأصلية يُحفظ الفرق نفسه
+        ولا يُبنى الإطار إلا عند قراءة الشيت
+        """
+        if name in self._changed or name in self._inserts or name in self._patches:
+            self[name] = apply_patch(self[name], patch)
+            return
+        self._patches[name] = patch
+        self._changed.pop(name, None)
+
+    def row_patch(self, name):
+        """
+        {"updated", "deleted", "appended"} بالقيم الكاملة للصفوف المتأثرة إذا كان كل تعديل الشيت
+        فرقاً واحداً فوق النسخة الأصلية، وإلا None
+        """
+        if name not in self._patches:
+            return None
+        return storage_patch(self._base[name], self._patches[name])
+
+    def pending(self, name):
+        """
+        تعديل الشيت فوق النسخة الأصلية (لدمج الحفظ المتزامن):
+        ("inserts", [(الموضع، القيم)]) أو ("patch", الفرق) أو ("replaced", الإطار) أو ("removed", None)
+        أو (None, None) إذا لم يتغير
+        """
+        if name in self._inserts:
+            return "inserts", list(self._inserts[name])
+        if name in self._patches:
+            return "patch", self._patches[name]
+        if name in self._changed:
+            return "replaced", self._changed[name]
+        if name in self._removed:
+            return "removed", None
+        return None, None
+
+    def base_sheet(self, name):
+        """الشيت كما كان عند التحميل (None إذا أُضيف في هذه الجلسة)"""
+        return self._base[name] if name in self._base else None
+
+    def __contains__(self, name):
+        return name in self._changed or (name not in self._removed and name in self._base)
+
+    def __iter__(self):
+        for name in self._base:
+            if name not in self._removed:
+                yield name
+        for name in self._changed:
+            if name not in self._base:
+                yield name
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def items(self):
+        # الحفظ الكامل يمر على كل الشيتات: نحمّلها دفعة واحدة بدل شيت شيت
+        load_all = getattr(self._base, "load_all", None)
+        if load_all is not None:
+            load_all()
+        return super().items()
+
+
+class _TypedSheets(Mapping):
+    """
+    عرض الأنواع المستنتجة: كل شيت يُحوَّل عند أول طلب فقط ثم يُحفظ
+    (فحص الماكينة يحتاج ServicePlan وشيت كارت واحد، لا كل الشيتات)
+    في الوضع الكسول المحفوظ محدود بنفس حد LazySheets.max_loaded (LRU)، وإلا تعود الذاكرة
+    لحجم الملف كله مع كل كارت يُفحص؛ load_all يرفع الحدين معاً
+    """
+
+    def __init__(self, store):
+        self._store = store
+        self._cache = OrderedDict()
+        # المخزن مشترك بين جلسات Streamlit (st.cache_resource) وكل جلسة في خيطها: ترتيب الـ LRU
+        # (move_to_end / popitem) لا يُعدَّل من خيطين معاً
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        with self._lock:
+            df = self._cache.get(name)
+            if df is not None:
+                self._cache.move_to_end(name)
+                return df
+        raw_df = self._store.raw[name]
+        df = infer_sheet_types(raw_df, self._store.raw_columns[name])
+        # نظف أسماء الأعمدة بعد الاستنتاج حتى نطابق read_excel تماماً
+        df = _strip_columns({name: df})[name]
+        max_loaded = getattr(self._store.raw, "max_loaded", None)
+        with self._lock:
+            df = self._cache.setdefault(name, df)
+            self._cache.move_to_end(name)
+            while max_loaded is not None and len(self._cache) > max_loaded:
+                self._cache.popitem(last=False)
+        return df
+
+    def __contains__(self, name):
+        # بدون تحويل (أو تحميل) الشيت
+        return name in self._store.raw
+
+    def __iter__(self):
+        return iter(self._store.raw)
+
+    def __len__(self):
+        return len(self._store.raw)
+
+    def derived(self, key, builder):
+        return self._store.derived(key, builder)
+
+    def memo(self, key, builder, max_entries=MAX_MEMO_RESULTS):
+        return self._store.memo(key, builder, max_entries)
+
+
+class SheetStore:
+    """نسخة واحدة من الشيتات لكل بصمة تُشتق منها كل العروض"""
+
+    def __init__(self, raw_sheets, max_views=MAX_STRING_VIEWS, fingerprint=None):
+        self.fingerprint = fingerprint
+        if isinstance(raw_sheets, LazySheets):
+            # تمتلئ عند تحميل كل شيت
+            self.raw_columns = raw_sheets.raw_columns
+            self.raw = raw_sheets
+        else:
+            self.raw_columns = {name: list(df.columns) for name, df in raw_sheets.items()}
+            self.raw = _strip_columns(raw_sheets)
+        self.typed = _TypedSheets(self)
+        self._derived = {}
+        self._derived_lock = threading.Lock()
+        self.max_views = max_views
+        self._views = OrderedDict()
+        self._views_lock = threading.Lock()
+        self._memo = OrderedDict()
+        self._memo_lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path, fingerprint=None, cache_dir=None):
+        """
+        قراءة كل الشيتات مرة واحدة (dtype=object)
+        إذا أُعطي cache_dir والبصمة: نقرأ من الكاش العمودي إن وجد، وإلا نحلل
+        XLSX ونكتب الكاش للمرات القادمة
+        """
+        use_cache = cache_dir is not None and fingerprint is not None
+        raw = read_columnar_cache(cache_dir, fingerprint) if use_cache else None
+        if raw is None:
+            raw = pd.read_excel(path, sheet_name=None, dtype=object)
+            if use_cache:
+                write_columnar_cache(cache_dir, fingerprint, raw)
+        return cls(raw, fingerprint=fingerprint)
+
+    def derived(self, key, builder):
+        """
+        بيانات مشتقة من الشيتات (فهارس الفترات، الكروت المجهزة...) تُبنى مرة
+        واحدة لكل بصمة وتعيش مع المخزن في نفس الكاش
+        """
+        if key in self._derived:
+            return self._derived[key]
+        value = builder()
+        with self._derived_lock:
+            return self._derived.setdefault(key, value)
+
+    def memo(self, key, builder, max_entries=MAX_MEMO_RESULTS):
+        """
+        نتائج استعلامات على هذه البصمة (جدول حالة ماكينة لكل كارت/أطنان/نطاق) في LRU محدود:
+        إعادة عرض نفس الاستعلام لا تلمس الشيتات، والبصمة الجديدة مخزن جديد بكاش فارغ.
+        النتيجة مشتركة بين الجلسات فلا تُعدَّل في مكانها (None نتيجة صالحة وتُحفظ أيضاً)
+        """
+        with self._memo_lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+        value = builder()
+        with self._memo_lock:
+            value = self._memo.setdefault(key, value)
+            self._memo.move_to_end(key)
+            while len(self._memo) > max_entries:
+                self._memo.popitem(last=False)
+        return value
+
+    def sheet_names(self):
+        return list(self.raw.keys())
+
+    def load_all(self):
+        """كل الشيتات في الذاكرة (دفعة واحدة في الوضع الكسول)"""
+        if isinstance(self.raw, LazySheets):
+            self.raw.load_all()
+        return self
+
+    def loaded_sheets(self):
+        """الشيتات الموجودة في الذاكرة (كلها في الوضع العادي، المحمّلة فقط في الوضع الكسول)"""
+        if isinstance(self.raw, LazySheets):
+            return self.raw.loaded()
+        return dict(self.raw)
+
+    def string_view(self, name):
+        """
+        نسخة نصية من الشيت (astype(str) بفهرس 0..n-1) للعرض وst.data_editor
+        تُبنى مرة واحدة لكل شيت في هذه البصمة وتُشارك بين الجلسات والتبويبات (LRU بحد max_views)،
+        لذلك لا تُعدَّل في مكانها: التعديل يبني إطاراً جديداً
+        """
+        with self._views_lock:
+            view = self._views.get(name)
+            if view is not None:
+                self._views.move_to_end(name)
+                return view
+        with metrics.span("sheets.string_view"):
+            view = self.raw[name].astype(str).reset_index(drop=True)
+        with self._views_lock:
+            view = self._views.setdefault(name, view)
+            while len(self._views) > self.max_views:
+                self._views.popitem(last=False)
+        return view
+
+    def typed_sheets(self):
+        """العرض المستخدم في check_machine_status (يُحوَّل عند الطلب)"""
+        return self.typed
+
+    def edit_sheets(self):
+        """
+        العرض المستخدم في تبويبات التحرير (dtype=object)
+        طبقة فوق الشيتات: التبويبات تستبدل الشيتات ولا تعدلها في مكانها،
+        وكل تبويب يحمّل الشيت المختار فقط
+        """
+        return EditSheets(self.raw, base_fingerprint=self.fingerprint)
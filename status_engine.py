@@ -0,0 +1,547 @@
+"""
+⚙ محرك حالة الصيانة
+دوال نقية (بدون Streamlit) تحسب جدول "تم / لم يتم" لكل شريحة من ServicePlan
+مقابل سجل شيت الكارت، عن طريق ربط الفترات مرة واحدة وأقنعة منطقية بدل iterrows
+"""
+import re
+import warnings
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+# خيارات نطاق العرض (نفس النصوص الظاهرة في الواجهة)
+VIEW_CURRENT = "الشريحة الحالية فقط"
+VIEW_LOWER = "كل الشرائح الأقل"
+VIEW_HIGHER = "كل الشرائح الأعلى"
+VIEW_CUSTOM = "نطاق مخصص"
+VIEW_ALL = "كل الشرائح"
+VIEW_OPTIONS = (VIEW_CURRENT, VIEW_LOWER, VIEW_HIGHER, VIEW_CUSTOM, VIEW_ALL)
+
+# أعمدة في شيت الكارت ليست أسماء خدمات
+IGNORE_COLS = {"card", "Tones", "Min_Tones", "Max_Tones", "Date", "Other", "Servised by", "Event", "Correction"}
+# أعمدة نعرض منها آخر قيمة غير فارغة داخل الشريحة
+LAST_VALUE_COLS = ("Event", "Correction", "Servised by")
+EMPTY_MARKERS = ["nan", "none", ""]
+NORMALIZE_CACHE_SIZE = 4096  # أقصى عدد أسماء خدمات محفوظة بعد التطبيع
+NO_SERVICE = "no_service"  # قيمة Service لشريحة لا تحتاج خدمة (لا تظهر في تقرير الأسطول)
+STATUS_COLUMNS = [
+    "Card Number", "Min_Tons", "Max_Tons", "Service Needed", "Service Done", "Service Didn't Done",
+    "Event", "Correction", "Servised by", "Date"
+]
+FLEET_COLUMNS = [
+    "Card Number", "Current_Tons", "Min_Tons", "Max_Tons", "Service Needed", "Service Done",
+    "Service Didn't Done", "Event", "Correction", "Servised by", "Date"
+]
+
+
+# -------------------------------
+# 🧰 دوال مساعدة للمعالجة والنصوص
+# -------------------------------
+_NAME_JUNK_RE = re.compile(r"[^0-9a-zA-Z\u0600-\u06FF\+\s_/.-]")
+_SPACES_RE = re.compile(r"\s+")
+_SERVICE_SPLIT_RE = re.compile(r"\+|,|\n|;")
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _normalize_text(s):
+    s = s.replace("\n", "+")
+    s = _NAME_JUNK_RE.sub(" ", s)
+    return _SPACES_RE.sub(" ", s).strip().lower()
+
+
+def normalize_name(s):
+    if s is None: return ""
+    return _normalize_text(str(s))
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _split_services(needed_service_str):
+    parts = _SERVICE_SPLIT_RE.split(needed_service_str)
+    return tuple(p.strip() for p in parts if p.strip() != "")
+
+
+def split_needed_services(needed_service_str):
+    if not isinstance(needed_service_str, str) or needed_service_str.strip() == "":
+        return []
+    return list(_split_services(needed_service_str))
+
+
+def plan_services(service_plan_df):
+    """
+    الخدمات المطلوبة لكل صف في ServicePlan (الأجزاء + أسماؤها بعد التطبيع)
+    محسوبة مرة واحدة لكل بصمة ومفتاحها رقم الصف (index)
+    الصف بقيمة NO_SERVICE يبقى خدمة مطلوبة كما كُتبت (جدول الحالة يعرضها)، وتقرير الأسطول وحده يستبعدها
+    """
+    if not service_plan_df.index.is_unique:
+        return None
+    services = service_plan_df["Service"] if "Service" in service_plan_df.columns else pd.Series("", index=service_plan_df.index)
+    needed = {}
+    for label, raw in services.items():
+        parts = split_needed_services(raw)
+        needed[label] = (parts, [normalize_name(p) for p in parts])
+    return needed
+
+
+# -------------------------------
+# 🔎 فهرس الفترات (بحث ثنائي بدل المسح الكامل)
+# -------------------------------
+def build_interval_index(min_values, max_values):
+    """
+    فهرس فترات [Min, Max] مرتب بالحد الأدنى ومرة بالحد الأعلى
+    الحد الفارغ (NaN) لا يطابق أي مقارنة فيُستبعد من الترتيب الخاص به
+    """
+    lo = np.asarray(min_values, dtype=float)
+    hi = np.asarray(max_values, dtype=float)
+    with_min = np.flatnonzero(~np.isnan(lo))
+    with_max = np.flatnonzero(~np.isnan(hi))
+    by_min = with_min[np.argsort(lo[with_min], kind="stable")]
+    by_max = with_max[np.argsort(hi[with_max], kind="stable")]
+    max_in_min_order = hi[by_min]
+    return {
+        "by_min": by_min,
+        "min_sorted": lo[by_min],
+        "max_in_min_order": max_in_min_order,
+        "by_max": by_max,
+        "max_sorted": hi[by_max],
+        # الشرائح المتتالية غير المتداخلة (الحالة المعتادة): الحد الأعلى مرتب أيضاً
+        "monotone": bool(np.all(np.diff(max_in_min_order) >= 0)),
+    }
+
+
+_NO_ROWS = np.array([], dtype=np.intp)
+
+
+def index_overlapping(index, lo, hi):
+    """مواضع الفترات التي تتداخل مع [lo, hi] أي Min <= hi و Max >= lo (بترتيبها الأصلي)"""
+    if pd.isna(lo) or pd.isna(hi):
+        # أي مقارنة مع NaN خاطئة (مثل القناع القديم)، و searchsorted يضع NaN بعد كل القيم
+        return _NO_ROWS
+    end = np.searchsorted(index["min_sorted"], hi, side="right")
+    if index["monotone"]:
+        start = np.searchsorted(index["max_in_min_order"][:end], lo, side="left")
+        found = index["by_min"][start:end]
+    else:
+        found = index["by_min"][:end][index["max_in_min_order"][:end] >= lo]
+    return np.sort(found)
+
+
+def index_max_at_most(index, value):
+    """مواضع الفترات التي Max <= value"""
+    if pd.isna(value):
+        return _NO_ROWS
+    return np.sort(index["by_max"][:np.searchsorted(index["max_sorted"], value, side="right")])
+
+
+def index_min_at_most(index, value):
+    """مواضع الفترات التي Min <= value"""
+    if pd.isna(value):
+        return _NO_ROWS
+    return np.sort(index["by_min"][:np.searchsorted(index["min_sorted"], value, side="right")])
+
+
+def index_min_at_least(index, value):
+    """مواضع الفترات التي Min >= value"""
+    if pd.isna(value):
+        return _NO_ROWS
+    return np.sort(index["by_min"][np.searchsorted(index["min_sorted"], value, side="left"):])
+
+
+def index_within(index, lo, hi):
+    """مواضع الفترات المحتواة داخل [lo, hi] أي Min >= lo و Max <= hi"""
+    if pd.isna(lo) or pd.isna(hi):
+        return _NO_ROWS
+    start = np.searchsorted(index["min_sorted"], lo, side="left")
+    if index["monotone"]:
+        end = start + np.searchsorted(index["max_in_min_order"][start:], hi, side="right")
+        found = index["by_min"][start:end]
+    else:
+        found = index["by_min"][start:][index["max_in_min_order"][start:] <= hi]
+    return np.sort(found)
+
+
+def plan_index(service_plan_df):
+    return build_interval_index(
+        pd.to_numeric(service_plan_df["Min_Tones"], errors="coerce"),
+        pd.to_numeric(service_plan_df["Max_Tones"], errors="coerce"),
+    )
+
+
+def sheet_artifact(all_sheets, key, builder):
+    """
+    بيانات مشتقة من الشيتات (فهارس/كروت مجهزة) محفوظة مع الشيتات لكل بصمة
+    إذا كان all_sheets قاموساً عادياً (بدون كاش) تُبنى في كل مرة
+    """
+    derived = getattr(all_sheets, "derived", None)
+    if derived is None:
+        return builder()
+    return derived(key, builder)
+
+
+def precompute_service_names(all_sheets, sheet_columns):
+    """
+    عند تحميل الملف: تقسيم وتطبيع خدمات ServicePlan وتطبيع أسماء أعمدة
+    كل شيت Card مرة واحدة، فلا يعاد حسابها في كل فحص
+    sheet_columns: {اسم الشيت: أعمدته} (بدون الحاجة لتحويل أنواع كل الشيتات)
+    """
+    if "ServicePlan" in all_sheets:
+        plan_df = all_sheets["ServicePlan"]
+        sheet_artifact(all_sheets, "plan_services", lambda: plan_services(plan_df))
+    for name, columns in sheet_columns.items():
+        if str(name).startswith("Card"):
+            for c in columns:
+                if c not in IGNORE_COLS:
+                    normalize_name(c)
+
+
+# -------------------------------
+# 🎚 اختيار الشرائح حسب نطاق العرض
+# -------------------------------
+def select_slice_rows(service_plan_df, view_option, current_tons, min_range=None, max_range=None, index=None):
+    """مواضع (iloc) الشرائح المختارة في ServicePlan بالترتيب"""
+    if index is None:
+        index = plan_index(service_plan_df)
+    if view_option == VIEW_CURRENT:
+        return index_overlapping(index, current_tons, current_tons)
+    if view_option == VIEW_LOWER:
+        return index_max_at_most(index, current_tons)
+    if view_option == VIEW_HIGHER:
+        return index_min_at_least(index, current_tons)
+    if view_option == VIEW_CUSTOM:
+        return index_within(index, min_range, max_range)
+    return np.arange(len(service_plan_df))
+
+
+def select_slices(service_plan_df, view_option, current_tons, min_range=None, max_range=None, index=None):
+    if view_option not in (VIEW_CURRENT, VIEW_LOWER, VIEW_HIGHER, VIEW_CUSTOM):
+        return service_plan_df.copy()
+    return service_plan_df.iloc[select_slice_rows(service_plan_df, view_option, current_tons, min_range, max_range,
+                                                  index)]
+
+
+# -------------------------------
+# 🗂 تجهيز سجل الكارت (مرة واحدة لكل شيت)
+# -------------------------------
+def _numeric_bounds(card_df, col):
+    if col not in card_df.columns:
+        return np.zeros(len(card_df))
+    return pd.to_numeric(card_df[col], errors="coerce").fillna(0).to_numpy(dtype=float)
+
+
+_BLANK_TYPES = {float, np.float64, np.float32, type(None)}  # الفراغ الذي نصه nan/None
+
+
+def _filled_matrix(block):
+    """
+    الخلية تعتبر "تم" إذا لم يكن نصها str(v) فارغاً أو nan/none (نفس شرط الحلقة القديمة حرفياً):
+    NaN و None ليست "تم"، أما NaT و pd.NA (نصهما "NaT" و "<NA>") فتعتبرها الحلقة "تم"
+    تُحسب لكل أعمدة الخدمات دفعة واحدة على مصفوفة numpy واحدة
+    """
+    values = block.to_numpy(dtype=object)
+    missing = pd.isna(values)
+    filled = ~missing
+    if filled.any():
+        filled[filled] = [str(v).strip().lower() not in EMPTY_MARKERS for v in values[filled]]
+    # الفراغ في الأعمدة العددية NaN دائماً؛ غيرها قد يكون NaT أو pd.NA (النص فقط لهذه)
+    for j, dtype in enumerate(block.dtypes):
+        if dtype.kind == "f":
+            continue
+        rows = np.flatnonzero(missing[:, j])
+        if len(rows) and not set(map(type, values[rows, j])) <= _BLANK_TYPES:
+            filled[rows, j] = [str(v).strip().lower() not in EMPTY_MARKERS for v in values[rows, j]]
+    return filled
+
+
+# قيم تتخطاها pandas عند استنتاج صيغة التاريخ من أول قيمة (tslib.first_non_null)
+_DATE_INFER_SKIP = frozenset({"", "NaT", "nat", "NAT", "nan", "NaN", "NAN", "now", "today"})
+MIXED_DATE_FORMAT = "mixed"  # لا صيغة مستنتجة: pandas تحلل كل قيمة منفردة (dateutil)
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _guess_date_format(text):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # تحذير dayfirst مع صيغة ISO
+        return guess_datetime_format(text, dayfirst=True) or MIXED_DATE_FORMAT
+
+
+def parse_service_dates(series):
+    """
+    عمود Date (بصيغة 20\\5\\2025) كما تحلله الحلقة القديمة لكل شريحة:
+    pd.to_datetime(dayfirst=True) على صفوف الشريحة يستنتج صيغة واحدة من أول قيمة غير فارغة فيها
+    ويحلل بها الكل (ما لا يطابقها NaT)، فالنتيجة تعتمد على أول صف في الشريحة.
+    يرجع (صيغة كل صف أو None للقيم التي يتخطاها الاستنتاج، نصوص العمود بعد استبدال \\ بـ /)؛
+    التحليل نفسه لكل صيغة مرة واحدة للعمود كله (dates_for_format)
+    """
+    cleaned = series.astype(str).str.replace("\\", "/", regex=False)
+    # pandas 3: astype(str) يبقي الفراغ NaN (وفي الإصدارات الأقدم يصبح "nan")
+    formats = [
+        _guess_date_format(text) if isinstance(text, str) and text not in _DATE_INFER_SKIP else None
+        for text in cleaned.tolist()
+    ]
+    return formats, cleaned
+
+
+def dates_for_format(card, fmt):
+    """
+    العمود كله محللاً بالصيغة fmt (محفوظ في الكارت المجهز): (مواضع التواريخ الصالحة، القيم)
+    أو None إذا فشل التحليل (الحلقة القديمة تعرض "-" للشريحة)
+    """
+    parsed = card["date_parses"]
+    if fmt not in parsed:
+        try:
+            if fmt == MIXED_DATE_FORMAT:
+                dates = pd.to_datetime(card["date_texts"], errors="coerce", dayfirst=True, format=fmt)
+            else:
+                dates = pd.to_datetime(card["date_texts"], errors="coerce", format=fmt)
+            parsed[fmt] = (dates.notna().to_numpy(), dates)
+        except Exception:
+            parsed[fmt] = None
+    return parsed[fmt]
+
+
+def _last_date(card, pos):
+    """آخر تاريخ في صفوف pos (بترتيبها) بصيغة أول صف فيها — "-" إذا لا يوجد"""
+    fmt = next((card["date_formats"][p] for p in pos if card["date_formats"][p] is not None), MIXED_DATE_FORMAT)
+    parsed = dates_for_format(card, fmt)
+    if parsed is None:
+        return "-"
+    dated, dates = parsed
+    hit = pos[dated[pos]]
+    if not len(hit):
+        return "-"
+    try:
+        return dates.iloc[hit].max().strftime("%d/%m/%Y")
+    except Exception:
+        return "-"
+
+
+def prepare_card(card_df):
+    """تحويل شيت الكارت إلى مصفوفات numpy جاهزة لربط الفترات"""
+    service_cols = [c for c in card_df.columns if c not in IGNORE_COLS]
+    filled = _filled_matrix(card_df[service_cols])
+
+    date_formats, date_texts = None, None
+    if "Date" in card_df.columns:
+        date_formats, date_texts = parse_service_dates(card_df["Date"])
+
+    last_values = {}
+    for col in LAST_VALUE_COLS:
+        if col in card_df.columns:
+            values = card_df[col].to_numpy(dtype=object)
+            last_values[col] = (values, ~pd.isna(values))
+
+    row_min = _numeric_bounds(card_df, "Min_Tones")
+    row_max = _numeric_bounds(card_df, "Max_Tones")
+    tons = None
+    if "Tones" in card_df.columns:
+        tons = pd.to_numeric(card_df["Tones"], errors="coerce").to_numpy(dtype=float)
+    return {
+        "rows": len(card_df),
+        "index": build_interval_index(row_min, row_max),
+        "service_cols": service_cols,
+        "service_norms": {c: normalize_name(c) for c in service_cols},
+        "filled": filled,
+        "date_formats": date_formats,
+        "date_texts": date_texts,
+        "date_parses": {},  # الصيغة -> تحليل العمود كله (dates_for_format)
+        "tons": tons,
+        "last_values": last_values,
+    }
+
+
+# -------------------------------
+# 📋 بناء جدول النتائج
+# -------------------------------
+def build_status_table(card_num, selected_slices, card, needed=None, with_max_tons=False):
+    """
+    جدول الحالة لكل شريحة مختارة (نفس الجدول المعروض في الواجهة)
+    card: شيت الكارت (DataFrame) أو ناتج prepare_card
+    needed: ناتج plan_services (اختياري) لتجنب إعادة تقسيم وتطبيع نصوص Service
+    with_max_tons: عمود إضافي Max_Done_Tons (أعلى Tones مسجل في الشريحة) لملخص الكارت
+    """
+    if isinstance(card, pd.DataFrame):
+        card = prepare_card(card)
+
+    slice_min = selected_slices["Min_Tones"].tolist()
+    slice_max = selected_slices["Max_Tones"].tolist()
+    if needed is not None:
+        needed_per_slice = [needed[label] for label in selected_slices.index]
+    else:
+        if "Service" in selected_slices.columns:
+            services = selected_slices["Service"].tolist()
+        else:
+            services = [""] * len(selected_slices)
+        needed_per_slice = []
+        for raw in services:
+            parts = split_needed_services(raw)
+            needed_per_slice.append((parts, [normalize_name(p) for p in parts]))
+
+    # ربط الفترات: صفوف الكارت المتداخلة مع كل شريحة عبر البحث الثنائي في الفهرس
+    done_services_per_slice, last_dates, max_tons = [], [], []
+    last_values = {col: [] for col in LAST_VALUE_COLS}
+    service_cols = card["service_cols"]
+    tons = card.get("tons") if with_max_tons else None
+    for lo, hi in zip(slice_min, slice_max):
+        pos = index_overlapping(card["index"], lo, hi)
+        done = card["filled"][pos].any(axis=0) if len(pos) else ()
+        done_services_per_slice.append(sorted(c for c, d in zip(service_cols, done) if d))
+        if tons is not None:
+            hit = tons[pos]
+            hit = hit[~np.isnan(hit)]
+            max_tons.append(hit.max() if len(hit) else np.nan)
+
+        last_dates.append(_last_date(card, pos) if card["date_formats"] is not None and len(pos) else "-")
+
+        for col in LAST_VALUE_COLS:
+            out = "-"
+            if col in card["last_values"] and len(pos):
+                values, notna = card["last_values"][col]
+                hit = pos[notna[pos]]
+                if len(hit):
+                    out = str(values[hit[-1]])
+            last_values[col].append(out)
+
+    needed_text, done_text, not_done_text = [], [], []
+    for i in range(len(slice_min)):
+        needed_parts, needed_norm = needed_per_slice[i]
+        done_services = done_services_per_slice[i]
+        done_norm = {card["service_norms"][c] for c in done_services}
+        not_done = [orig for orig, n in zip(needed_parts, needed_norm) if n not in done_norm]
+        needed_text.append(" + ".join(needed_parts) if needed_parts else "-")
+        done_text.append(", ".join(done_services) if done_services else "-")
+        not_done_text.append(", ".join(not_done) if not_done else "-")
+
+    # كل صف فيه رقم الكارت ونصوص الخدمات، فلا توجد صفوف فارغة بالكامل
+    columns = {
+        "Card Number": [card_num] * len(slice_min),
+        "Min_Tons": slice_min,
+        "Max_Tons": slice_max,
+        "Service Needed": needed_text,
+        "Service Done": done_text,
+        "Service Didn't Done": not_done_text,
+        "Event": last_values["Event"],
+        "Correction": last_values["Correction"],
+        "Servised by": last_values["Servised by"],
+        "Date": last_dates,
+    }
+    if tons is not None or with_max_tons:
+        columns["Max_Done_Tons"] = max_tons if tons is not None else [np.nan] * len(slice_min)
+    return pd.DataFrame(columns)
+
+
+def machine_status_table(card_num, current_tons, all_sheets, view_option=VIEW_CURRENT, min_range=None, max_range=None):
+    """
+    جدول الحالة لماكينة واحدة من قاموس الشيتات: صفوف الشرائح المختارة من ملخص الكارت
+    يرجع None إذا لم توجد شرائح مطابقة للنطاق
+    """
+    plan_df = all_sheets["ServicePlan"]
+    index = sheet_artifact(all_sheets, "plan_index", lambda: plan_index(plan_df))
+    rows = select_slice_rows(plan_df, view_option, current_tons, min_range, max_range, index=index)
+    if not len(rows):
+        return None
+    return summary_rows(card_summary(all_sheets, card_num), rows)
+
+
+def cached_status_table(card_num, current_tons, all_sheets, view_option=VIEW_CURRENT, min_range=None,
+                        max_range=None, max_entries=None):
+    """
+    machine_status_table محفوظاً مع الشيتات (memo لكل بصمة، LRU محدود) بمفتاح
+    (الكارت، الأطنان، نطاق العرض، والحدود في النطاق المخصص فقط): إعادة التشغيل بنفس الاستعلام
+    ترجع نفس الجدول بدون حساب. إذا كان all_sheets قاموساً عادياً يُحسب في كل مرة
+    """
+    memo = getattr(all_sheets, "memo", None)
+
+    def build():
+        return machine_status_table(card_num, current_tons, all_sheets, view_option, min_range, max_range)
+
+    if memo is None:
+        return build()
+    key = status_table_key(card_num, current_tons, view_option, min_range, max_range)
+    return memo(key, build) if max_entries is None else memo(key, build, max_entries)
+
+
+def status_table_key(card_num, current_tons, view_option, min_range=None, max_range=None):
+    """مفتاح استعلام جدول الحالة داخل البصمة (والحدود في النطاق المخصص فقط)"""
+    bounds = (min_range, max_range) if view_option == VIEW_CUSTOM else None
+    return ("status_table", card_num, current_tons, view_option, bounds)
+
+
+def prepared_card(all_sheets, card_num):
+    """شيت الكارت مجهزاً (مصفوفات + فهرس فترات) ومحفوظاً مع الشيتات"""
+    name = f"Card{card_num}"
+    return sheet_artifact(all_sheets, ("card", name), lambda: prepare_card(all_sheets[name]))
+
+
+# -------------------------------
+# 🧾 ملخص الكارت لكل شرائح الخطة (مرة واحدة لكل بصمة)
+# -------------------------------
+def build_card_summary(card_num, plan_df, card, needed=None):
+    """
+    صف لكل شريحة في ServicePlan (بنفس ترتيبها): أعمدة جدول الحالة (الخدمات المطلوبة/المنفذة/المتبقية،
+    آخر حدث وتصحيح وفني وتاريخ) + أعلى طن مسجل في الشريحة (Max_Done_Tons)
+    الشرائح مستقلة عن بعضها، فجدول أي نطاق عرض = صفوف شرائحه من هذا الملخص
+    """
+    return build_status_table(card_num, plan_df, card, needed, with_max_tons=True)
+
+
+def card_summary(all_sheets, card_num):
+    """ملخص الكارت محفوظاً مع الشيتات (يُبنى عند أول استعلام للكارت، أو للكل مع تقرير الأسطول)"""
+    plan_df = all_sheets["ServicePlan"]
+    needed = sheet_artifact(all_sheets, "plan_services", lambda: plan_services(plan_df))
+    return sheet_artifact(
+        all_sheets, ("summary", f"Card{card_num}"),
+        lambda: build_card_summary(card_num, plan_df, prepared_card(all_sheets, card_num), needed),
+    )
+
+
+def summary_rows(summary, rows):
+    """جدول الحالة لشرائح rows (مواضع في ServicePlan) — نفس أعمدة build_status_table"""
+    # أعمدة العرض أولاً و Max_Done_Tons آخرها: قص بالموضع أسرع من الاختيار بالأسماء
+    return summary.take(rows).iloc[:, :len(STATUS_COLUMNS)].reset_index(drop=True)
+
+
+# -------------------------------
+# 🏭 تقرير كل الماكينات (الأسطول)
+# -------------------------------
+def fleet_tonnage(machine_df):
+    """قراءة (رقم الكارت، الأطنان الحالية) من شيت Machine مع تجاهل الصفوف الناقصة"""
+    cards = pd.to_numeric(machine_df.get("card"), errors="coerce")
+    tons = pd.to_numeric(machine_df.get("Current_Tones"), errors="coerce")
+    valid = cards.notna() & tons.notna()
+    return [(int(c), float(t)) for c, t in zip(cards[valid], tons[valid])]
+
+
+def _card_status(all_sheets, index, card_num, current_tons):
+    # الخدمات المتأخرة = ما لم يتم في الشريحة الحالية وكل الشرائح التي قبلها
+    rows = index_min_at_most(index, current_tons)
+    if not len(rows):
+        return None
+    table = summary_rows(card_summary(all_sheets, card_num), rows)
+    table.insert(1, "Current_Tons", current_tons)
+    return table
+
+
+def fleet_status_report(all_sheets):
+    """
+    فحص كل كروت Card{N} في دفعة واحدة بالأطنان الحالية من شيت Machine
+    يرجع (جدول الخدمات المتأخرة، قائمة الكروت التي ليس لها شيت)
+    """
+    plan_df = all_sheets["ServicePlan"]
+    index = sheet_artifact(all_sheets, "plan_index", lambda: plan_index(plan_df))
+    sheet_artifact(all_sheets, "plan_services", lambda: plan_services(plan_df))
+    tables, missing = [], []
+    for card_num, current_tons in fleet_tonnage(all_sheets["Machine"]):
+        if f"Card{card_num}" not in all_sheets:
+            missing.append(card_num)
+            continue
+        table = _card_status(all_sheets, index, card_num, current_tons)
+        if table is not None:
+            tables.append(table)
+
+    if not tables:
+        return pd.DataFrame(columns=FLEET_COLUMNS), missing
+    report = pd.concat(tables, ignore_index=True)[FLEET_COLUMNS]
+    pending = report["Service Didn't Done"]
+    report = report[(pending != "-") & (pending.str.lower() != NO_SERVICE)]
+    return report.sort_values(["Card Number", "Min_Tons"], kind="stable").reset_index(drop=True), missing
@@ -0,0 +1,559 @@
+"""
+🗃 طبقة التخزين (قابلة للتبديل عبر CMMS_STORAGE)
+- ExcelBackend: الوضع الحالي — ملف XLSX هو قاعدة البيانات (SheetStore + save_engine)؛
+  أسماء الشيتات من فهرس الأرشيف (أو فهرس الكاش العمودي)، وكل شيت يُقرأ عند أول طلب
+- SQLiteBackend: الشيتات في قاعدة SQLite (صف لكل سجل بمفتاح (الشيت، الموضع))؛
+  الشيت يُقرأ عند أول طلب فقط، والحفظ يعيد كتابة صفوف الشيتات المعدّلة فقط،
+  وملف XLSX يصبح صيغة تصدير (عند الطلب أو قبل الرفع إلى GitHub) يُرقَّع فيها ما تغيّر فقط
+
+الواجهة المشتركة: fingerprint(), load_store(fingerprint), save(sheets, dirty, base),
+has_pending_changes(), export_xlsx()
+
+الحفظ المتزامن: base هي البصمة التي بُنيت عليها التعديلات (EditSheets.base_fingerprint).
+إذا تغيّرت البصمة منذ ذلك الحين تُعاد تعديلات الشيتات dirty فوق النسخة الحالية (merge_engine)
+بدل الكتابة فوقها، والتعارض الحقيقي يرفع SaveConflict ولا يُكتب شيء
+"""
+import datetime as dt
+import hashlib
+import io
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import zipfile
+from contextlib import contextmanager
+from xml.etree import ElementTree as ET
+
+import numpy as np
+import pandas as pd
+
+from merge_engine import SaveConflict, rebase_edits
+from save_engine import PatchNotPossible, read_single_sheet, save_workbook, workbook_sheet_names
+from sheet_store import (
+    LazySheets, SheetStore, file_fingerprint, open_columnar_cache, read_columnar_cache, write_columnar_cache,
+)
+
+STORAGE_EXCEL = "excel"
+STORAGE_SQLITE = "sqlite"
+SAVE_MODE_SQLITE = "sqlite"
+
+# كل إدراج صف يزيح ترقيم ما بعده؛ الدفعات الأكبر من هذا تعيد كتابة الشيت مرة واحدة
+MAX_ROW_INSERTS = 64
+# محاولات إعادة الدمج إذا كتبت عملية أخرى على نفس القاعدة أثناء الدمج
+MAX_REBASE_ATTEMPTS = 3
+
+
+def _rebase_stale(backend, sheets, dirty, base, current):
+    """
+    (الشيتات للحفظ، الشيتات التي احتاجت دمجاً): كما هي إذا لم تتغير البصمة منذ base،
+    وإلا تعديلات dirty فوق النسخة الحالية. الحفظ الكامل (dirty=None) فوق نسخة أحدث = تعارض
+    """
+    if base is None or base == current:
+        return sheets, []
+    if dirty is None or not hasattr(sheets, "pending"):
+        raise SaveConflict([("*", f"workbook changed since {base}")])
+    store = backend.load_store(current)
+    if store is None:
+        raise SaveConflict([("*", "workbook removed since it was loaded")])
+    return rebase_edits(sheets, dirty, store)
+
+
+# -------------------------------
+# 📄 الوضع الحالي: ملف XLSX
+# -------------------------------
+class ExcelBackend:
+    name = STORAGE_EXCEL
+
+    def __init__(self, xlsx_path, cache_dir=None, generations=0, max_loaded=None):
+        self.xlsx_path = xlsx_path
+        self.cache_dir = cache_dir
+        self.generations = generations
+        self.max_loaded = max_loaded
+        self._save_lock = threading.Lock()  # فحص البصمة والكتابة معاً
+
+    def fingerprint(self):
+        if not os.path.exists(self.xlsx_path):
+            return "initial"
+        return file_fingerprint(self.xlsx_path)
+
+    def load_store(self, fingerprint):
+        """
+        مخزن كسول: كل شيت يُحلَّل عند أول طلب فقط (بحد max_loaded)، من ملف Feather الخاص به
+        إن وجد كاش عمودي لهذه البصمة، وإلا من محتوى الملف المقروء مرة واحدة (bytes، فالشيتات
+        المتأخرة تبقى من نفس النسخة حتى لو استُبدل الملف)
+        """
+        if not os.path.exists(self.xlsx_path):
+            return None
+        use_cache = self.cache_dir is not None and fingerprint is not None
+        cached = open_columnar_cache(self.cache_dir, fingerprint) if use_cache else None
+        if cached is not None:
+            return self._cached_store(fingerprint, *cached)
+        with open(self.xlsx_path, "rb") as f:
+            data = f.read()
+        try:
+            names = workbook_sheet_names(data)
+        except (PatchNotPossible, zipfile.BadZipFile, KeyError, ET.ParseError):
+            return SheetStore.from_file(self.xlsx_path, fingerprint=fingerprint, cache_dir=self.cache_dir)
+
+        def read_all():
+            sheets = pd.read_excel(io.BytesIO(data), sheet_name=None, dtype=object)
+            if use_cache:
+                write_columnar_cache(self.cache_dir, fingerprint, sheets)
+            return sheets
+
+        return SheetStore(LazySheets(names, lambda name: read_single_sheet(data, name),
+                                     bulk_loader=read_all, max_loaded=self.max_loaded),
+                          fingerprint=fingerprint)
+
+    def _cached_store(self, fingerprint, names, read_cached):
+        """
+        مخزن كسول من الكاش العمودي. إذا حُذف الكاش بعد فتحه (تنظيف النسخ القديمة) يُقرأ الشيت
+        من الملف ما دام بنفس البصمة، وإلا نرفع خطأ بدل خلط نسختين في نفس المخزن
+        """
+        def read_xlsx(name):
+            with open(self.xlsx_path, "rb") as f:
+                data = f.read()
+            if hashlib.blake2b(data, digest_size=16).hexdigest() != fingerprint:
+                raise RuntimeError(f"columnar cache for {fingerprint} removed and workbook changed")
+            return read_single_sheet(data, name)
+
+        def read(name):
+            try:
+                return read_cached(name)
+            except Exception:
+                return read_xlsx(name)
+
+        def read_all():
+            sheets = read_columnar_cache(self.cache_dir, fingerprint)
+            return sheets if sheets is not None else {name: read(name) for name in names}
+
+        return SheetStore(LazySheets(names, read, bulk_loader=read_all, max_loaded=self.max_loaded),
+                          fingerprint=fingerprint)
+
+    def save(self, sheets, dirty=None, base=None):
+        """base: بصمة التعديلات — إذا تغيّر الملف بعدها تُدمج التعديلات في النسخة الحالية"""
+        with self._save_lock:
+            sheets, merged = _rebase_stale(self, sheets, dirty, base, self.fingerprint())
+            report = save_workbook(self.xlsx_path, sheets, dirty=dirty, generations=self.generations)
+        report["merged"] = merged
+        return report
+
+    def has_pending_changes(self):
+        # الملف نفسه هو المصدر، لا يوجد ما ينتظر التصدير
+        return False
+
+    def export_xlsx(self):
+        return self.xlsx_path
+
+
+# -------------------------------
+# 🔤 ترميز الخلايا (JSON) مع الحفاظ على الأنواع
+# -------------------------------
+def _encode_cell(v):
+    """
+    قيمة الخلية كما تُحفظ في JSON: الأنواع الأساسية كما هي، والتاريخ/الوقت/المدة بمفتاح لنوعها
+    (نفس وسوم الكاش العمودي) حتى تعود بنفس النوع. أي نوع آخر يرفع TypeError بدل حفظه نصاً
+    """
+    if v is None or v is pd.NaT or v is pd.NA:
+        return None
+    if isinstance(v, (bool, np.bool_)):
+        return bool(v)
+    if isinstance(v, (int, np.integer)):
+        return int(v)
+    if isinstance(v, (float, np.floating)):
+        return None if math.isnan(v) else float(v)
+    if isinstance(v, str):
+        return v
+    if isinstance(v, dt.datetime):
+        return {"d": v.isoformat()}
+    if isinstance(v, dt.date):
+        return {"a": v.isoformat()}
+    if isinstance(v, dt.time):
+        return {"t": v.isoformat()}
+    if isinstance(v, dt.timedelta):
+        return {"D": v // dt.timedelta(microseconds=1)}
+    raise TypeError(f"cell type {type(v).__name__} cannot be stored in SQLite")
+
+
+def _decode_cell(v):
+    if v is None:
+        return np.nan
+    if isinstance(v, dict):
+        if "d" in v:
+            return dt.datetime.fromisoformat(v["d"])
+        if "a" in v:
+            return dt.date.fromisoformat(v["a"])
+        if "t" in v:
+            return dt.time.fromisoformat(v["t"])
+        if "D" in v:
+            return dt.timedelta(microseconds=v["D"])
+        # قواعد قديمة حفظت الأنواع النادرة نصاً
+        return v["s"]
+    return v
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS sheets (
+    name     TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    columns  TEXT NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS rows (
+    sheet    TEXT NOT NULL,
+    pos      INTEGER NOT NULL,
+    cells    TEXT NOT NULL,
+    PRIMARY KEY (sheet, pos)
+);
+DROP INDEX IF EXISTS rows_card_range;
+"""
+
+
+class StaleSheet(SaveConflict):
+    """شيت يُقرأ متأخراً من مخزن SQLite وقد تغيّر (أو حُذف) بعد مراجعة المخزن: لا نسخة منه بتلك المراجعة"""
+
+
+# -------------------------------
+# 🗄 قاعدة SQLite
+# -------------------------------
+class SQLiteBackend:
+    name = STORAGE_SQLITE
+
+    def __init__(self, db_path, xlsx_path, generations=0, max_loaded=None):
+        self.db_path = db_path
+        self.xlsx_path = xlsx_path
+        self.generations = generations
+        self.max_loaded = max_loaded
+        self._local = threading.local()
+        self._import_lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        # قواعد أنشئت قبل عمود المراجعة: كل شيتاتها تُعتبر بلا تعديل منذ المراجعة 0
+        if "revision" not in [r[1] for r in conn.execute("PRAGMA table_info(sheets)")]:
+            conn.execute("ALTER TABLE sheets ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @contextmanager
+    def _read_transaction(self):
+        """
+        معاملة قراءة قصيرة (قراءات متسقة من نفس المراجعة) تُغلق فور الانتهاء حتى لا تمنع
+        الـ checkpoint في وضع WAL. داخل معاملة مفتوحة (الحفظ) تُستخدم نفسها
+        """
+        conn = self._conn()
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _get_meta(conn, key, default=None):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    @staticmethod
+    def _set_meta(conn, key, value):
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def _bump_revision(self, conn, dirty_names):
+        revision = self._get_meta(conn, "revision", 0) + 1
+        self._set_meta(conn, "revision", revision)
+        # مراجعة آخر كتابة لكل شيت (المخزن الأقدم منها لا يقرأ الشيت)
+        conn.executemany("UPDATE sheets SET revision = ? WHERE name = ?", [(revision, n) for n in dirty_names])
+        pending = set(self._get_meta(conn, "dirty_sheets", []))
+        pending.update(dirty_names)
+        self._set_meta(conn, "dirty_sheets", sorted(pending))
+        return revision
+
+    # -------------------------------
+    # ✍️ كتابة الصفوف
+    # -------------------------------
+    @staticmethod
+    def _row_cells(df):
+        """خلايا كل صف (JSON) — يرجع القائمة وعدد البايتات"""
+        cells = [json.dumps([_encode_cell(v) for v in row], ensure_ascii=False)
+                 for row in df.itertuples(index=False, name=None)]
+        return cells, sum(len(c) for c in cells)
+
+    def _write_sheet(self, conn, name, df, position):
+        conn.execute("DELETE FROM rows WHERE sheet = ?", (name,))
+        conn.execute(
+            "INSERT OR REPLACE INTO sheets (name, position, columns) VALUES (?, ?, ?)",
+            (name, position, json.dumps([_encode_cell(c) for c in df.columns], ensure_ascii=False)),
+        )
+        cells, size = self._row_cells(df)
+        conn.executemany("INSERT INTO rows (sheet, pos, cells) VALUES (?, ?, ?)",
+                         [(name, pos, c) for pos, c in enumerate(cells)])
+        return size
+
+    def import_sheets(self, sheets, source_fingerprint=None):
+        """استبدال كل محتوى القاعدة بهذه الشيتات (استيراد من XLSX)"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM rows")
+            conn.execute("DELETE FROM sheets")
+            for position, (name, df) in enumerate(sheets.items()):
+                self._write_sheet(conn, name, df, position)
+            revision = self._get_meta(conn, "revision", 0) + 1
+            self._set_meta(conn, "revision", revision)
+            conn.execute("UPDATE sheets SET revision = ?", (revision,))
+            self._set_meta(conn, "exported_revision", revision)
+            self._set_meta(conn, "dirty_sheets", [])
+            self._set_meta(conn, "source_fingerprint", source_fingerprint)
+        return revision
+
+    def sync_from_xlsx(self):
+        """
+        استيراد ملف XLSX إذا تغيّر (مثلاً بعد جلب من GitHub) ولم تكن هناك تعديلات لم تُصدَّر
+        يرجع True إذا تم الاستيراد
+        """
+        if not os.path.exists(self.xlsx_path):
+            return False
+        fp = file_fingerprint(self.xlsx_path)
+        conn = self._conn()
+        if self._get_meta(conn, "source_fingerprint") == fp or self.has_pending_changes():
+            return False
+        with self._import_lock:
+            if self._get_meta(conn, "source_fingerprint") == fp:
+                return False
+            sheets = pd.read_excel(self.xlsx_path, sheet_name=None, dtype=object)
+            self.import_sheets(sheets, source_fingerprint=fp)
+        return True
+
+    # -------------------------------
+    # 🔌 الواجهة المشتركة
+    # -------------------------------
+    def fingerprint(self):
+        self.sync_from_xlsx()
+        return self._revision_fingerprint(self._conn())
+
+    def _revision_fingerprint(self, conn):
+        revision = self._get_meta(conn, "revision")
+        return "initial" if revision is None else f"sqlite-{revision}"
+
+    def sheet_names(self, conn=None):
+        conn = conn or self._conn()
+        return [r[0] for r in conn.execute("SELECT name FROM sheets ORDER BY position")]
+
+    def read_sheet(self, name, conn=None):
+        """شيت واحد بنفس شكل read_excel(dtype=object) — استعلام بمفتاح (sheet, pos)"""
+        conn = conn or self._conn()
+        row = conn.execute("SELECT columns FROM sheets WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        columns = [_decode_cell(c) for c in json.loads(row[0])]
+        cells = [
+            [_decode_cell(v) for v in json.loads(r[0])]
+            for r in conn.execute("SELECT cells FROM rows WHERE sheet = ? ORDER BY pos", (name,))
+        ]
+        if not columns:
+            return pd.DataFrame(index=pd.RangeIndex(len(cells)))
+        df = pd.DataFrame(cells, dtype=object) if cells else pd.DataFrame(columns=range(len(columns)), dtype=object)
+        df.columns = pd.Index(columns)
+        return df
+
+    def load_store(self, fingerprint):
+        """
+        مخزن كسول على مراجعة واحدة: كل شيت يُقرأ عند أول طلب (أو بعد إخراجه من الـ LRU) في معاملة
+        قراءة قصيرة، ويُقرأ فقط إذا لم يُكتب بعد مراجعة المخزن (فمحتواه هو نفسه في تلك المراجعة)،
+        وإلا StaleSheet بدل خلطه بصفوف أحدث. البصمة المسجلة هي مراجعة المخزن (أحدث من fingerprint
+        إذا كُتب بينهما) حتى يُدمج الحفظ على الأساس الصحيح
+        """
+        with self._read_transaction() as conn:
+            names = self.sheet_names(conn)
+            revision = self._get_meta(conn, "revision", 0)
+            pinned = self._revision_fingerprint(conn)
+        if not names:
+            return None
+
+        def read(name):
+            with self._read_transaction() as conn:
+                row = conn.execute("SELECT revision FROM sheets WHERE name = ?", (name,)).fetchone()
+                if row is None or row[0] > revision:
+                    raise StaleSheet([(name, f"changed after {pinned}, reload to edit it")])
+                return self.read_sheet(name, conn)
+
+        return SheetStore(LazySheets(names, read, max_loaded=self.max_loaded), fingerprint=pinned)
+
+    def save(self, sheets, dirty=None, base=None):
+        """
+        حفظ في القاعدة: إعادة كتابة صفوف الشيتات المعدّلة فقط (أو كل الشيتات إذا dirty=None)
+        الشيت الذي كل تعديلاته إدراج صفوف (EditSheets.row_inserts) تُدرج صفوفه فقط بدون إعادة كتابته
+        (حتى MAX_ROW_INSERTS صف؛ الأكثر يعيد كتابة الشيت)، وفرق المحرر (EditSheets.row_patch)
+        يكتب الصفوف المعدّلة والمحذوفة والمضافة فقط، والشيت المعدّل الذي لم يعد موجوداً يُحذف.
+        base: بصمة التعديلات — إذا تغيّرت المراجعة بعدها تُدمج التعديلات في النسخة الحالية،
+        والمراجعة يعاد فحصها داخل المعاملة (عمليات أخرى قد تكتب على نفس القاعدة)
+        يرجع تقرير بنفس شكل save_workbook
+        """
+        start = time.perf_counter()
+        with self._save_lock:
+            for _ in range(MAX_REBASE_ATTEMPTS):
+                current = self.fingerprint()
+                target, merged = _rebase_stale(self, sheets, dirty, base, current)
+                report = self._save(target, dirty, None if base is None else current)
+                if report is not None:
+                    break
+            else:
+                raise SaveConflict([("*", "database kept changing during save")])
+        report["merged"] = merged
+        report["seconds"] = time.perf_counter() - start
+        return report
+
+    def _save(self, sheets, dirty, expected):
+        """الكتابة في معاملة واحدة؛ None إذا لم تعد المراجعة expected عند بدء المعاملة"""
+        start = time.perf_counter()
+        dirty_set = None if dirty is None else set(dirty)
+        names = [n for n in sheets.keys() if dirty_set is None or n in dirty_set]
+        # شيت معدّل لم يعد في sheets (حذف، أو حذفه الدمج مع نسخة أحدث) يُحذف من القاعدة
+        removed = [] if dirty_set is None else sorted(n for n in dirty_set if n not in sheets)
+        row_inserts = getattr(sheets, "row_inserts", None) if dirty is not None else None
+        row_patch = getattr(sheets, "row_patch", None) if dirty is not None else None
+        size = 0
+        with self._transaction() as conn:
+            if expected is not None and self._revision_fingerprint(conn) != expected:
+                return None
+            if dirty is None:
+                conn.execute("DELETE FROM rows")
+                conn.execute("DELETE FROM sheets")
+                positions = {n: i for i, n in enumerate(sheets.keys())}
+            else:
+                # الشيتات الموجودة تحتفظ بمكانها، والجديدة تُضاف في النهاية
+                positions = dict(conn.execute("SELECT name, position FROM sheets"))
+                for name in names:
+                    if name not in positions:
+                        positions[name] = max(positions.values(), default=-1) + 1
+            for name in removed:
+                conn.execute("DELETE FROM rows WHERE sheet = ?", (name,))
+                conn.execute("DELETE FROM sheets WHERE name = ?", (name,))
+            for name in names:
+                inserts = row_inserts(name) if row_inserts is not None else None
+                patch = row_patch(name) if row_patch is not None else None
+                if inserts is not None and len(inserts) <= MAX_ROW_INSERTS:
+                    for pos, values in inserts:
+                        size += self._insert_row(conn, name, pos, values)
+                elif patch is not None:
+                    size += self._apply_patch(conn, name, patch)
+                else:
+                    size += self._write_sheet(conn, name, sheets[name], positions[name])
+            self._bump_revision(conn, names + removed)
+        return {
+            "mode": SAVE_MODE_SQLITE,
+            "sheets": names + removed,
+            "bytes": size,
+            "sheet_bytes": size,
+            "seconds": time.perf_counter() - start,
+        }
+
+    def _rows_frame(self, conn, sheet, rows):
+        """إطار صفوف (قوائم بترتيب أعمدة الشيت المحفوظ) لبناء سجلاتها"""
+        columns = json.loads(conn.execute("SELECT columns FROM sheets WHERE name = ?", (sheet,)).fetchone()[0])
+        df = pd.DataFrame([list(values) for values in rows], dtype=object)
+        df.columns = pd.Index([_decode_cell(c) for c in columns], dtype=object)
+        return df
+
+    def _insert_row(self, conn, sheet, pos, values):
+        df = self._rows_frame(conn, sheet, [values])
+        # إزاحة على مرحلتين حتى لا يتعارض المفتاح (sheet, pos) أثناء التحديث
+        conn.execute("UPDATE rows SET pos = -pos - 2 WHERE sheet = ? AND pos >= ?", (sheet, pos))
+        conn.execute("UPDATE rows SET pos = -pos - 1 WHERE sheet = ? AND pos < 0", (sheet,))
+        (cells,), size = self._row_cells(df)
+        conn.execute("INSERT INTO rows (sheet, pos, cells) VALUES (?, ?, ?)", (sheet, pos, cells))
+        return size
+
+    def _delete_rows(self, conn, sheet, positions):
+        """حذف صفوف بأرقامها (من 0) ثم إعادة ترقيم ما بعدها بأمرين (إزاحة على مرحلتين كالإدراج)"""
+        positions = sorted(set(int(p) for p in positions))
+        if not positions:
+            return
+        conn.executemany("DELETE FROM rows WHERE sheet = ? AND pos = ?", [(sheet, p) for p in positions])
+        removed = json.dumps(positions)
+        conn.execute(
+            "UPDATE rows SET pos = -(pos - (SELECT COUNT(*) FROM json_each(?) WHERE value < rows.pos)) - 1 "
+            "WHERE sheet = ? AND pos > ?",
+            (removed, sheet, positions[0]),
+        )
+        conn.execute("UPDATE rows SET pos = -pos - 1 WHERE sheet = ? AND pos < 0", (sheet,))
+
+    def _apply_patch(self, conn, sheet, patch):
+        """
+        فرق المحرر (EditSheets.row_patch): تحديث الصفوف المعدّلة في مكانها، ثم الحذف، ثم الإضافة في النهاية
+        يرجع حجم الصفوف المكتوبة فقط
+        """
+        size = 0
+        if patch["updated"]:
+            df = self._rows_frame(conn, sheet, [values for _, values in patch["updated"]])
+            cells, size = self._row_cells(df)
+            conn.executemany(
+                "UPDATE rows SET cells = ? WHERE sheet = ? AND pos = ?",
+                [(c, sheet, pos) for (pos, _), c in zip(patch["updated"], cells)],
+            )
+        self._delete_rows(conn, sheet, patch["deleted"])
+        if patch["appended"]:
+            start = conn.execute("SELECT COUNT(*) FROM rows WHERE sheet = ?", (sheet,)).fetchone()[0]
+            cells, appended_size = self._row_cells(self._rows_frame(conn, sheet, patch["appended"]))
+            conn.executemany("INSERT INTO rows (sheet, pos, cells) VALUES (?, ?, ?)",
+                             [(sheet, start + i, c) for i, c in enumerate(cells)])
+            size += appended_size
+        return size
+
+    def has_pending_changes(self):
+        conn = self._conn()
+        return self._get_meta(conn, "revision", 0) != self._get_meta(conn, "exported_revision", 0)
+
+    def export_xlsx(self, path=None):
+        """
+        تصدير القاعدة إلى XLSX. إذا كان الملف موجوداً تُرقَّع فيه الشيتات التي تغيّرت
+        منذ آخر تصدير فقط (save_engine)، وإلا يُكتب كاملاً
+        """
+        path = path or self.xlsx_path
+        to_default = path == self.xlsx_path
+        if to_default and not self.has_pending_changes() and os.path.exists(path):
+            return path
+        # المراجعة والشيتات المتغيرة وصفوفها من نفس معاملة القراءة (حفظ متزامن لا يختلط بالتصدير)
+        with self._read_transaction() as conn:
+            revision = self._get_meta(conn, "revision", 0)
+            dirty = self._get_meta(conn, "dirty_sheets", [])
+            sheets = LazySheets(self.sheet_names(conn), lambda name: self.read_sheet(name, conn))
+            save_workbook(path, sheets, dirty=dirty if to_default else None, generations=self.generations)
+        if to_default:
+            with self._transaction() as conn:
+                if self._get_meta(conn, "revision", 0) == revision:
+                    self._set_meta(conn, "dirty_sheets", [])
+                self._set_meta(conn, "exported_revision", revision)
+                self._set_meta(conn, "source_fingerprint", file_fingerprint(path))
+        return path
+
+
+def open_backend(kind, xlsx_path, db_path=None, cache_dir=None, generations=0, max_loaded=None):
+    """
+    إنشاء طبقة التخزين حسب الإعداد (excel افتراضياً)
+    max_loaded: أقصى عدد شيتات محمّلة في كل مخزن (LRU) قبل أن يُطلب التحميل الكامل
+    """
+    if kind == STORAGE_SQLITE:
+        return SQLiteBackend(db_path, xlsx_path, generations=generations, max_loaded=max_loaded)
+    return ExcelBackend(xlsx_path, cache_dir=cache_dir, generations=generations, max_loaded=max_loaded)
@@ -0,0 +1,91 @@
+"""
+⏲ خدمة مزامنة دورية واحدة لكل العملية
+خيط في الخلفية يستدعي poll() (جلب مشروط من GitHub) كل interval ثانية،
+ويحتفظ بالبصمة الحالية للملف ورقم المراجعة في كائن واحد مشترك بين كل الجلسات
+(يُنشأ عبر st.cache_resource)، فكل الجلسات ترى المراجعة الجديدة في أول تشغيل بعدها.
+"""
+import os
+import threading
+from datetime import datetime
+
+from sheet_store import file_fingerprint
+
+
+class SyncService:
+    def __init__(self, local_file, poll=None, interval=60, start=True, fingerprint=None):
+        """
+        poll: دالة بدون معاملات ترجع dict فيه changed (مثل GithubSync.fetch_raw)
+        interval: ثواني بين كل جلب؛ 0 يعطل الجلب الدوري (تبقى البصمة المشتركة)
+        fingerprint: دالة البصمة (طبقة التخزين)؛ الافتراضي بصمة محتوى local_file
+        """
+        self.local_file = local_file
+        self.fingerprint_fn = fingerprint
+        self.poll = poll
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = False
+        self.fingerprint = None
+        self.revision = 0
+        self.last_poll = None
+        self._thread = None
+        self.current_fingerprint()
+        if start and poll is not None and interval > 0:
+            self._thread = threading.Thread(target=self._run, name="github-sync-poller", daemon=True)
+            self._thread.start()
+
+    def current_fingerprint(self):
+        """
+        البصمة الحالية المشتركة. فحص stat رخيص (الهاش محفوظ حسب mtime/size/inode)،
+        فالحفظ المحلي من أي جلسة يظهر فوراً بدون انتظار الجلب التالي
+        """
+        if self.fingerprint_fn is not None:
+            fp = self.fingerprint_fn()
+        elif os.path.exists(self.local_file):
+            try:
+                fp = file_fingerprint(self.local_file)
+            except OSError:
+                fp = self.fingerprint or "initial"
+        else:
+            fp = "initial"
+        with self._lock:
+            if fp != self.fingerprint:
+                self.fingerprint = fp
+                self.revision += 1
+            return self.fingerprint
+
+    def poll_now(self):
+        """جلب واحد الآن (نفس ما يفعله الخيط الدوري)"""
+        started = datetime.now()
+        try:
+            result = dict(self.poll())
+            result["ok"] = True
+        except Exception as e:
+            result = {"ok": False, "changed": False, "error": str(e)}
+        result["time"] = started.isoformat(timespec="seconds")
+        result["fingerprint"] = self.current_fingerprint()
+        with self._lock:
+            result["revision"] = self.revision
+            self.last_poll = result
+        return result
+
+    def status(self):
+        with self._lock:
+            return {
+                "fingerprint": self.fingerprint,
+                "revision": self.revision,
+                "interval": self.interval,
+                "running": self._thread is not None and self._thread.is_alive(),
+                "last_poll": dict(self.last_poll) if self.last_poll else None,
+            }
+
+    def stop(self, timeout=None):
+        self._stop = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop:
+            self.poll_now()
+            self._wake.wait(self.interval)